@@ -0,0 +1,36 @@
+# analytics_export.py
+# Writes closed days of device_logs to Parquet (ANALYTICS_DIR/device_logs/project_id=N/date=D/)
+# for the DuckDB cold path behind the summary endpoints.
+# Cron (daily):  python analytics_export.py
+# Backfill:      python analytics_export.py --start 2026-01-01 --end 2026-06-01
+# Days marked stale (edited, deleted, expired or restored rows) are re-exported on every run.
+import argparse
+from datetime import date, timedelta
+from app import create_app
+from app.services.log_analytics_services import closed_days, export_day, first_open_day, is_exported, stale_days
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export closed device_logs days to Parquet")
+    parser.add_argument("--start", type=date.fromisoformat, help="First day (defaults to the lookback window)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Day after the last one to export (defaults to the first open day)")
+    parser.add_argument("--lookback-days", type=int, default=None,
+                        help="Closed days to consider when --start is omitted (ANALYTICS_EXPORT_LOOKBACK_DAYS)")
+    parser.add_argument("--force", action="store_true", help="Re-export days that already have files")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.start:
+            end = args.end or first_open_day()
+            days = [args.start + timedelta(days=i) for i in range((end - args.start).days)]
+        else:
+            days = closed_days(args.lookback_days)
+        # Exported days whose rows changed since, whatever their age
+        open_day = first_open_day()
+        days = sorted(set(days) | {day for day in stale_days() if day < open_day})
+
+        for day in days:
+            if is_exported(day) and not args.force:
+                continue
+            counts = export_day(day)
+            print(f"Exported {day.isoformat()}: {sum(counts.values())} row(s), {len(counts)} project(s)")
@@ -3,8 +3,10 @@ from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from werkzeug.middleware.proxy_fix import ProxyFix
+from app.utils.db_session import RoutingSession
+from app.utils.json_provider import configure_json
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 
 def create_app():
@@ -18,6 +20,7 @@ def create_app():
     )
 
     app.config.from_object('app.config.Config')
+    configure_json(app)
     
     # Allow only your Next.js app running on localhost:3000
     CORS(app, resources={r"/*": {"origins": "https://www.id-makers.com"}}, supports_credentials=True)
@@ -40,6 +43,7 @@ def create_app():
     from app.routes.custom_field import custom_field_bp
     from app.routes.push_tokens import push_token_bp
     from app.routes.instances import instance_bp
+    from app.routes.metrics import metrics_bp
 
     # Register blueprints
     app.register_blueprint(user_bp, url_prefix='/api/users')
@@ -56,4 +60,5 @@ def create_app():
     app.register_blueprint(custom_field_bp, url_prefix='/api/custom-field')
     app.register_blueprint(push_token_bp, url_prefix='/api/pushTokens')
     app.register_blueprint(instance_bp, url_prefix='/api/instances')
+    app.register_blueprint(metrics_bp, url_prefix='/api/metrics')
     return app
@@ -3,9 +3,153 @@ from dotenv import load_dotenv
 
 load_dotenv()  # load .env file
 
+
+def engine_options(url):
+    """SQLAlchemy engine options from the DB_* environment variables.
+
+    DB_PGBOUNCER_MODE makes the engine safe behind a transaction-pooling
+    PgBouncer: no startup parameters, no server-side prepared statements,
+    and statement_timeout set per transaction (see app/utils/db_session.py).
+    """
+    from app.utils.db_pool import TimedQueuePool
+
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'True').lower() == 'true',
+    }
+    connect_args = {}
+
+    if os.getenv('DB_PGBOUNCER_MODE', 'False').lower() == 'true':
+        if url and url.startswith('postgresql+psycopg:'):
+            # psycopg 3 prepares repeated statements server-side by default
+            connect_args['prepare_threshold'] = None
+    else:
+        timeout_ms = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))
+        if timeout_ms:
+            connect_args['options'] = f'-c statement_timeout={timeout_ms}'
+
+    if connect_args:
+        options['connect_args'] = connect_args
+    return options
+
+
 class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # Optional streaming replica for dashboard reads (@use_replica)
+    DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+    SQLALCHEMY_BINDS = (
+        {'replica': {'url': DATABASE_REPLICA_URL, **engine_options(DATABASE_REPLICA_URL)}}
+        if DATABASE_REPLICA_URL else {}
+    )
+    DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv('DB_REPLICA_MAX_LAG_SECONDS', 5))
+    DB_REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_LAG_CHECK_INTERVAL', 5))
+
+    # Connection pool / statement timeouts, see engine_options()
+    DB_PGBOUNCER_MODE = os.getenv('DB_PGBOUNCER_MODE', 'False').lower() == 'true'
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))
+    # Applied to dashboard/reporting endpoints with @statement_timeout
+    DB_REPORT_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_REPORT_STATEMENT_TIMEOUT_MS', 15000))
     DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
+
+    # "orjson" (when installed) or "default"; see app/utils/json_provider.py
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'orjson').lower()
     
     REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
+    # Max number of logs accepted by POST /api/logs/batch
+    LOG_BATCH_MAX_SIZE = int(os.getenv('LOG_BATCH_MAX_SIZE', 5000))
+    # Longer messages are rejected per item with status "invalid"
+    LOG_MESSAGE_MAX_LENGTH = int(os.getenv('LOG_MESSAGE_MAX_LENGTH', 65536))
+
+    # GET /api/logs/export: rows per server-side cursor fetch; statement_timeout
+    # for the export query (0 = none, exports of millions of rows run long)
+    LOG_EXPORT_BATCH_SIZE = int(os.getenv('LOG_EXPORT_BATCH_SIZE', 5000))
+    LOG_EXPORT_STATEMENT_TIMEOUT_MS = int(os.getenv('LOG_EXPORT_STATEMENT_TIMEOUT_MS', 0))
+
+    # Log ingestion: "sync" writes in the request, "queue" appends to a Redis
+    # stream drained by log_worker.py
+    LOG_INGEST_MODE = os.getenv('LOG_INGEST_MODE', 'sync').lower()
+    LOG_QUEUE_STREAM = os.getenv('LOG_QUEUE_STREAM', 'device_logs:ingest')
+    LOG_QUEUE_GROUP = os.getenv('LOG_QUEUE_GROUP', 'device_logs_writers')
+    LOG_QUEUE_DEAD_LETTER_STREAM = os.getenv('LOG_QUEUE_DEAD_LETTER_STREAM', 'device_logs:dead_letter')
+    LOG_QUEUE_DEAD_LETTER_MAX_LENGTH = int(os.getenv('LOG_QUEUE_DEAD_LETTER_MAX_LENGTH', 100000))
+    LOG_QUEUE_MAX_LENGTH = int(os.getenv('LOG_QUEUE_MAX_LENGTH', 1000000))
+    LOG_QUEUE_BATCH_SIZE = int(os.getenv('LOG_QUEUE_BATCH_SIZE', 2000))
+    LOG_QUEUE_BLOCK_MS = int(os.getenv('LOG_QUEUE_BLOCK_MS', 1000))
+    LOG_QUEUE_CLAIM_IDLE_MS = int(os.getenv('LOG_QUEUE_CLAIM_IDLE_MS', 60000))
+    LOG_QUEUE_MAX_DELIVERIES = int(os.getenv('LOG_QUEUE_MAX_DELIVERIES', 5))
+
+    # LogTag resolution cache: per-process LRU plus an optional Redis tier
+    LOG_TAG_CACHE_SIZE = int(os.getenv('LOG_TAG_CACHE_SIZE', 10000))
+    LOG_TAG_CACHE_TTL = int(os.getenv('LOG_TAG_CACHE_TTL', 300))
+    LOG_TAG_REDIS_CACHE = os.getenv('LOG_TAG_REDIS_CACHE', 'True').lower() == 'true'
+
+    # device_logs daily partitions, maintained by maintain_partitions.py.
+    # LOG_PARTITION_RETENTION_DAYS drops whole partitions without archiving and
+    # is refused once retention policies are configured (see retention.py).
+    LOG_PARTITION_DAYS_AHEAD = int(os.getenv('LOG_PARTITION_DAYS_AHEAD', 7))
+    LOG_PARTITION_RETENTION_DAYS = int(os.getenv('LOG_PARTITION_RETENTION_DAYS', 0))
+    LOG_PARTITION_DETACH_ONLY = os.getenv('LOG_PARTITION_DETACH_ONLY', 'False').lower() == 'true'
+
+    # device_sessions: starts of the same instance closer than this are one session
+    # (0 disables), and the max size of POST /api/sessions/batch
+    DEVICE_SESSION_DEDUP_SECONDS = int(os.getenv('DEVICE_SESSION_DEDUP_SECONDS', 30))
+    SESSION_BATCH_MAX_SIZE = int(os.getenv('SESSION_BATCH_MAX_SIZE', 1000))
+
+    # MaxMind country database for /api/devices/init, reloaded when the file changes
+    GEO_LITE = os.getenv('GEO_LITE')
+    GEOIP_CACHE_SIZE = int(os.getenv('GEOIP_CACHE_SIZE', 100000))
+    GEOIP_CACHE_TTL = int(os.getenv('GEOIP_CACHE_TTL', 86400))
+    GEOIP_RELOAD_INTERVAL = int(os.getenv('GEOIP_RELOAD_INTERVAL', 60))
+
+    # Hourly HyperLogLog sketches in Redis for approx=true distinct-device counts
+    LOG_SKETCHES_ENABLED = os.getenv('LOG_SKETCHES_ENABLED', 'True').lower() == 'true'
+    LOG_SKETCH_RETENTION_DAYS = int(os.getenv('LOG_SKETCH_RETENTION_DAYS', 400))
+
+    # Retention (retention.py): defaults for projects without a retention_policies
+    # row, in days, 0 keeps forever. Expired rows are archived as Parquet first.
+    RETENTION_DEFAULT_INFO_DAYS = int(os.getenv('RETENTION_DEFAULT_INFO_DAYS', 0))
+    RETENTION_DEFAULT_WARNING_DAYS = int(os.getenv('RETENTION_DEFAULT_WARNING_DAYS', 0))
+    RETENTION_DEFAULT_ERROR_DAYS = int(os.getenv('RETENTION_DEFAULT_ERROR_DAYS', 0))
+    RETENTION_DEFAULT_SESSION_DAYS = int(os.getenv('RETENTION_DEFAULT_SESSION_DAYS', 0))
+    RETENTION_ARCHIVE_DIR = os.getenv('RETENTION_ARCHIVE_DIR', 'archive')
+    RETENTION_ARCHIVE_COMPRESSION = os.getenv('RETENTION_ARCHIVE_COMPRESSION', 'zstd')
+    RETENTION_CHUNK_SIZE = int(os.getenv('RETENTION_CHUNK_SIZE', 5000))
+
+    # Columnar copies of closed days (analytics_export.py), one Parquet file per
+    # project/day. Summary windows ending before now - ANALYTICS_HOT_DAYS are read
+    # from them with DuckDB when every day is exported; 0 disables the cold path.
+    ANALYTICS_DIR = os.getenv('ANALYTICS_DIR', 'analytics')
+    ANALYTICS_HOT_DAYS = int(os.getenv('ANALYTICS_HOT_DAYS', 30))
+    ANALYTICS_CLOSE_AFTER_DAYS = int(os.getenv('ANALYTICS_CLOSE_AFTER_DAYS', 2))
+    ANALYTICS_EXPORT_LOOKBACK_DAYS = int(os.getenv('ANALYTICS_EXPORT_LOOKBACK_DAYS', 7))
+    ANALYTICS_BATCH_SIZE = int(os.getenv('ANALYTICS_BATCH_SIZE', 50000))
+    ANALYTICS_COMPRESSION = os.getenv('ANALYTICS_COMPRESSION', 'zstd')
+
+    # Redis response cache for dashboard aggregate endpoints (response_cache.py)
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'True').lower() == 'true'
+    RESPONSE_CACHE_LIVE_TTL = int(os.getenv('RESPONSE_CACHE_LIVE_TTL', 5))
+    RESPONSE_CACHE_HISTORICAL_TTL = int(os.getenv('RESPONSE_CACHE_HISTORICAL_TTL', 86400))
+    RESPONSE_CACHE_LIVE_HORIZON = int(os.getenv('RESPONSE_CACHE_LIVE_HORIZON', 3600))
+    RESPONSE_CACHE_LOCK_MS = int(os.getenv('RESPONSE_CACHE_LOCK_MS', 10000))
+    RESPONSE_CACHE_WAIT_MS = int(os.getenv('RESPONSE_CACHE_WAIT_MS', 3000))
+
+    # In-process token cache in front of Redis; revocations are pushed over pub/sub
+    TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+    TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 60))
+
+    # Invalid token handling in token_required
+    INVALID_TOKEN_TTL = int(os.getenv('INVALID_TOKEN_TTL', 60))
+    VALID_TOKEN_SET_TTL = int(os.getenv('VALID_TOKEN_SET_TTL', 86400))
+    AUTH_FAILURE_LIMIT = int(os.getenv('AUTH_FAILURE_LIMIT', 20))
+    AUTH_FAILURE_WINDOW = int(os.getenv('AUTH_FAILURE_WINDOW', 300))
+
+    # Authorization value for operator-only routes (/api/metrics); unset disables them
+    OPERATOR_TOKEN = os.getenv('OPERATOR_TOKEN')
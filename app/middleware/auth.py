@@ -1,7 +1,22 @@
+import hmac
 from functools import wraps
-from flask import request, jsonify, g
+from flask import current_app, request, jsonify, g
 from app.models import Token, User
-from cache import cache_token, get_user_session
+from app.services.tokens_services import load_valid_tokens
+from cache import (
+    cache_invalid_token,
+    cache_token,
+    get_user_session,
+    is_auth_throttled,
+    is_token_known_invalid,
+    is_token_possibly_valid,
+    record_auth_failure,
+)
+
+def reject_token(token):
+    cache_invalid_token(token)
+    record_auth_failure(request.remote_addr, token)
+    return jsonify({"message": "Invalid or inactive token"}), 401
 
 def token_required(f):
     @wraps(f)
@@ -10,23 +25,58 @@ def token_required(f):
         if not token:
             return jsonify({"message": "Token is missing"}), 401
 
-        # 1️⃣ Try Redis first
+        # 1️⃣ Try the in-process cache, then Redis
         cache_user_session = get_user_session(token)
         if cache_user_session:
-            g.user_id = cache_user_session["user_id"]
-            g.project_id = cache_user_session["project_id"]
+            g.user_id, g.project_id = cache_user_session
             return f(*args, **kwargs)
 
-        # 2️⃣ Fallback: query the DB
+        # 2️⃣ Tokens in the known-valid set go straight to the DB check, so a
+        # throttled shared IP (NAT, CGNAT) does not lock out legitimate tokens
+        possibly_valid = is_token_possibly_valid(token)
+        if possibly_valid is None and load_valid_tokens():
+            possibly_valid = is_token_possibly_valid(token)
+
+        # Reject known-bad tokens and throttled callers without touching the DB
+        if not possibly_valid:
+            if is_auth_throttled(request.remote_addr, token):
+                response = jsonify({"message": "Too many failed attempts"})
+                response.headers["Retry-After"] = "60"
+                return response, 429
+
+            if is_token_known_invalid(token):
+                record_auth_failure(request.remote_addr, token)
+                return jsonify({"message": "Invalid or inactive token"}), 401
+
+            if possibly_valid is False:
+                return reject_token(token)
+
+        # 3️⃣ Fallback: query the DB
         token_record = Token.query.filter_by(token=token).first()
         if not token_record or token_record.status.name != "ACTIVE":
-            return jsonify({"message": "Invalid or inactive token"}), 401
+            return reject_token(token)
 
 
-        # 3️⃣ Cache it for next time
+        # 4️⃣ Cache it for next time
         cache_token(token, token_record.user_id,token_record.project_id)
         g.user_id = token_record.user_id
         g.project_id = token_record.project_id
         return f(*args, **kwargs)
 
     return decorated
+
+
+def operator_required(f):
+    """Process-wide internals: only for the OPERATOR_TOKEN, never a project token."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        expected = current_app.config["OPERATOR_TOKEN"]
+        if not expected:
+            return jsonify({"message": "Operator access is not configured"}), 403
+
+        token = request.headers.get("Authorization") or ""
+        if not hmac.compare_digest(token.encode(), expected.encode()):
+            return jsonify({"message": "Invalid operator token"}), 401
+        return f(*args, **kwargs)
+
+    return decorated
@@ -1,6 +1,9 @@
 from app import db
 import enum
 from datetime import datetime,timezone
+from sqlalchemy import DDL, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 
 
 class LogLevel(enum.Enum):
@@ -177,14 +180,18 @@ class Instance(db.Model):
 class DeviceLog(db.Model):
     __tablename__ = "device_logs"
 
-    log_id = db.Column(db.Integer, primary_key=True)
+    # Range-partitioned by day on actual_log_time (see app/services/log_partitions_services.py).
+    # Postgres requires the partition key in the primary key, the ORM still identifies rows by log_id.
+    log_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     project_id = db.Column(db.Integer, db.ForeignKey("projects.project_id"), nullable=False, index=True)
     instance_id = db.Column(db.String(100), db.ForeignKey("devices.instance_id"), nullable=False, index=True)
     message = db.Column(db.Text, nullable=False)
     level = db.Column(db.Enum(LogLevel), nullable=False, index=True)
     log_tag_id = db.Column(db.Integer, db.ForeignKey("log_tags.id"), index=True, nullable=True)
-    actual_log_time = db.Column(db.DateTime, nullable=False, index=True)
+    actual_log_time = db.Column(db.DateTime, primary_key=True, nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+    # Maintained by Postgres on insert, used by /api/logs/search
+    message_tsv = deferred(db.Column(TSVECTOR, db.Computed("to_tsvector('simple', message)", persisted=True)))
 
     project = db.relationship("Project", back_populates="logs")
     device = db.relationship("Device", back_populates="logs")
@@ -192,8 +199,24 @@ class DeviceLog(db.Model):
 
     __table_args__ = (
         db.Index("idx_project_instance_time", "project_id", "instance_id", "actual_log_time"),
+        # Per-project time-window aggregations grouped by device (GET /api/devices)
+        db.Index("idx_project_time_instance", "project_id", "actual_log_time", "instance_id"),
+        db.Index("ix_device_logs_message_tsv", "message_tsv", postgresql_using="gin"),
+        db.Index("ix_device_logs_message_trgm", "message", postgresql_using="gin",
+                 postgresql_ops={"message": "gin_trgm_ops"}),
+        {"postgresql_partition_by": "RANGE (actual_log_time)"},
     )
 
+    __mapper_args__ = {"primary_key": [log_id]}
+
+
+# gin_trgm_ops (ILIKE '%term%' on message) needs pg_trgm
+event.listen(
+    DeviceLog.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"),
+)
+
 
 class DeviceTag(db.Model):
     __tablename__ = "device_tags"
@@ -231,13 +254,22 @@ class DeviceSession(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     instance_id = db.Column(db.String(100), db.ForeignKey("devices.instance_id"), nullable=False, index=True)
+    # Denormalized from the device when the session is recorded, for per-project aggregation.
+    # Inserts without it (older releases) are filled from the device by the
+    # trg_device_sessions_fill_project_id trigger (migration a1d5f0c8b742).
+    project_id = db.Column(db.Integer, db.ForeignKey("projects.project_id"), nullable=True)
     actual_log_time = db.Column(db.DateTime, nullable=False, index=True)
+    # Client-generated per session start, makes SDK retries idempotent
+    idempotency_key = db.Column(db.String(100), nullable=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
 
     device = db.relationship("Device", back_populates="sessions")
 
     __table_args__ = (
         db.Index("idx_instance_logtime", "instance_id", "actual_log_time"),
+        db.Index("idx_session_project_time_instance", "project_id", "actual_log_time", "instance_id"),
+        db.Index("uq_session_idempotency_key", "instance_id", "idempotency_key", unique=True,
+                 postgresql_where=db.text("idempotency_key IS NOT NULL")),
     )
 
 
@@ -254,3 +286,60 @@ class LogTag(db.Model):
 
     project = db.relationship("Project", back_populates="logTags")
     device_logs = db.relationship("DeviceLog", back_populates="log_tag")
+
+
+class RetentionPolicy(db.Model):
+    __tablename__ = "retention_policies"
+
+    # Days to keep raw rows per log level and for sessions, NULL keeps them forever.
+    # Enforced by retention.py; projects without a row use the RETENTION_DEFAULT_* settings.
+    project_id = db.Column(db.Integer, db.ForeignKey("projects.project_id", ondelete="CASCADE"), primary_key=True)
+    info_days = db.Column(db.Integer, nullable=True)
+    warning_days = db.Column(db.Integer, nullable=True)
+    error_days = db.Column(db.Integer, nullable=True)
+    session_days = db.Column(db.Integer, nullable=True)
+    # Write expired rows to Parquet before deleting them
+    archive = db.Column(db.Boolean, nullable=False, default=True)
+    updated_at = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc)
+    )
+
+
+class LogHourlyRollup(db.Model):
+    __tablename__ = "log_hourly_rollups"
+
+    # Per device, per hour, per tag counters kept current at ingest time and
+    # rebuilt from device_logs by compact_rollups.py. log_tag_id 0 = untagged.
+    project_id = db.Column(db.Integer, db.ForeignKey("projects.project_id", ondelete="CASCADE"), nullable=False)
+    hour = db.Column(db.DateTime, nullable=False)
+    instance_id = db.Column(db.String(100), db.ForeignKey("devices.instance_id", ondelete="CASCADE"), nullable=False)
+    log_tag_id = db.Column(db.Integer, nullable=False, default=0)
+    platform = db.Column(db.Enum(Platform), nullable=False, default=Platform.UNKNOWN)
+    country = db.Column(db.String(100), nullable=True)
+    log_count = db.Column(db.Integer, nullable=False, default=0)
+    error_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.PrimaryKeyConstraint("project_id", "hour", "instance_id", "log_tag_id"),
+    )
+
+
+class DeviceDailyCounter(db.Model):
+    __tablename__ = "device_daily_counters"
+
+    # Per device, per UTC day totals for GET /api/devices, upserted at ingest and
+    # by session starts, rebuilt by compact_rollups.py --counters.
+    # action_count counts tagged logs.
+    project_id = db.Column(db.Integer, db.ForeignKey("projects.project_id", ondelete="CASCADE"), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    instance_id = db.Column(db.String(100), db.ForeignKey("devices.instance_id", ondelete="CASCADE"), nullable=False)
+    log_count = db.Column(db.Integer, nullable=False, default=0)
+    error_count = db.Column(db.Integer, nullable=False, default=0)
+    action_count = db.Column(db.Integer, nullable=False, default=0)
+    session_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.PrimaryKeyConstraint("project_id", "day", "instance_id"),
+    )
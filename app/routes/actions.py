@@ -5,7 +5,7 @@ from sqlalchemy import func, desc, and_, asc
 from app.models import DeviceLog, Device, Project, LogLevel,Platform,LogTag
 from datetime import datetime,timezone,timedelta
 from app.middleware.auth import token_required
-from app.utils.date_util import to_iso_utc
+from app.utils.date_util import to_iso_utc_many
 
 actions_bp = Blueprint('actions', __name__)
 
@@ -57,12 +57,13 @@ def get_actions_by_instance():
 )
     print(str(sql))
 
+    rows = query.all()
     result = [
         {
-            "actual_log_time": to_iso_utc(row.actual_log_time),
+            "actual_log_time": actual_log_time,
             "tag": row.tag,
         }
-        for row in query.all()
+        for row, actual_log_time in zip(rows, to_iso_utc_many([row.actual_log_time for row in rows]))
     ]
 
     return jsonify(result)
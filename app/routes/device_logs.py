@@ -1,17 +1,34 @@
-from flask import Blueprint, request, jsonify,g
+from flask import Blueprint, Response, request, jsonify, g, current_app, stream_with_context
 from sqlalchemy.exc import IntegrityError
 from app import db
-from sqlalchemy import func, desc, case, asc
-from app.models import DeviceLog, Device, Project, LogLevel,Platform,LogTag
+from sqlalchemy import func, desc, asc, cast, Float, tuple_
+from app.models import DeviceLog, Device, LogLevel,Platform,LogTag
 from datetime import datetime,timezone,timedelta
 from app.middleware.auth import token_required
-from app.utils.date_util import to_iso_utc,parse_iso_datetime
+from app.config import Config
+from app.utils.db_session import statement_timeout, use_replica
+from response_cache import cached_response, invalidate_project_responses
+from app.utils.date_util import to_iso_utc, to_iso_utc_many, parse_iso_datetime
+from app.utils.query_util import estimate_count
+from app.utils.cursor_util import encode_cursor, encode_rank_cursor, decode_rank_cursor
+from app.services.device_logs_services import save_logs
+from app.services.log_queue_services import enqueue_logs, QueueFullError
+from app.services.log_export_services import (
+    build_export_query, csv_chunks, gzip_chunks, ndjson_chunks, open_export,
+)
+from app.services.log_queries_services import (
+    fetch_log_page, keyset_filter, log_rows_query, seek_logs, serialize_log_rows,
+)
+from app.services.log_analytics_services import mark_stale
+from app.services.log_rollups_services import summarize_by_platform
+from app.services.log_sketches_services import approx_distinct_devices, approximation_info, error_bounds
 
 
 log_bp = Blueprint('device_logs', __name__)
 
 @log_bp.route('/log_tag',methods=['GET'])
 @token_required
+@use_replica
 def get_device_with_log_tag():
     project_id = g.project_id
     log_tag_id = request.args.get('log_tag_id')
@@ -125,11 +142,15 @@ def get_device_with_log_tag():
     
 @log_bp.route('/summary', methods=['GET'])
 @token_required
+@cached_response("logs_summary")
+@statement_timeout(Config.DB_REPORT_STATEMENT_TIMEOUT_MS)
+@use_replica
 def get_logs_summary():
 
     project_id = g.project_id
     start_str = request.args.get("start")
     end_str = request.args.get("end")
+    approx = request.args.get("approx", "false").lower() == "true"
 
     if not project_id:
         return jsonify({"error": "Missing required parameter: project_id"}), 400
@@ -153,50 +174,19 @@ def get_logs_summary():
             "error": "Invalid datetime format. Use ISO 8601 UTC"
         }), 400
 
+    # approx=true: distinct devices from the hourly HyperLogLog sketches
+    device_estimates = approx_distinct_devices(project_id, "platform", start_dt, end_dt) if approx else None
 
-    # Main query — matches your device endpoint logic
-    logs_query = (
-        db.session.query(
-            Device.platform.label("platform"),
-
-            func.count(
-                func.distinct(Device.instance_id)
-            ).label("total_devices"),
-
-            func.count(
-                DeviceLog.log_id
-            ).label("total_logs"),
-
-            func.coalesce(
-                func.sum(
-                    case(
-                        (DeviceLog.level == LogLevel.ERROR, 1),
-                        else_=0
-                    )
-                ),
-                0
-            ).label("total_errors"),
-        )
-        .join(
-            Device,
-            Device.instance_id == DeviceLog.instance_id
-        )
-        .filter(
-            Device.project_id == project_id,
-            DeviceLog.actual_log_time >= start_dt,
-            DeviceLog.actual_log_time < end_dt,
-        )
-        .group_by(Device.platform)
-    )
-
-
+    # Whole hours come from log_hourly_rollups, partial-hour edges from device_logs
     log_results = {
         row.platform: {
             "total_devices": int(row.total_devices),
             "total_logs": int(row.total_logs),
             "total_errors": int(row.total_errors),
         }
-        for row in logs_query.all()
+        for row in summarize_by_platform(
+            project_id, start_dt, end_dt, count_devices=device_estimates is None
+        )
     }
 
 
@@ -211,28 +201,35 @@ def get_logs_summary():
             "total_errors": 0,
         })
 
-        summary.append({
+        item = {
             "platform": p.value,
             "total_devices": data["total_devices"],
             "total_logs": data["total_logs"],
             "total_errors": data["total_errors"],
-        })
+        }
+        if device_estimates is not None:
+            item["total_devices"] = device_estimates.get(p.value, 0)
+            item["total_devices_bounds"] = error_bounds(item["total_devices"])
+        summary.append(item)
 
 
     summary.sort(key=lambda x: x["platform"])
 
-
-    return jsonify({
+    response = {
         "project_id": project_id,
         "start": start_str,
         "end": end_str,
         "summary": summary,
-    })
+    }
+    if device_estimates is not None:
+        response["approximation"] = approximation_info()
+    return jsonify(response)
 
 
 
 @log_bp.route('/by-instance', methods=['GET'])
 @token_required
+@use_replica
 def get_logs_by_instance():
     """
             Get logs for a specific device instance.
@@ -248,10 +245,15 @@ def get_logs_by_instance():
             - level (INFO | WARNING | ERROR)
             - log_tag_id
             - message
+            - pagination (offset | cursor), default offset
+            - cursor: next_cursor / prev_cursor from a previous response (implies pagination=cursor)
+            - total (exact | estimate | none), cursor mode only, default estimate
 
             Example:
             GET /logs/by-instance?instance_id=dvc_abc123&page=1&per_page=20
             GET /logs/by-instance?instance_id=dvc_abc123&start_date=2026-06-06T16:00:00.000Z&end_date=2026-06-07T16:00:00.000Z&level=ERROR
+            GET /logs/by-instance?instance_id=dvc_abc123&pagination=cursor&per_page=50
+            GET /logs/by-instance?instance_id=dvc_abc123&cursor=eyJ0Ijo...&per_page=50
     """
 
     # --- 1️⃣ Read parameters ---
@@ -264,22 +266,22 @@ def get_logs_by_instance():
     per_page = min(max(int(request.args.get("per_page", 20)), 1), 100)
     log_tag_id = int(request.args.get("log_tag_id",0))
     message = request.args.get("message")
+    cursor = request.args.get("cursor")
+    use_cursor = bool(cursor) or request.args.get("pagination") == "cursor"
+    total_mode = request.args.get("total", "estimate")
 
     # --- 2️⃣ Validation ---
     if not project_id:
         return jsonify({"error": "Missing required parameter: project_id"}), 400
     if not instance_id:
         return jsonify({"error": "Missing required parameter: instance_id"}), 400
+    if total_mode not in ("exact", "estimate", "none"):
+        return jsonify({"error": "Invalid total. Use exact, estimate or none"}), 400
 
     # --- 3️⃣ Build query ---
-    query = (
-        db.session.query(DeviceLog)
-        .join(Device, Device.instance_id == DeviceLog.instance_id)
-        .filter(
-            Device.project_id == project_id,
-            DeviceLog.instance_id == instance_id
-        )
-    )
+    # Filtering on DeviceLog.project_id keeps every page on idx_project_instance_time.
+    # Serialized columns only, tag joined in: one statement per page.
+    query = log_rows_query(project_id).filter(DeviceLog.instance_id == instance_id)
 
     # --- 4️⃣ Apply optional filters ---
     if level:
@@ -309,18 +311,44 @@ def get_logs_by_instance():
                 "error": "Invalid end_date format. Use ISO format, e.g. 2026-06-07T16:00:00.000Z"
             }), 400
 
-    # --- 5️⃣ Ordering ---
-    query = query.order_by(
-        desc(DeviceLog.actual_log_time),
-        desc(DeviceLog.log_id)
-)
+    # --- 5️⃣ Pagination (ordered by actual_log_time DESC, log_id DESC) ---
+    if use_cursor:
+        try:
+            logs, next_cursor, prev_cursor = fetch_log_page(query, cursor, per_page)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
 
-    # --- 6️⃣ Pagination ---
-    total_items = query.count()
-    logs = query.offset((page - 1) * per_page).limit(per_page).all()
-    total_pages = (total_items + per_page - 1) // per_page
+        if total_mode == "exact":
+            total_items = query.count()
+        elif total_mode == "estimate":
+            total_items = estimate_count(query)
+        else:
+            total_items = None
+
+        pagination = {
+            "per_page": per_page,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+            "total_items": total_items,
+            "total_is_estimate": total_mode == "estimate",
+        }
+    else:
+        query = query.order_by(
+            desc(DeviceLog.actual_log_time),
+            desc(DeviceLog.log_id)
+        )
+        total_items = query.count()
+        logs = query.offset((page - 1) * per_page).limit(per_page).all()
+        total_pages = (total_items + per_page - 1) // per_page
+
+        pagination = {
+            "page": page,
+            "per_page": per_page,
+            "total_pages": total_pages,
+            "total_items": total_items,
+        }
 
-    # --- 7️⃣ Device info ---
+    # --- 6️⃣ Device info ---
     device = Device.query.filter_by(project_id=project_id, instance_id=instance_id).first()
     device_info = None
     if device:
@@ -333,31 +361,14 @@ def get_logs_by_instance():
             "last_updated": to_iso_utc(device.last_updated)
         }
 
-    # --- 8️⃣ Serialize logs ---
-    logs_data = [
-        {
-            "log_id": log.log_id,
-            "instance_id": log.instance_id,
-            "project_id": project_id,
-            "level": log.level.value if log.level else None,
-            "tag": getattr(log.log_tag, "tag", None),
-            "message": log.message,
-            "actual_log_time": to_iso_utc(log.actual_log_time),
-            "created_at": to_iso_utc(log.created_at),
-        }
-        for log in logs
-    ]
+    # --- 7️⃣ Serialize logs ---
+    logs_data = serialize_log_rows(logs)
 
-    # --- 9️⃣ Response ---
+    # --- 8️⃣ Response ---
     return jsonify({
         "device": device_info,
         "logs": logs_data,
-        "pagination": {
-            "page": page,
-            "per_page": per_page,
-            "total_pages": total_pages,
-            "total_items": total_items,
-        },
+        "pagination": pagination,
         "filters": {
             "project_id": project_id,
             "instance_id": instance_id,
@@ -369,6 +380,12 @@ def get_logs_by_instance():
         }
     })
         
+def queue_full_response():
+    response = jsonify({'error': 'Log ingestion queue is full, retry later'})
+    response.headers['Retry-After'] = '5'
+    return response, 503
+
+
 @log_bp.route('', methods=['POST'])
 @token_required
 def create_log():
@@ -378,52 +395,147 @@ def create_log():
     # tag
     # actual_log_time
 
-    data = request.get_json()
-    device = Device.query.get(data['instance_id'])
-    project = Project.query.get(g.project_id)
-    if not device or not project:
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Invalid JSON'}), 400
+
+    if current_app.config['LOG_INGEST_MODE'] == 'queue':
+        try:
+            result = enqueue_logs(g.project_id, [data])[0]
+        except QueueFullError:
+            return queue_full_response()
+        if result['status'] != 'queued':
+            return jsonify({'error': result['error']}), 400
+        return jsonify({'message': 'Log queued', 'entry_id': result['entry_id']}), 202
+
+    result = save_logs(g.project_id, [data])[0]
+    if result['status'] == 'not_found':
         return jsonify({'error': 'Device or Project not found'}), 404
+    if result['status'] != 'created':
+        return jsonify({'error': result['error']}), 400
 
-    # handle log tag
-    tag_name = data.get('tag')
-    log_tag_id = None
-    if tag_name:
-        log_tag = LogTag.query.filter_by(project_id=g.project_id, tag=tag_name).first()
-        if not log_tag:
-            log_tag = LogTag(tag=tag_name, project_id=g.project_id)
-            db.session.add(log_tag)
-            db.session.flush()  # assign id without committing
-        log_tag_id = log_tag.id
-
-    log = DeviceLog(
-        instance_id=device.instance_id,
-        project_id=g.project_id,
-        message=data['message'],
-        level=LogLevel[data.get('level', 'INFO').upper()],
-        log_tag_id=log_tag_id,
-        actual_log_time=data.get('actual_log_time'),
-        created_at=datetime.now(timezone.utc)
-    )
+    return jsonify({'message': 'Log created', 'log_id': result['log_id']}), 201
 
-    db.session.add(log)
-    db.session.commit()
-    return jsonify({'message': 'Log created', 'log_id': log.log_id}), 201
+
+@log_bp.route('/batch', methods=['POST'])
+@token_required
+def create_logs_batch():
+    """
+    Ingest many logs in one request.
+
+    Body: {"logs": [{instance_id, message, level, tag, actual_log_time}, ...]}
+    (a bare JSON array is accepted too)
+
+    Every item gets a status in "results", in request order:
+    - created   → log_id assigned
+    - invalid   → payload rejected, do not retry as-is
+    - not_found → device not registered for this project
+    - queued    → accepted into the ingestion queue (LOG_INGEST_MODE=queue)
+
+    Returns 201 when every item was created (202 when queued), 207 otherwise.
+    """
+    data = request.get_json(silent=True)
+    items = data.get('logs') if isinstance(data, dict) else data
+
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Body must contain a non-empty "logs" array'}), 400
+
+    max_size = current_app.config['LOG_BATCH_MAX_SIZE']
+    if len(items) > max_size:
+        return jsonify({'error': f'Batch too large. Max {max_size} logs per request'}), 413
+
+    if current_app.config['LOG_INGEST_MODE'] == 'queue':
+        try:
+            results = enqueue_logs(g.project_id, items)
+        except QueueFullError:
+            return queue_full_response()
+        queued = sum(1 for r in results if r['status'] == 'queued')
+        return jsonify({
+            'queued': queued,
+            'failed': len(results) - queued,
+            'results': results,
+        }), 202 if queued == len(results) else 207
+
+    results = save_logs(g.project_id, items)
+    created = sum(1 for r in results if r['status'] == 'created')
+
+    return jsonify({
+        'created': created,
+        'failed': len(results) - created,
+        'results': results,
+    }), 201 if created == len(results) else 207
 
 
 @log_bp.route('', methods=['GET'])
+@log_bp.route('/export', methods=['GET'])
 @token_required
-def get_logs():
-    logs = DeviceLog.query.all()
-    return jsonify([{
-        'log_id': l.log_id,
-        'project_id': l.project_id,
-        'instance_id': l.instance_id,
-        'message': l.message,
-        'level': l.level.name,
-        'tag': l.log_tag.tag,
-        'actual_log_time': to_iso_utc(l.actual_log_time),
-        'created_at': to_iso_utc(l.created_at)
-    } for l in logs])
+@statement_timeout(Config.LOG_EXPORT_STATEMENT_TIMEOUT_MS)
+@use_replica
+def export_logs():
+    """
+    Stream the project's logs, oldest first, without loading them in memory.
+
+    Optional:
+    - format (ndjson | csv), default ndjson
+    - start, end: ISO datetimes, end exclusive
+    - level (INFO | WARNING | ERROR)
+    - log_tag_id
+    - instance_id
+    - gzip (true | false), default true when the client sends Accept-Encoding: gzip
+
+    Example:
+    GET /logs/export?format=csv&start=2026-06-01T00:00:00Z&end=2026-07-01T00:00:00Z
+    curl --compressed -H "Authorization: ..." "/api/logs/export?level=ERROR" > errors.ndjson
+    """
+    project_id = g.project_id
+    export_format = request.args.get("format", "ndjson").lower()
+
+    if export_format not in ("ndjson", "csv"):
+        return jsonify({"error": "Invalid format. Use ndjson or csv"}), 400
+
+    try:
+        start_dt = parse_iso_datetime(request.args["start"]) if request.args.get("start") else None
+        end_dt = parse_iso_datetime(request.args["end"]) if request.args.get("end") else None
+    except ValueError:
+        return jsonify({"error": "Invalid datetime format. Use ISO 8601 UTC"}), 400
+
+    level = None
+    if request.args.get("level"):
+        try:
+            level = LogLevel(request.args["level"].upper())
+        except ValueError:
+            return jsonify({"error": "Invalid Log level"}), 400
+
+    log_tag_id = request.args.get("log_tag_id")
+    if log_tag_id is not None:
+        try:
+            log_tag_id = int(log_tag_id)
+        except ValueError:
+            return jsonify({"error": "Invalid log_tag_id"}), 400
+
+    query = build_export_query(
+        project_id, start_dt=start_dt, end_dt=end_dt, level=level,
+        log_tag_id=log_tag_id, instance_id=request.args.get("instance_id"),
+    )
+    result = open_export(query, current_app.config["LOG_EXPORT_BATCH_SIZE"])
+
+    chunks = ndjson_chunks(result) if export_format == "ndjson" else csv_chunks(result)
+    mimetype = "application/x-ndjson" if export_format == "ndjson" else "text/csv"
+    headers = {
+        "Content-Disposition": f'attachment; filename="logs-{project_id}.{export_format}"',
+        "Vary": "Accept-Encoding",
+    }
+
+    gzip_param = request.args.get("gzip")
+    if gzip_param is None:
+        compress = "gzip" in request.accept_encodings
+    else:
+        compress = gzip_param.lower() == "true"
+    if compress:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
 
 @log_bp.route('/<int:log_id>', methods=['PUT'])
 @token_required
@@ -434,17 +546,132 @@ def update_log(log_id):
     if 'level' in data:
         log.level = LogLevel[data['level']]
     db.session.commit()
+    mark_stale([log.actual_log_time.date()])
+    invalidate_project_responses(log.project_id, "logs")
     return jsonify({'message': 'Log updated'})
 
 @log_bp.route('/<int:log_id>', methods=['DELETE'])
 @token_required
 def delete_log(log_id):
     log = DeviceLog.query.get_or_404(log_id)
+    project_id, day = log.project_id, log.actual_log_time.date()
     db.session.delete(log)
     db.session.commit()
+    mark_stale([day])
+    invalidate_project_responses(project_id, "logs")
     return jsonify({'message': 'Log deleted'})
 
 
+@log_bp.route('/search', methods=['GET'])
+@token_required
+@statement_timeout(Config.DB_REPORT_STATEMENT_TIMEOUT_MS)
+@use_replica
+def search_logs():
+    """
+    Project-wide full text search over log messages, best matches first.
+
+    Required:
+    - q: search terms, web search syntax ("quoted phrase", -exclude, or)
+
+    Optional:
+    - start_date / end_date ISO datetime
+    - instance_id
+    - level (INFO | WARNING | ERROR)
+    - log_tag_id
+    - limit, default 20 (max 100)
+    - cursor: next_cursor from a previous response
+
+    Example:
+    GET /logs/search?q="connection reset" -timeout&level=ERROR&limit=50
+    """
+    project_id = g.project_id
+    q = (request.args.get("q") or "").strip()
+    instance_id = request.args.get("instance_id")
+    level = request.args.get("level")
+    log_tag_id = request.args.get("log_tag_id", type=int)
+    limit = min(max(request.args.get("limit", default=20, type=int), 1), 100)
+    cursor = request.args.get("cursor")
+
+    if not q:
+        return jsonify({"error": "Missing required parameter: q"}), 400
+
+    ts_query = func.websearch_to_tsquery('simple', q)
+    rank = cast(func.ts_rank(DeviceLog.message_tsv, ts_query), Float)
+
+    query = (
+        db.session.query(
+            DeviceLog.log_id,
+            DeviceLog.instance_id,
+            DeviceLog.level,
+            DeviceLog.actual_log_time,
+            DeviceLog.created_at,
+            LogTag.tag,
+            rank.label("rank"),
+            func.ts_headline(
+                'simple', DeviceLog.message, ts_query,
+                'StartSel=<mark>, StopSel=</mark>, MaxFragments=3, MaxWords=30, MinWords=10'
+            ).label("highlight"),
+        )
+        .outerjoin(LogTag, LogTag.id == DeviceLog.log_tag_id)
+        .filter(
+            DeviceLog.project_id == project_id,
+            DeviceLog.message_tsv.op("@@")(ts_query),
+        )
+    )
+
+    try:
+        if request.args.get("start_date"):
+            query = query.filter(DeviceLog.actual_log_time >= parse_iso_datetime(request.args["start_date"]))
+        if request.args.get("end_date"):
+            query = query.filter(DeviceLog.actual_log_time < parse_iso_datetime(request.args["end_date"]))
+    except ValueError:
+        return jsonify({"error": "Invalid date format. Use ISO format, e.g. 2026-06-06T16:00:00.000Z"}), 400
+
+    if instance_id:
+        query = query.filter(DeviceLog.instance_id == instance_id)
+
+    if level:
+        try:
+            query = query.filter(DeviceLog.level == LogLevel(level.upper()))
+        except ValueError:
+            return jsonify({"error": "Invalid level"}), 400
+
+    if log_tag_id:
+        query = query.filter(DeviceLog.log_tag_id == log_tag_id)
+
+    if cursor:
+        try:
+            cursor_rank, cursor_id = decode_rank_cursor(cursor)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        query = query.filter(tuple_(rank, DeviceLog.log_id) < tuple_(cursor_rank, cursor_id))
+
+    rows = query.order_by(rank.desc(), DeviceLog.log_id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    actual_log_times = to_iso_utc_many([row.actual_log_time for row in rows])
+    created_ats = to_iso_utc_many([row.created_at for row in rows])
+
+    return jsonify({
+        "results": [
+            {
+                "log_id": row.log_id,
+                "instance_id": row.instance_id,
+                "project_id": project_id,
+                "level": row.level.value if row.level else None,
+                "tag": row.tag,
+                "highlight": row.highlight,
+                "rank": row.rank,
+                "actual_log_time": actual_log_time,
+                "created_at": created_at,
+            }
+            for row, actual_log_time, created_at in zip(rows, actual_log_times, created_ats)
+        ],
+        "next_cursor": encode_rank_cursor(rows[-1].rank, rows[-1].log_id) if has_more else None,
+        "query": q,
+    })
+
+
 @log_bp.route('/log-position', methods=['GET'])
 @token_required
 def get_log_page_position():
@@ -457,9 +684,17 @@ def get_log_page_position():
     - instance_id
     - log_id
     - limit
+    - mode (page | window), default page
+
+    Window mode returns the logs around the target with two index seeks
+    instead of counting, plus cursors for /logs/by-instance to keep scrolling:
+    - before: number of newer logs, default 10 (max 100)
+    - after: number of older logs, default 10 (max 100)
+    - position (none | estimate | exact), default none
 
     Example:
     GET /logs/log-position?instance_id=abc123&log_id=55&limit=20
+    GET /logs/log-position?instance_id=abc123&log_id=55&mode=window&before=20&after=20
     """
 
     project_id = g.project_id
@@ -467,6 +702,7 @@ def get_log_page_position():
     instance_id = request.args.get("instance_id")
     log_id = request.args.get("log_id", type=int)
     limit = request.args.get("limit", default=20, type=int)
+    mode = request.args.get("mode", "page")
 
     if not instance_id:
         return jsonify({"error": "Missing instance_id"}), 400
@@ -475,27 +711,21 @@ def get_log_page_position():
         return jsonify({"error": "Missing log_id"}), 400
 
     # validate log exists
-    target_log = (
-        db.session.query(DeviceLog)
-        .join(Device, Device.instance_id == DeviceLog.instance_id)
-        .filter(
-            Device.project_id == project_id,
-            DeviceLog.instance_id == instance_id,
-            DeviceLog.log_id == log_id
-        )
-        .first()
-    )
+    base_query = log_rows_query(project_id).filter(DeviceLog.instance_id == instance_id)
+    target_log = base_query.filter(DeviceLog.log_id == log_id).first()
 
     if not target_log:
         return jsonify({"error": "Log not found"}), 404
 
+    if mode == "window":
+        return get_log_window(base_query, target_log)
+
     # count logs BEFORE this log
     # ordering: newest first
     logs_before = (
         db.session.query(func.count(DeviceLog.log_id))
-        .join(Device, Device.instance_id == DeviceLog.instance_id)
         .filter(
-            Device.project_id == project_id,
+            DeviceLog.project_id == project_id,
             DeviceLog.instance_id == instance_id,
             (
                 (DeviceLog.actual_log_time > target_log.actual_log_time)
@@ -514,17 +744,9 @@ def get_log_page_position():
     page = (logs_before // limit) + 1
 
     # fetch logs for that page
-    query = (
-        db.session.query(DeviceLog)
-        .join(Device, Device.instance_id == DeviceLog.instance_id)
-        .filter(
-            Device.project_id == project_id,
-            DeviceLog.instance_id == instance_id
-        )
-        .order_by(
-            desc(DeviceLog.actual_log_time),
-            desc(DeviceLog.log_id)
-        )
+    query = base_query.order_by(
+        desc(DeviceLog.actual_log_time),
+        desc(DeviceLog.log_id)
     )
 
     total_items = query.count()
@@ -559,18 +781,7 @@ def get_log_page_position():
         }
         
         
-    logs_data = [
-        {
-            "log_id": log.log_id,
-            "instance_id": log.instance_id,
-            "level": log.level.value if log.level else None,
-            "tag": getattr(log.log_tag, "tag", None),
-            "message": log.message,
-            "actual_log_time": to_iso_utc(log.actual_log_time),
-            "created_at": to_iso_utc(log.created_at),
-        }
-        for log in logs
-    ]
+    logs_data = serialize_log_rows(logs)
     return jsonify({
         "device": device_info,
         "log_id": log_id,
@@ -580,3 +791,41 @@ def get_log_page_position():
         "logs_before": logs_before,
         "logs": logs_data,
     })
+
+
+def get_log_window(base_query, target_log):
+    before = min(max(request.args.get("before", default=10, type=int), 0), 100)
+    after = min(max(request.args.get("after", default=10, type=int), 0), 100)
+    position = request.args.get("position", "none")
+
+    if position not in ("none", "estimate", "exact"):
+        return jsonify({"error": "Invalid position. Use none, estimate or exact"}), 400
+
+    t, target_id = target_log.actual_log_time, target_log.log_id
+
+    newer, has_newer = seek_logs(base_query, t, target_id, "prev", before)
+    older, has_older = seek_logs(base_query, t, target_id, "next", after)
+    logs = newer + [target_log] + older
+
+    position_data = None
+    if position != "none":
+        newer_query = keyset_filter(base_query, t, target_id, "prev")
+        if position == "exact":
+            logs_before = newer_query.count()
+            total_items = base_query.count()
+        else:
+            logs_before = estimate_count(newer_query)
+            total_items = estimate_count(base_query)
+        position_data = {
+            "logs_before": logs_before,
+            "total_items": total_items,
+            "is_estimate": position == "estimate",
+        }
+
+    return jsonify({
+        "log_id": target_id,
+        "logs": serialize_log_rows(logs),
+        "prev_cursor": encode_cursor(logs[0].actual_log_time, logs[0].log_id, "prev") if has_newer else None,
+        "next_cursor": encode_cursor(logs[-1].actual_log_time, logs[-1].log_id, "next") if has_older else None,
+        "position": position_data,
+    })
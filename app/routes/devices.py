@@ -1,25 +1,24 @@
 from flask import Blueprint, request, jsonify
 from app import db
-from app.models import Device, Project, DeviceLog, Platform, DeviceSession, LogLevel
+from app.models import Device, Project, Platform, LogLevel
 from datetime import datetime,timezone,timedelta
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import case, func, distinct
+from sqlalchemy import func
 from app.middleware.auth import token_required
+from app.config import Config
+from app.utils.db_session import statement_timeout, use_replica
+from response_cache import cached_response, invalidate_project_responses
 from flask import g
-from app.services.devices_services import save_or_update_device
-from app.services.device_sessions_services import save_session
-from app.utils.date_util import to_iso_utc
-from geoip2.database import Reader
+from app.services.devices_services import device_activity_subqueries, init_device
+from app.services.log_rollups_services import summarize_by_country
+from app.services.log_sketches_services import HLL_STANDARD_ERROR, approx_distinct_devices, error_bounds
+from app.services.geoip_services import lookup_country
+from app.utils.date_util import to_iso_utc_many
 
-import os
 import traceback
 
 device_bp = Blueprint('devices', __name__)
 
-geo_path = os.getenv('GEO_LITE')
-geoip_reader = Reader(geo_path)
-#geoip_reader = Reader('/usr/share/GeoIP/GeoLite2-Country.mmdb')
-
 @device_bp.route('/init',methods =['POST'])
 @token_required
 def initialize_device():
@@ -36,25 +35,26 @@ def initialize_device():
         return {"error": "Invalid JSON"}, 400
 
     data['project_id'] = g.project_id
+    # Retried inits with the same key record a single session
+    data.setdefault('idempotency_key', request.headers.get('Idempotency-Key'))
     
     # 1️⃣ Get the client IP
     # Flask sees the IP from Nginx using ProxyFix
     client_ip = request.remote_addr
 
 
-    # 2️⃣ Lookup country
-    try:
-        response = geoip_reader.country(client_ip)
-        country = response.country.name or "unknown"  # e.g., "PH" for Philippines
-        #country = response.country.iso_code
-        data['country'] = country
-    except Exception as e:
-        data['country'] = None  # fallback if IP is private or not in DB
+    # 2️⃣ Lookup country (cached, None if the IP is private or not in the DB)
+    data['country'] = lookup_country(client_ip)
      
+    if not data.get('instance_id'):
+        return jsonify({'error': 'instance_id is required'}), 400
+
     try:
-        save_or_update_device(data)
-        save_session(data)
+        init_device(data)
+        invalidate_project_responses(g.project_id, "devices")
         return jsonify({'message': 'Device initiated successfully!',}), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except IntegrityError:
         db.session.rollback()
         return jsonify({'error': 'Invalid'}), 400
@@ -78,10 +78,14 @@ def create_device():
     )
     db.session.add(device)
     db.session.commit()
+    invalidate_project_responses(device.project_id, "devices")
     return jsonify({'message': 'Device created', 'instance_id': device.instance_id}), 201
 
 @device_bp.route('', methods=['GET'])
 @token_required
+@cached_response("devices", scopes=("logs", "devices"))
+@statement_timeout(Config.DB_REPORT_STATEMENT_TIMEOUT_MS)
+@use_replica
 def get_devices():
     project_id = g.project_id
     start_str = request.args.get("start")
@@ -115,56 +119,26 @@ def get_devices():
     except Exception:
         return jsonify({"error": "Invalid datetime format"}), 400
 
-    # Subqueries
-    log_query = (
-        db.session.query(
-            DeviceLog.instance_id,
-            func.sum(
-                case((DeviceLog.level == LogLevel.ERROR, 1), else_=0)
-            ).label("error_count"),
-            func.count(func.distinct(DeviceLog.log_id)).label("log_count"),
-            func.count(
-                case((DeviceLog.log_tag_id.isnot(None), DeviceLog.log_tag_id), else_=None)
-            ).label("action_count"),
-        )
-        .filter(
-            DeviceLog.actual_log_time >= start_dt,
-            DeviceLog.actual_log_time < end_dt
-        )
-    )
-    
-    
-    # Filter by LogTag ID
+    # Filters on the aggregated logs
+    tag_filter = None
     if log_tag_id:
         try:
-            log_query = log_query.filter(DeviceLog.log_tag_id == int(log_tag_id))
+            tag_filter = int(log_tag_id)
         except ValueError:
             return jsonify({"error": "Invalid log_tag_id"}), 400
 
-    # Apply log level filter BEFORE subquery()
+    log_level_enum = None
     if log_level:
         try:
             log_level_enum = LogLevel(log_level.upper())
-            log_query = log_query.filter(DeviceLog.level == log_level_enum)
         except ValueError:
             print("Invalid log level:", log_level)
             traceback.print_exc()
             return jsonify({"error": "Invalid Log level"}), 400
 
-    # Now group and convert to subquery
-    log_subq = log_query.group_by(DeviceLog.instance_id).subquery()
-
-    session_subq = (
-        db.session.query(
-            DeviceSession.instance_id,
-            func.count(func.distinct(DeviceSession.id)).label("session_count")
-        )
-        .filter(
-            DeviceSession.actual_log_time >= start_dt,
-            DeviceSession.actual_log_time < end_dt
-        )
-        .group_by(DeviceSession.instance_id)
-        .subquery()
+    # Subqueries, aggregated for this project only
+    log_subq, session_subq = device_activity_subqueries(
+        project_id, start_dt, end_dt, log_tag_id=tag_filter, level=log_level_enum
     )
 
     # Main query
@@ -234,8 +208,15 @@ def get_devices():
     total_items = query.count()
     results = query.offset((page - 1) * per_page).limit(per_page).all()
 
+    devices = [row[0] for row in results]
+    created_ats = to_iso_utc_many([device.created_at for device in devices])
+    last_updateds = to_iso_utc_many([device.last_updated for device in devices])
+    watch_dates = to_iso_utc_many([device.watch_date for device in devices])
+
     devices_data = []
-    for device, total_logs, total_errors, total_sessions, total_actions in results:
+    for (device, total_logs, total_errors, total_sessions, total_actions), created_at, last_updated, watch_date in zip(
+        results, created_ats, last_updateds, watch_dates
+    ):
         devices_data.append({
             "instance_id": device.instance_id,
             "device_id": device.device_id,
@@ -244,13 +225,13 @@ def get_devices():
             "country": device.country or "na",
             "model": device.model,
             "platform": device.platform.value if device.platform else None,
-            "created_at": to_iso_utc(device.created_at),
-            "last_updated": to_iso_utc(device.last_updated),
+            "created_at": created_at,
+            "last_updated": last_updated,
             "total_logs": int(total_logs),
             "total_sessions": int(total_sessions),
             "total_actions": int(total_actions),
             "total_errors": int(total_errors),
-            "watch_date": to_iso_utc(device.watch_date) if device.watch_date else None,
+            "watch_date": watch_date,
             "app_version": device.app_version,
             "language":device.language,
         })
@@ -273,12 +254,15 @@ def get_devices():
 
 @device_bp.route('/devices-by-country', methods=['GET'])
 @token_required
+@statement_timeout(Config.DB_REPORT_STATEMENT_TIMEOUT_MS)
+@use_replica
 def devices_by_country():
     """
     Query params:
       - project_id (required)
       - start_time (optional, ISO 8601)
       - end_time (optional, ISO 8601)
+      - approx (optional, "true" → HyperLogLog estimates with 95% bounds, whole hours)
 
     Behavior:
       - If start_time AND end_time exist → count devices based on logs
@@ -288,6 +272,8 @@ def devices_by_country():
     project_id = g.project_id
     start_time = request.args.get("start_time")
     end_time = request.args.get("end_time")
+    approx = request.args.get("approx", "false").lower() == "true"
+    device_estimates = None
 
     if not project_id:
         return jsonify({"error": "project_id is required"}), 400
@@ -317,22 +303,30 @@ def devices_by_country():
         except ValueError:
             return jsonify({"error": "Invalid datetime format"}), 400
 
-        results = (
-            db.session.query(
-                Device.country.label("country"),
-                func.count(distinct(Device.instance_id)).label("device_count"),
-            )
-            .join(DeviceLog, DeviceLog.instance_id == Device.instance_id)
-            .filter(DeviceLog.project_id == project_id)
-            .filter(DeviceLog.actual_log_time.between(start_time, end_time))
-            .group_by(Device.country)
-            .order_by(func.count(distinct(Device.instance_id)).desc())
-            .all()
-        )
+        # approx=true: distinct devices from the hourly HyperLogLog sketches
+        if approx:
+            device_estimates = approx_distinct_devices(project_id, "country", start_time, end_time)
+
+        if device_estimates is not None:
+            results = []
+        else:
+            # Whole hours come from log_hourly_rollups, partial-hour edges from device_logs
+            results = summarize_by_country(project_id, start_time, end_time)
 
     # -------------------------------------------------
     # Response formatting
     # -------------------------------------------------
+    if device_estimates is not None:
+        response = [
+            {
+                "country": country or "UNKNOWN",
+                "device_count": count,
+                "device_count_bounds": error_bounds(count),
+            }
+            for country, count in sorted(device_estimates.items(), key=lambda item: -item[1])
+        ]
+        return jsonify(response), 200, {"X-Approximation": "hyperloglog; relative_standard_error=%s" % HLL_STANDARD_ERROR}
+
     response = [
         {
             "country": row.country or "UNKNOWN",
@@ -384,6 +378,7 @@ def update_device(instance_id):
     device.last_updated = datetime.now(timezone.utc)
 
     db.session.commit()
+    invalidate_project_responses(device.project_id, "devices")
 
     return jsonify({'message': 'Device updated'})
 
@@ -393,6 +388,7 @@ def delete_device(instance_id):
     device = Device.query.get_or_404(instance_id)
     db.session.delete(device)
     db.session.commit()
+    invalidate_project_responses(device.project_id, "devices")
     return jsonify({'message': 'Device deleted'})
 
 
@@ -424,6 +420,7 @@ def update_watch_date():
     # update watch_date
     device.watch_date = watch_date
     db.session.commit()
+    invalidate_project_responses(device.project_id, "devices")
 
     return jsonify({
         "message": "watch_date updated successfully",
@@ -434,6 +431,7 @@ def update_watch_date():
     
 @device_bp.route('/countries', methods=['GET'])
 @token_required
+@use_replica
 def get_countries():
     project_id = g.project_id
 
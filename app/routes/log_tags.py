@@ -1,20 +1,28 @@
 from flask import Blueprint, request, jsonify,g
 from sqlalchemy.exc import IntegrityError
 from app import db
-from sqlalchemy import func
-from app.models import DeviceLog, LogTag
+from app.models import LogTag
 from datetime import datetime,timezone,timedelta
 from app.middleware.auth import token_required
+from app.config import Config
+from app.utils.db_session import statement_timeout, use_replica
+from response_cache import cached_response
+from app.services.log_rollups_services import summarize_by_tag
+from app.services.log_sketches_services import approx_distinct_devices, approximation_info, error_bounds
 
 log_tag_bp = Blueprint('log_tags', __name__)
 
 @log_tag_bp.route('/summary', methods=['GET'])
 @token_required
+@cached_response("log_tags_summary")
+@statement_timeout(Config.DB_REPORT_STATEMENT_TIMEOUT_MS)
+@use_replica
 def get_logs_summary():
     
     project_id = g.project_id
     start_str = request.args.get("start")
     end_str = request.args.get("end")
+    approx = request.args.get("approx", "false").lower() == "true"
 
     if not project_id:
         return jsonify({"error": "Missing required parameter: project_id"}), 400
@@ -34,36 +42,46 @@ def get_logs_summary():
             "error": "Invalid datetime format. Use ISO 8601 UTC, e.g. 2025-11-12T00:00:00Z"
         }), 400
 
-    tags_query = (
-        db.session.query(
-            LogTag.tag.label("tag"),
-            LogTag.id.label("id"),
-            func.count(DeviceLog.log_id).label("total_count"),
-            func.count(func.distinct(DeviceLog.instance_id)).label("device_count"),
-        )
-        .outerjoin(
-            DeviceLog,
-            (DeviceLog.log_tag_id == LogTag.id) &
-            (DeviceLog.actual_log_time >= start_dt) &
-            (DeviceLog.actual_log_time < end_dt)
-        )
+    # approx=true: distinct devices from the hourly HyperLogLog sketches
+    device_estimates = approx_distinct_devices(project_id, "tag", start_dt, end_dt) if approx else None
+
+    # Whole hours come from log_hourly_rollups, partial-hour edges from device_logs
+    counts = {
+        row.log_tag_id: row
+        for row in summarize_by_tag(project_id, start_dt, end_dt, count_devices=device_estimates is None)
+    }
+    tags = (
+        db.session.query(LogTag.id, LogTag.tag)
         .filter(LogTag.project_id == project_id)
-        .group_by(LogTag.id, LogTag.tag)
+        .all()
     )
 
     tag_list = [
-        {"id": row.id, "tag": row.tag, "count": row.total_count,"devices": row.device_count}
-        for row in tags_query.all()
+        {
+            "id": tag.id,
+            "tag": tag.tag,
+            "count": int(counts[tag.id].total_count) if tag.id in counts else 0,
+            "devices": int(counts[tag.id].device_count) if tag.id in counts else 0,
+        }
+        for tag in tags
     ]
 
+    if device_estimates is not None:
+        for item in tag_list:
+            item["devices"] = device_estimates.get(str(item["id"]), 0)
+            item["devices_bounds"] = error_bounds(item["devices"])
+
     tag_list.sort(key=lambda x: x["tag"])
 
-    return jsonify({
+    response = {
         "project_id": project_id,
         "start": start_str,
         "end": end_str,
         "tags": tag_list,
-    })
+    }
+    if device_estimates is not None:
+        response["approximation"] = approximation_info()
+    return jsonify(response)
 
 
 
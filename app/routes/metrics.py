@@ -0,0 +1,57 @@
+from flask import Blueprint, jsonify
+from app import db
+from app.middleware.auth import operator_required
+from app.utils.db_session import replica_status
+from app.services.log_queue_services import queue_stats
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/ingest-queue', methods=['GET'])
+@operator_required
+def get_ingest_queue_metrics():
+    """
+    Depth of the log ingestion stream and its dead-letter stream.
+
+    Example:
+    GET /api/metrics/ingest-queue
+    """
+    return jsonify(queue_stats())
+
+
+def _pool_metrics(reset):
+    pools = {}
+    for bind_key, engine in db.engines.items():
+        pool = engine.pool
+        name = bind_key or "default"
+        if hasattr(pool, "wait_stats"):
+            pools[name] = pool.wait_stats(reset=reset)
+        else:
+            pools[name] = {"status": pool.status()}
+    return {"pools": pools, "replica": replica_status(force=reset)}
+
+
+@metrics_bp.route('/db-pool', methods=['GET'])
+@operator_required
+def get_db_pool_metrics():
+    """
+    Connection pool usage and checkout wait times per engine, for this
+    worker process.
+
+    Example:
+    GET /api/metrics/db-pool
+    """
+    return jsonify(_pool_metrics(reset=False))
+
+
+@metrics_bp.route('/db-pool/reset', methods=['POST'])
+@operator_required
+def reset_db_pool_metrics():
+    """
+    Return the current pool metrics, then start a new measurement window
+    and re-probe the replica.
+
+    Example:
+    POST /api/metrics/db-pool/reset
+    """
+    return jsonify(_pool_metrics(reset=True))
@@ -1,8 +1,10 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from sqlalchemy.exc import IntegrityError
 from app import db
 from app.models import Project, User
 from datetime import datetime,timezone
+from app.middleware.auth import token_required
+from app.services.retention_services import effective_policy
 
 project_bp = Blueprint('projects', __name__)
 
@@ -62,3 +64,12 @@ def delete_project(project_id):
     db.session.delete(project)
     db.session.commit()
     return jsonify({'message': 'Project deleted'})
+
+@project_bp.route('/retention', methods=['GET'])
+@token_required
+def get_retention_policy():
+    """Retention applied to the token's project (days kept, null = forever).
+
+    Read-only: policies are set by the operator with retention.py policy.
+    """
+    return jsonify(effective_policy(g.project_id))
@@ -1,10 +1,12 @@
-from flask import Blueprint, request, jsonify,g
+from flask import Blueprint, request, jsonify, g, current_app
 from sqlalchemy.exc import IntegrityError
 from app import db
 from app.models import DeviceSession
 from datetime import datetime,timezone,timedelta
 from app.middleware.auth import token_required
-from app.utils.date_util import to_iso_utc
+from app.utils.date_util import to_iso_utc_many
+from app.services.device_sessions_services import save_sessions
+from response_cache import invalidate_project_responses
 
 sessions_bp = Blueprint('sessions', __name__)
 
@@ -50,12 +52,51 @@ def get_sessions_by_instance():
 
     result = [
         {
-            "actual_log_time": to_iso_utc(row.actual_log_time),
+            "actual_log_time": actual_log_time,
         }
-        for row in query.all()
+        for actual_log_time in to_iso_utc_many([row.actual_log_time for row in query.all()])
     ]
 
     return jsonify(result)
 
 
+@sessions_bp.route('/batch', methods=['POST'])
+@token_required
+def create_sessions_batch():
+    """
+    Record session starts cached offline by the SDK.
+
+    Body: {"sessions": [{instance_id, actual_log_time, idempotency_key?}, ...]}
+    (a bare JSON array is accepted too)
+
+    Every item gets a status in "results", in request order:
+    - created   → session_id assigned
+    - duplicate → already recorded (same idempotency_key, or within
+                  DEVICE_SESSION_DEDUP_SECONDS of another start), safe to drop
+    - invalid   → payload rejected, do not retry as-is
+    - not_found → device not registered for this project
+
+    Returns 201 when every item was created or a duplicate, 207 otherwise.
+    """
+    data = request.get_json(silent=True)
+    items = data.get('sessions') if isinstance(data, dict) else data
+
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Body must contain a non-empty "sessions" array'}), 400
+
+    max_size = current_app.config['SESSION_BATCH_MAX_SIZE']
+    if len(items) > max_size:
+        return jsonify({'error': f'Batch too large. Max {max_size} sessions per request'}), 413
+
+    results = save_sessions(g.project_id, items)
+    created = sum(1 for r in results if r['status'] == 'created')
+    duplicates = sum(1 for r in results if r['status'] == 'duplicate')
+    if created:
+        invalidate_project_responses(g.project_id, "devices")
 
+    return jsonify({
+        'created': created,
+        'duplicates': duplicates,
+        'failed': len(results) - created - duplicates,
+        'results': results,
+    }), 201 if created + duplicates == len(results) else 207
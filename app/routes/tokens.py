@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from sqlalchemy.exc import IntegrityError
 from app import db
 from app.models import Token,TokenStatus,User,Project
+# Registers the listeners that revoke cached sessions of deactivated tokens
+from app.services import tokens_services  # noqa: F401
 from datetime import datetime,timezone
 
 token_bp = Blueprint('tokens', __name__)
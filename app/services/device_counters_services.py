@@ -0,0 +1,180 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app import db
+from app.models import DeviceDailyCounter, DeviceLog, DeviceSession, LogLevel, Project
+
+DAY = timedelta(days=1)
+COUNTER_FIELDS = ('log_count', 'error_count', 'action_count', 'session_count')
+
+# pg_advisory_xact_lock(COUNTER_LOCK_KEY, project_id): ingest takes it shared,
+# rebuild_device_counters exclusive, so a rebuild only holds up its own project
+COUNTER_LOCK_KEY = 7410002
+
+
+def floor_day(dt):
+    """Midnight UTC at or before ``dt``."""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc)
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def ceil_day(dt):
+    day = floor_day(dt)
+    return day if day == dt else day + DAY
+
+
+def utc_day(dt):
+    return floor_day(dt).date()
+
+
+def _upsert_counters(project_id, counts):
+    """Add ``counts`` ({(day, instance_id): {field: n}}) to the stored counters."""
+    if not counts:
+        return
+
+    db.session.execute(select(func.pg_advisory_xact_lock_shared(COUNTER_LOCK_KEY, project_id)))
+
+    # Sorted so concurrent batches lock counter rows in the same order
+    values = [
+        {
+            'project_id': project_id,
+            'day': day,
+            'instance_id': instance_id,
+            **{field: fields.get(field, 0) for field in COUNTER_FIELDS},
+        }
+        for (day, instance_id), fields in sorted(counts.items())
+    ]
+    stmt = pg_insert(DeviceDailyCounter).values(values)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['project_id', 'day', 'instance_id'],
+        set_={
+            field: getattr(DeviceDailyCounter, field) + stmt.excluded[field]
+            for field in COUNTER_FIELDS
+        },
+    ))
+
+
+def record_log_counters(project_id, rows):
+    """Add freshly inserted device_logs rows to the daily counters, in the caller's transaction."""
+    counts = defaultdict(lambda: defaultdict(int))
+    for row in rows:
+        fields = counts[(utc_day(row['actual_log_time']), row['instance_id'])]
+        fields['log_count'] += 1
+        if row['level'] == LogLevel.ERROR:
+            fields['error_count'] += 1
+        if row['log_tag_id'] is not None:
+            fields['action_count'] += 1
+    _upsert_counters(project_id, counts)
+
+
+def record_session_counters(project_id, sessions):
+    """Add recorded session starts, (instance_id, actual_log_time) pairs, to the daily counters."""
+    counts = defaultdict(lambda: defaultdict(int))
+    for instance_id, actual_log_time in sessions:
+        if actual_log_time is not None:
+            counts[(utc_day(actual_log_time), instance_id)]['session_count'] += 1
+    _upsert_counters(project_id, counts)
+
+
+def daily_counters(project_id, start_day, end_day):
+    """Counter rows of a project for the UTC days in [start_day, end_day)."""
+    return select(
+        DeviceDailyCounter.instance_id,
+        DeviceDailyCounter.log_count,
+        DeviceDailyCounter.error_count,
+        DeviceDailyCounter.action_count,
+        DeviceDailyCounter.session_count,
+    ).where(
+        DeviceDailyCounter.project_id == project_id,
+        DeviceDailyCounter.day >= start_day,
+        DeviceDailyCounter.day < end_day,
+    )
+
+
+def _rebuild_project_day(project_id, day_start):
+    day_end = day_start + DAY
+    log_day = func.date(DeviceLog.actual_log_time)
+    logs = (
+        select(
+            DeviceLog.project_id,
+            log_day,
+            DeviceLog.instance_id,
+            func.count(DeviceLog.log_id),
+            func.sum(case((DeviceLog.level == LogLevel.ERROR, 1), else_=0)),
+            func.count(DeviceLog.log_tag_id),
+        )
+        .where(
+            DeviceLog.project_id == project_id,
+            DeviceLog.actual_log_time >= day_start,
+            DeviceLog.actual_log_time < day_end,
+        )
+        .group_by(DeviceLog.project_id, log_day, DeviceLog.instance_id)
+    )
+    session_day = func.date(DeviceSession.actual_log_time)
+    sessions = (
+        select(
+            DeviceSession.project_id,
+            session_day,
+            DeviceSession.instance_id,
+            func.count(),
+        )
+        .where(
+            DeviceSession.project_id == project_id,
+            DeviceSession.actual_log_time >= day_start,
+            DeviceSession.actual_log_time < day_end,
+        )
+        .group_by(DeviceSession.project_id, session_day, DeviceSession.instance_id)
+    )
+
+    db.session.execute(select(func.pg_advisory_xact_lock(COUNTER_LOCK_KEY, project_id)))
+    db.session.execute(delete(DeviceDailyCounter).where(
+        DeviceDailyCounter.project_id == project_id,
+        DeviceDailyCounter.day == day_start.date(),
+    ))
+    stmt = pg_insert(DeviceDailyCounter).from_select(
+        ['project_id', 'day', 'instance_id', 'log_count', 'error_count', 'action_count'],
+        logs,
+    )
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['project_id', 'day', 'instance_id'],
+        set_={field: stmt.excluded[field] for field in ('log_count', 'error_count', 'action_count')},
+    ))
+    stmt = pg_insert(DeviceDailyCounter).from_select(
+        ['project_id', 'day', 'instance_id', 'session_count'],
+        sessions,
+    )
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['project_id', 'day', 'instance_id'],
+        set_={'session_count': stmt.excluded.session_count},
+    ))
+    db.session.commit()
+
+
+def rebuild_device_counters(start_dt, end_dt, project_id=None):
+    """Recompute the counters of the whole UTC days touching [start_dt, end_dt).
+
+    Backfills history and corrects drift. Rows removed by retention.py are no
+    longer counted afterwards. Only closed days are rebuilt, today is left to
+    ingest. Without ``project_id`` every project is rebuilt in turn.
+
+    Each project-day is one transaction holding that project's counter lock
+    exclusively, so only that project's ingest batches wait instead of adding
+    between the DELETE and the INSERT.
+    """
+    start_day = floor_day(start_dt)
+    end_day = min(ceil_day(end_dt), floor_day(datetime.now(timezone.utc)))
+    if start_day >= end_day:
+        return
+
+    if project_id is None:
+        project_ids = db.session.execute(select(Project.project_id).order_by(Project.project_id)).scalars().all()
+    else:
+        project_ids = [project_id]
+
+    for pid in project_ids:
+        day = start_day
+        while day < end_day:
+            _rebuild_project_day(pid, day)
+            day += DAY
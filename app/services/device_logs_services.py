@@ -0,0 +1,160 @@
+from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Device, DeviceLog, LogLevel
+from app.services.device_counters_services import record_log_counters
+from app.services.log_rollups_services import record_log_rollups
+from app.services.log_sketches_services import record_device_sketches
+from app.services.log_tags_services import invalidate_log_tag, is_log_tag_fk_violation, resolve_log_tag_ids
+from app.utils.date_util import parse_iso_datetime
+from response_cache import note_logs_ingested
+
+LOG_ID_SEQUENCE = 'device_logs_log_id_seq'
+# Length of the String(100) columns device_logs.instance_id and log_tags.tag
+MAX_KEY_LENGTH = 100
+
+
+def parse_log_payload(item):
+    """Validate a single log payload and return the normalized column values.
+
+    Raises ValueError with a client-facing message when the payload is invalid,
+    including values Postgres would reject for the whole multi-row INSERT
+    (NUL characters, strings longer than their column).
+    """
+    if not isinstance(item, dict):
+        raise ValueError("Log entry must be an object")
+
+    instance_id = item.get('instance_id')
+    if not instance_id or not isinstance(instance_id, str):
+        raise ValueError("instance_id is required")
+    if len(instance_id) > MAX_KEY_LENGTH or '\x00' in instance_id:
+        raise ValueError(f"instance_id must be at most {MAX_KEY_LENGTH} characters without NUL bytes")
+
+    message = item.get('message')
+    if message is None:
+        raise ValueError("message is required")
+    message = str(message)
+    if '\x00' in message:
+        raise ValueError("message must not contain NUL bytes")
+    max_length = current_app.config['LOG_MESSAGE_MAX_LENGTH']
+    if len(message) > max_length:
+        raise ValueError(f"message is longer than {max_length} characters")
+
+    try:
+        level = LogLevel[str(item.get('level') or 'INFO').upper()]
+    except KeyError:
+        raise ValueError("Invalid level. Use INFO, WARNING or ERROR")
+
+    actual_log_time = item.get('actual_log_time')
+    if not actual_log_time:
+        raise ValueError("actual_log_time is required")
+    try:
+        actual_log_time = parse_iso_datetime(actual_log_time)
+    except (TypeError, ValueError, AttributeError):
+        raise ValueError("Invalid actual_log_time. Use ISO 8601 UTC")
+
+    tag = item.get('tag') or None
+    if tag is not None:
+        tag = str(tag)
+        if len(tag) > MAX_KEY_LENGTH or '\x00' in tag:
+            raise ValueError(f"tag must be at most {MAX_KEY_LENGTH} characters without NUL bytes")
+
+    return {
+        'instance_id': instance_id,
+        'message': message,
+        'level': level,
+        'tag': tag,
+        'actual_log_time': actual_log_time,
+    }
+
+
+def save_logs(project_id, items):
+    """Insert a batch of logs for a project in a single transaction.
+
+    Devices and tags are resolved for the whole batch up front and rows are
+    written with one multi-row INSERT. Returns one status dict per item, in
+    the same order as ``items``, so clients can retry only the failures.
+    """
+    results = [None] * len(items)
+    parsed = []
+
+    for index, item in enumerate(items):
+        try:
+            parsed.append((index, parse_log_payload(item)))
+        except ValueError as e:
+            results[index] = {'index': index, 'status': 'invalid', 'error': str(e)}
+
+    if parsed:
+        instance_ids = {log['instance_id'] for _, log in parsed}
+        known_devices = {
+            device.instance_id: device
+            for device in db.session.execute(
+                select(Device.instance_id, Device.platform, Device.country)
+                .where(Device.project_id == project_id, Device.instance_id.in_(instance_ids))
+            )
+        }
+
+        accepted = []
+        for index, log in parsed:
+            if log['instance_id'] in known_devices:
+                accepted.append((index, log))
+            else:
+                results[index] = {'index': index, 'status': 'not_found', 'error': 'Device not found'}
+        parsed = accepted
+
+    if parsed:
+        for attempt in range(2):
+            try:
+                rows, log_ids = _insert_logs(project_id, parsed, known_devices)
+                break
+            except IntegrityError as e:
+                if attempt or not is_log_tag_fk_violation(e):
+                    raise
+                # Another process deleted a tag this worker still had cached
+                db.session.rollback()
+                for tag in {log['tag'] for _, log in parsed if log['tag']}:
+                    invalidate_log_tag(project_id, tag)
+
+        for (index, _), log_id in zip(parsed, log_ids):
+            results[index] = {'index': index, 'status': 'created', 'log_id': log_id}
+
+    db.session.commit()
+
+    if parsed:
+        record_device_sketches(project_id, rows, known_devices)
+        note_logs_ingested(project_id, min(log['actual_log_time'] for _, log in parsed))
+    return results
+
+
+def _insert_logs(project_id, parsed, known_devices):
+    """INSERT the parsed logs and their rollups/counters, returns (rows, log_ids)."""
+    tag_ids = resolve_log_tag_ids(project_id, (log['tag'] for _, log in parsed if log['tag']))
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            'project_id': project_id,
+            'instance_id': log['instance_id'],
+            'message': log['message'],
+            'level': log['level'],
+            'log_tag_id': tag_ids.get(log['tag']),
+            'actual_log_time': log['actual_log_time'],
+            'created_at': now,
+        }
+        for _, log in parsed
+    ]
+
+    # Ids are drawn from the sequence up front so the multi-row INSERT
+    # needs no RETURNING and each result maps to its item deterministically.
+    log_ids = db.session.scalars(
+        select(func.nextval(LOG_ID_SEQUENCE))
+        .select_from(func.generate_series(1, len(rows)))
+    ).all()
+    for row, log_id in zip(rows, log_ids):
+        row['log_id'] = log_id
+
+    db.session.execute(insert(DeviceLog), rows)
+    record_log_rollups(project_id, rows, known_devices)
+    record_log_counters(project_id, rows)
+    return rows, log_ids
@@ -1,12 +1,199 @@
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import DateTime, Integer, String, bindparam, column, exists, func, literal, select, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app import db
-from app.models import DeviceSession
+from app.models import Device, DeviceSession
+from app.services.device_counters_services import record_session_counters
+from app.utils.date_util import parse_iso_datetime
 
+SESSION_ID_SEQUENCE = 'device_sessions_id_seq'
 
-def save_session(data):
-    session = DeviceSession(
-        instance_id = data.get('instance_id'),
-        actual_log_time= data.get('actual_log_time'),
+
+def _dedup_window():
+    return timedelta(seconds=current_app.config['DEVICE_SESSION_DEDUP_SECONDS'])
+
+
+def _no_recent_session(instance_id, actual_log_time, window):
+    """NOT EXISTS a session of the instance within ``window`` of actual_log_time."""
+    return ~exists().where(
+        DeviceSession.instance_id == instance_id,
+        DeviceSession.actual_log_time > actual_log_time - window,
+        DeviceSession.actual_log_time < actual_log_time + window,
+    )
+
+
+def _on_conflict_ignore(stmt):
+    # A retried start with the same idempotency key is a no-op
+    return stmt.on_conflict_do_nothing(
+        index_elements=[DeviceSession.instance_id, DeviceSession.idempotency_key],
+        index_where=DeviceSession.idempotency_key.isnot(None),
+    )
+
+
+def build_session_insert(instance_id, project_id, actual_log_time, idempotency_key=None):
+    """INSERT ... SELECT for one session row, skipped when it is a duplicate.
+
+    ``instance_id`` and ``project_id`` may be columns of a CTE (see
+    init_device) so the session is written in the same statement as the
+    device upsert. Nothing is inserted when the instance already has a
+    session within DEVICE_SESSION_DEDUP_SECONDS, or one with the same
+    idempotency key. Raises ValueError for an unparseable actual_log_time.
+    """
+    if isinstance(actual_log_time, str):
+        actual_log_time = parse_iso_datetime(actual_log_time)
+
+    log_time = literal(actual_log_time, DeviceSession.actual_log_time.type)
+    source = select(
+        instance_id,
+        project_id,
+        log_time,
+        literal(idempotency_key, DeviceSession.idempotency_key.type),
+        literal(datetime.now(timezone.utc), DeviceSession.created_at.type),
     )
-    
-    db.session.add(session);
-    db.session.commit();
\ No newline at end of file
+    window = _dedup_window()
+    if window and actual_log_time is not None:
+        source = source.where(_no_recent_session(instance_id, log_time, window))
+
+    return _on_conflict_ignore(pg_insert(DeviceSession).from_select(
+        ['instance_id', 'project_id', 'actual_log_time', 'idempotency_key', 'created_at'],
+        source,
+    ))
+
+
+def parse_idempotency_key(value):
+    """Normalize an idempotency key, None when absent. Raises ValueError."""
+    if value is not None and (not isinstance(value, str) or len(value) > 100):
+        raise ValueError("idempotency_key must be a string of at most 100 characters")
+    return value or None
+
+
+def parse_session_payload(item):
+    """Validate one session start and return normalized values. Raises ValueError."""
+    if not isinstance(item, dict):
+        raise ValueError("Session must be an object")
+    instance_id = item.get('instance_id')
+    if not instance_id or not isinstance(instance_id, str):
+        raise ValueError("instance_id is required")
+    if not item.get('actual_log_time'):
+        raise ValueError("actual_log_time is required")
+    try:
+        actual_log_time = parse_iso_datetime(item['actual_log_time'])
+    except (TypeError, ValueError):
+        raise ValueError("Invalid actual_log_time, use ISO 8601")
+    return {
+        'instance_id': instance_id,
+        'actual_log_time': actual_log_time,
+        'idempotency_key': parse_idempotency_key(item.get('idempotency_key')),
+    }
+
+
+def save_sessions(project_id, items):
+    """Record a batch of session starts (e.g. replayed by an offline SDK).
+
+    Starts closer than DEVICE_SESSION_DEDUP_SECONDS to a kept start of the
+    same instance, in the batch or already stored, and repeated idempotency
+    keys are reported as duplicates instead of inserted. One INSERT for the
+    batch. Returns one status dict per item, in request order.
+    """
+    results = [None] * len(items)
+    parsed = []
+
+    for index, item in enumerate(items):
+        try:
+            parsed.append((index, parse_session_payload(item)))
+        except ValueError as e:
+            results[index] = {'index': index, 'status': 'invalid', 'error': str(e)}
+
+    if parsed:
+        known = set(db.session.scalars(
+            select(Device.instance_id).where(
+                Device.project_id == project_id,
+                Device.instance_id.in_({s['instance_id'] for _, s in parsed}),
+            )
+        ))
+        accepted = []
+        for index, session in parsed:
+            if session['instance_id'] in known:
+                accepted.append((index, session))
+            else:
+                results[index] = {'index': index, 'status': 'not_found', 'error': 'Device not found'}
+        parsed = accepted
+
+    # Collapse the batch itself: relaunch bursts and repeated keys
+    window = _dedup_window()
+    kept = []
+    last_kept = {}
+    seen_keys = set()
+    for index, session in sorted(parsed, key=lambda p: (p[1]['instance_id'], p[1]['actual_log_time'])):
+        instance_id, log_time, key = session['instance_id'], session['actual_log_time'], session['idempotency_key']
+        previous = last_kept.get(instance_id)
+        if key and (instance_id, key) in seen_keys:
+            results[index] = {'index': index, 'status': 'duplicate', 'reason': 'idempotency_key'}
+        elif window and previous is not None and log_time - previous < window:
+            results[index] = {'index': index, 'status': 'duplicate', 'reason': 'window'}
+        else:
+            kept.append((index, session))
+            last_kept[instance_id] = log_time
+            if key:
+                seen_keys.add((instance_id, key))
+
+    if kept:
+        # Ids drawn up front, RETURNING id then tells which rows went in
+        session_ids = db.session.scalars(
+            select(func.nextval(SESSION_ID_SEQUENCE)).select_from(func.generate_series(1, len(kept)))
+        ).all()
+        now = datetime.now(timezone.utc)
+        rows = values(
+            column('id', Integer),
+            column('instance_id', String),
+            column('actual_log_time', DateTime),
+            column('idempotency_key', String),
+            name='new_sessions',
+        ).data([
+            (session_id, s['instance_id'], s['actual_log_time'], s['idempotency_key'])
+            for session_id, (_, s) in zip(session_ids, kept)
+        ])
+        source = select(
+            rows.c.id,
+            rows.c.instance_id,
+            literal(project_id, Integer),
+            rows.c.actual_log_time,
+            rows.c.idempotency_key,
+            literal(now, DeviceSession.created_at.type),
+        )
+        if window:
+            source = source.where(_no_recent_session(rows.c.instance_id, rows.c.actual_log_time, window))
+
+        stmt = _on_conflict_ignore(pg_insert(DeviceSession).from_select(
+            ['id', 'instance_id', 'project_id', 'actual_log_time', 'idempotency_key', 'created_at'],
+            source,
+        )).returning(DeviceSession.id)
+        inserted = set(db.session.scalars(stmt))
+
+        latest = {}
+        for (index, session), session_id in zip(kept, session_ids):
+            if session_id in inserted:
+                results[index] = {'index': index, 'status': 'created', 'session_id': session_id}
+                instance_id = session['instance_id']
+                latest[instance_id] = max(latest.get(instance_id, session['actual_log_time']), session['actual_log_time'])
+            else:
+                results[index] = {'index': index, 'status': 'duplicate', 'reason': 'stored'}
+
+        record_session_counters(project_id, (
+            (session['instance_id'], session['actual_log_time'])
+            for (_, session), session_id in zip(kept, session_ids)
+            if session_id in inserted
+        ))
+
+        if latest:
+            devices = Device.__table__
+            db.session.execute(
+                update(devices)
+                .where(devices.c.instance_id == bindparam('b_instance_id'))
+                .values(last_updated=func.greatest(devices.c.last_updated, bindparam('b_last_updated'))),
+                [{'b_instance_id': i, 'b_last_updated': t} for i, t in latest.items()],
+            )
+
+    db.session.commit()
+    return results
@@ -1,26 +1,160 @@
+from datetime import datetime, timezone
+from sqlalchemy import and_, case, func, or_, select, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app import db
-from app.models import Device
-
-def save_or_update_device(data):
-    device = Device.query.filter_by(instance_id=data['instance_id']).first()
-
-    if not device:
-        device = Device( device_id = data.get('device_id'),
-            instance_id = data.get('instance_id'),
-            name= data.get('name'),
-            model=data.get('model'),
-            project_id = data.get('project_id'),
-            platform = data.get('platform').upper(),
-            country = data.get('country'),
-            last_updated = data.get('actual_log_time'))
-        db.session.add(device)
-    else:
-        device.device_id = data.get('device_id', device.device_id)
-        device.name = data.get('name', device.name)
-        device.model = data.get('model', device.model)
-        device.country = data.get('country', device.country)
-        device.project_id = data.get('project_id', device.project_id)
-        device.platform = data.get('platform',device.platform).upper()
-        device.last_updated = data.get('actual_log_time',device.last_updated)
+from app.models import Device, DeviceLog, DeviceSession, LogLevel, Platform
+from app.services.device_counters_services import ceil_day, daily_counters, floor_day, record_session_counters
+from app.services.device_sessions_services import build_session_insert, parse_idempotency_key
+
+# Request keys that overwrite the stored device when present
+UPDATABLE_FIELDS = ('device_id', 'name', 'model', 'country', 'project_id', 'platform')
+
+
+def parse_platform(value):
+    try:
+        return Platform[value.upper()]
+    except (AttributeError, KeyError):
+        raise ValueError("Invalid platform")
+
+
+def init_device(data):
+    """Upsert the device and record a session in one statement and one commit.
+
+    WITH device_upsert AS (INSERT INTO devices ... ON CONFLICT (instance_id)
+    DO UPDATE ... RETURNING instance_id, project_id) INSERT INTO device_sessions ...
+    Concurrent inits of a new instance no longer race into IntegrityError.
+    The session is skipped when it duplicates a recent one, see
+    build_session_insert. A recorded session is added to the daily counters
+    in the same transaction.
+    """
+    idempotency_key = parse_idempotency_key(data.get('idempotency_key'))
+    now = datetime.now(timezone.utc)
+    values = {
+        'instance_id': data['instance_id'],
+        'device_id': data.get('device_id'),
+        'name': data.get('name'),
+        'model': data.get('model'),
+        'project_id': data['project_id'],
+        'country': data.get('country'),
+        'platform': parse_platform(data['platform']) if data.get('platform') else Platform.UNKNOWN,
+        'last_updated': data.get('actual_log_time'),
+        'created_at': now,
+    }
+
+    upsert = pg_insert(Device).values(values)
+    update = {field: upsert.excluded[field] for field in UPDATABLE_FIELDS if field in data}
+    if 'actual_log_time' in data:
+        update['last_updated'] = upsert.excluded.last_updated
+    if not update:
+        # DO UPDATE needs at least one column for RETURNING to yield the row
+        update['project_id'] = upsert.excluded.project_id
+
+    device_upsert = (
+        upsert.on_conflict_do_update(index_elements=[Device.instance_id], set_=update)
+        .returning(Device.instance_id, Device.project_id)
+        .cte('device_upsert')
+    )
+
+    session = db.session.execute(build_session_insert(
+        device_upsert.c.instance_id, device_upsert.c.project_id, data.get('actual_log_time'),
+        idempotency_key=idempotency_key,
+    ).returning(DeviceSession.project_id, DeviceSession.instance_id, DeviceSession.actual_log_time)).first()
+    if session is not None:
+        record_session_counters(session.project_id, [(session.instance_id, session.actual_log_time)])
     db.session.commit()
-    return device
\ No newline at end of file
+
+
+def _raw_log_counts(project_id, time_filter, log_tag_id=None, level=None):
+    query = (
+        select(
+            DeviceLog.instance_id,
+            func.sum(case((DeviceLog.level == LogLevel.ERROR, 1), else_=0)).label("error_count"),
+            # log_id comes from a sequence, so rows are already distinct
+            func.count(DeviceLog.log_id).label("log_count"),
+            func.count(DeviceLog.log_tag_id).label("action_count"),
+        )
+        .where(DeviceLog.project_id == project_id, time_filter)
+    )
+    if log_tag_id is not None:
+        query = query.where(DeviceLog.log_tag_id == log_tag_id)
+    if level is not None:
+        query = query.where(DeviceLog.level == level)
+    return query.group_by(DeviceLog.instance_id)
+
+
+def _raw_session_counts(project_id, time_filter):
+    return (
+        select(
+            DeviceSession.instance_id,
+            # count(*) rather than count(id): every column read is in the index
+            func.count().label("session_count"),
+        )
+        .where(DeviceSession.project_id == project_id, time_filter)
+        .group_by(DeviceSession.instance_id)
+    )
+
+
+def device_activity_subqueries(project_id, start_dt, end_dt, log_tag_id=None, level=None):
+    """Per-device log and session counts for one project in [start_dt, end_dt).
+
+    Whole UTC days are summed from device_daily_counters, so a 30-day list
+    reads about devices x days counter rows; only the partial-day edges
+    aggregate device_logs (idx_project_time_instance) and device_sessions
+    (idx_session_project_time_instance). Tag and level filters are not in
+    the counters and aggregate the raw rows for the whole window.
+
+    Returns (log_subq, session_subq), each keyed by instance_id, with a row
+    only for devices that have logs (resp. sessions) in the window.
+    """
+    first_day = ceil_day(start_dt)
+    last_day = floor_day(end_dt)
+
+    if log_tag_id is not None or level is not None or first_day >= last_day:
+        log_time = and_(DeviceLog.actual_log_time >= start_dt, DeviceLog.actual_log_time < end_dt)
+        session_time = and_(DeviceSession.actual_log_time >= start_dt, DeviceSession.actual_log_time < end_dt)
+        return (
+            _raw_log_counts(project_id, log_time, log_tag_id, level).subquery(),
+            _raw_session_counts(project_id, session_time).subquery(),
+        )
+
+    counters = daily_counters(project_id, first_day.date(), last_day.date()).subquery()
+    log_parts = [select(counters.c.instance_id, counters.c.error_count, counters.c.log_count, counters.c.action_count)]
+    session_parts = [select(counters.c.instance_id, counters.c.session_count)]
+
+    edges = []
+    if start_dt < first_day:
+        edges.append((start_dt, first_day))
+    if last_day < end_dt:
+        edges.append((last_day, end_dt))
+    if edges:
+        log_parts.append(_raw_log_counts(project_id, or_(*(
+            and_(DeviceLog.actual_log_time >= start, DeviceLog.actual_log_time < end) for start, end in edges
+        ))))
+        session_parts.append(_raw_session_counts(project_id, or_(*(
+            and_(DeviceSession.actual_log_time >= start, DeviceSession.actual_log_time < end) for start, end in edges
+        ))))
+
+    logs = union_all(*log_parts).subquery()
+    log_count = func.sum(logs.c.log_count)
+    log_subq = (
+        select(
+            logs.c.instance_id,
+            func.sum(logs.c.error_count).label("error_count"),
+            log_count.label("log_count"),
+            func.sum(logs.c.action_count).label("action_count"),
+        )
+        .group_by(logs.c.instance_id)
+        # Counter rows of session-only days must not list a device without logs
+        .having(log_count > 0)
+        .subquery()
+    )
+
+    sessions = union_all(*session_parts).subquery()
+    session_count = func.sum(sessions.c.session_count)
+    session_subq = (
+        select(sessions.c.instance_id, session_count.label("session_count"))
+        .group_by(sessions.c.instance_id)
+        .having(session_count > 0)
+        .subquery()
+    )
+    return log_subq, session_subq
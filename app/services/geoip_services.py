@@ -0,0 +1,129 @@
+import ipaddress
+import os
+import threading
+import time
+from flask import current_app
+from geoip2.database import Reader
+from geoip2.errors import AddressNotFoundError
+from maxminddb import MODE_MMAP, InvalidDatabaseError
+from app.utils.ttl_cache import TTLCache
+
+# Cache keys for whole prefixes: every address in an IPv4 /24 or IPv6 /48
+# shares the answer when MaxMind's network for it is at least that wide.
+PREFIX_LENGTHS = {4: 24, 6: 48}
+
+_MISSING = object()
+
+
+class _GeoState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reader = None
+        self.signature = None
+        self.checked_at = None
+        self.cache = None
+        self.warned = False
+
+
+_state = _GeoState()
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def _cache():
+    if _state.cache is None:
+        config = current_app.config
+        _state.cache = TTLCache(maxsize=config['GEOIP_CACHE_SIZE'], ttl=config['GEOIP_CACHE_TTL'])
+    return _state.cache
+
+
+def _is_fresh(now, interval):
+    return _state.checked_at is not None and now - _state.checked_at < interval
+
+
+def get_reader():
+    """Current reader, reopened when the .mmdb file has been replaced.
+
+    The file is checked at most every GEOIP_RELOAD_INTERVAL seconds. A new
+    reader is swapped in with one assignment; lookups already holding the
+    old one finish on it and it is released with its last reference.
+    Returns None when GEO_LITE is unset or unreadable; that is rechecked on
+    the same interval rather than on every call.
+    """
+    config = current_app.config
+    path = config['GEO_LITE']
+    now = time.monotonic()
+    if _is_fresh(now, config['GEOIP_RELOAD_INTERVAL']):
+        return _state.reader
+
+    with _state.lock:
+        if _is_fresh(now, config['GEOIP_RELOAD_INTERVAL']):
+            return _state.reader
+        _state.checked_at = now
+
+        if not path:
+            if not _state.warned:
+                current_app.logger.warning("GEO_LITE is not set, device countries will be empty")
+                _state.warned = True
+            return None
+
+        try:
+            signature = _file_signature(path)
+            if signature != _state.signature:
+                reader = Reader(path, mode=MODE_MMAP)
+                _state.reader, _state.signature = reader, signature
+                _cache().clear()
+                current_app.logger.info("Loaded GeoIP database %s (%s)", path, reader.metadata().build_epoch)
+        except (OSError, ValueError, InvalidDatabaseError):
+            # Keep serving from the previous reader, if any, while the file is being replaced
+            current_app.logger.exception("Could not load GeoIP database %s", path)
+        return _state.reader
+
+
+def _prefix_key(ip):
+    return f"{ipaddress.ip_network(f'{ip}/{PREFIX_LENGTHS[ip.version]}', strict=False)}"
+
+
+def lookup_country(ip):
+    """Country name for an IP address, None if unknown, private or invalid."""
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+
+    cache = _cache()
+    key = str(address)
+    prefix = _prefix_key(address)
+    for cache_key in (key, prefix):
+        country = cache.get(cache_key, _MISSING)
+        if country is not _MISSING:
+            return country
+
+    reader = get_reader()
+    if reader is None:
+        return None
+
+    try:
+        response = reader.country(key)
+    except AddressNotFoundError:
+        # Private and reserved ranges, cache the miss as well
+        cache.set(key, None)
+        return None
+    except InvalidDatabaseError:
+        current_app.logger.exception("GeoIP lookup failed for %s", key)
+        return None
+
+    country = response.country.name or "unknown"
+    cache.set(key, country)
+    network = response.traits.network
+    if network is not None and network.prefixlen <= PREFIX_LENGTHS[address.version]:
+        cache.set(prefix, country)
+    return country
+
+
+def lookup_countries(ips):
+    """Bulk lookup, {ip: country or None}; each distinct address is resolved once."""
+    return {ip: lookup_country(ip) for ip in set(ips)}
@@ -0,0 +1,289 @@
+import os
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from app.models import Device, DeviceLog, LogLevel, Platform, Project
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # exporting needs pyarrow
+    pa = None
+    pq = None
+
+try:
+    import duckdb
+except ImportError:  # without duckdb every summary is served from Postgres
+    duckdb = None
+
+TABLE = "device_logs"
+FILE_NAME = "logs.parquet"
+MANIFEST_DIR = "_exported"
+STALE_DIR = "_stale"
+
+PlatformSummary = namedtuple("PlatformSummary", "platform total_devices total_logs total_errors")
+TagSummary = namedtuple("TagSummary", "log_tag_id total_count device_count")
+CountrySummary = namedtuple("CountrySummary", "country device_count")
+
+EXPORT_COLUMNS = (
+    DeviceLog.project_id,
+    DeviceLog.log_id,
+    DeviceLog.instance_id,
+    DeviceLog.level,
+    DeviceLog.log_tag_id,
+    Device.platform,
+    Device.country,
+    DeviceLog.actual_log_time,
+)
+
+
+def _schema():
+    # Only what the summaries aggregate on; messages stay in Postgres and the retention archive
+    return pa.schema([
+        ("log_id", pa.int64()),
+        ("instance_id", pa.string()),
+        ("level", pa.string()),
+        ("log_tag_id", pa.int32()),
+        ("platform", pa.string()),
+        ("country", pa.string()),
+        ("actual_log_time", pa.timestamp("us")),
+    ])
+
+
+def _root():
+    return os.path.join(current_app.config["ANALYTICS_DIR"], TABLE)
+
+
+def day_path(project_id, day):
+    """<ANALYTICS_DIR>/device_logs/project_id=<id>/date=<YYYY-MM-DD>/logs.parquet"""
+    return os.path.join(_root(), f"project_id={project_id}", f"date={day:%Y-%m-%d}", FILE_NAME)
+
+
+def _manifest_path(day):
+    return os.path.join(_root(), MANIFEST_DIR, f"{day:%Y-%m-%d}")
+
+
+def is_exported(day):
+    return os.path.exists(_manifest_path(day))
+
+
+def _stale_path(day):
+    return os.path.join(_root(), STALE_DIR, f"{day:%Y-%m-%d}")
+
+
+def mark_stale(days):
+    """Stop serving exported days whose rows changed (edits, deletes, retention).
+
+    Drops the manifest so summaries over the day go back to Postgres, and
+    leaves a marker for analytics_export.py to re-export it.
+    """
+    for day in set(days):
+        # Marker first: an export already reading the day then skips its manifest
+        marker = _stale_path(day)
+        os.makedirs(os.path.dirname(marker), exist_ok=True)
+        open(marker, "w").close()
+        try:
+            os.remove(_manifest_path(day))
+        except FileNotFoundError:
+            pass
+
+
+def stale_days():
+    """Days marked by mark_stale and not re-exported yet, oldest first."""
+    directory = os.path.join(_root(), STALE_DIR)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(date.fromisoformat(name) for name in os.listdir(directory))
+
+
+def _day_bounds(day):
+    start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def _naive_utc(dt):
+    if dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# --- Export ---
+
+def _record(row):
+    return {
+        "log_id": row.log_id,
+        "instance_id": row.instance_id,
+        "level": row.level.value if isinstance(row.level, LogLevel) else row.level,
+        "log_tag_id": row.log_tag_id,
+        "platform": (row.platform or Platform.UNKNOWN).value,
+        "country": row.country,
+        "actual_log_time": _naive_utc(row.actual_log_time),
+    }
+
+
+def _open_writer(project_id, day):
+    path = day_path(project_id, day)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path, pq.ParquetWriter(
+        path + ".tmp", _schema(), compression=current_app.config["ANALYTICS_COMPRESSION"]
+    )
+
+
+def export_day(day):
+    """Write one closed UTC day of device_logs as a Parquet file per project.
+
+    Rows are streamed in (project_id, actual_log_time) order with a server-side
+    cursor and written ANALYTICS_BATCH_SIZE at a time, so memory stays flat.
+    Projects without logs that day get an empty file, and the day is only
+    marked exported once every file is in place. Re-exporting overwrites; a
+    day marked stale again while it was being read stays unexported.
+    Returns {project_id: rows}.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required to export analytics files (pip install pyarrow)")
+    stale_marker = _stale_path(day)
+    if os.path.exists(stale_marker):
+        os.remove(stale_marker)
+    batch_size = current_app.config["ANALYTICS_BATCH_SIZE"]
+    start, end = _day_bounds(day)
+
+    result = db.session.execute(
+        select(*EXPORT_COLUMNS)
+        .join(Device, Device.instance_id == DeviceLog.instance_id)
+        .where(DeviceLog.actual_log_time >= start, DeviceLog.actual_log_time < end)
+        .order_by(DeviceLog.project_id, DeviceLog.actual_log_time, DeviceLog.log_id),
+        execution_options={"yield_per": batch_size},
+    )
+
+    counts = {}
+    writers = {}
+    try:
+        for batch in result.partitions():
+            by_project = {}
+            for row in batch:
+                by_project.setdefault(row.project_id, []).append(_record(row))
+            for project_id, records in by_project.items():
+                if project_id not in writers:
+                    writers[project_id] = _open_writer(project_id, day)
+                writers[project_id][1].write_table(pa.Table.from_pylist(records, schema=_schema()))
+                counts[project_id] = counts.get(project_id, 0) + len(records)
+
+        for project_id in db.session.execute(select(Project.project_id)).scalars():
+            if project_id not in writers:
+                writers[project_id] = _open_writer(project_id, day)
+                counts[project_id] = 0
+    finally:
+        result.close()
+        for _, writer in writers.values():
+            writer.close()
+
+    for path, _ in writers.values():
+        os.replace(path + ".tmp", path)
+
+    if os.path.exists(stale_marker):
+        return counts
+    manifest = _manifest_path(day)
+    os.makedirs(os.path.dirname(manifest), exist_ok=True)
+    with open(manifest, "w") as f:
+        f.write(f"{datetime.now(timezone.utc).isoformat()} {sum(counts.values())}\n")
+    return counts
+
+
+def first_open_day(today=None):
+    """Oldest day that may still receive late logs (ANALYTICS_CLOSE_AFTER_DAYS)."""
+    today = today or datetime.now(timezone.utc).date()
+    return today - timedelta(days=current_app.config["ANALYTICS_CLOSE_AFTER_DAYS"])
+
+
+def closed_days(lookback_days=None, today=None):
+    """The last ``lookback_days`` days before first_open_day, oldest first."""
+    if lookback_days is None:
+        lookback_days = current_app.config["ANALYTICS_EXPORT_LOOKBACK_DAYS"]
+    last = first_open_day(today)
+    first = last - timedelta(days=lookback_days)
+    return [first + timedelta(days=i) for i in range((last - first).days)]
+
+
+# --- Query ---
+
+def hot_horizon(now=None):
+    """Start of the window still served from Postgres, None when the cold path is off."""
+    hot_days = current_app.config["ANALYTICS_HOT_DAYS"]
+    if not hot_days or duckdb is None:
+        return None
+    now = now or datetime.now(timezone.utc)
+    today = datetime(now.year, now.month, now.day, tzinfo=timezone.utc)
+    return today - timedelta(days=hot_days)
+
+
+def _cold_files(project_id, start_dt, end_dt):
+    """Parquet files covering [start_dt, end_dt), or None unless it is entirely cold and exported."""
+    horizon = hot_horizon()
+    if horizon is None or _naive_utc(end_dt) > _naive_utc(horizon):
+        return None
+
+    first_day = _naive_utc(start_dt).date()
+    last_day = (_naive_utc(end_dt) - timedelta(microseconds=1)).date()
+    days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+    if not all(is_exported(day) for day in days):
+        return None
+    # Projects created after a day was exported have no file for it
+    return [path for path in (day_path(project_id, day) for day in days) if os.path.exists(path)]
+
+
+def _query(files, sql, start_dt, end_dt):
+    file_list = "[" + ", ".join("'" + path.replace("'", "''") + "'" for path in files) + "]"
+    with duckdb.connect() as con:
+        return con.execute(
+            sql.format(source=f"read_parquet({file_list})"),
+            [_naive_utc(start_dt), _naive_utc(end_dt)],
+        ).fetchall()
+
+
+WINDOW = "actual_log_time >= ? AND actual_log_time < ?"
+
+
+def cold_summary_by_platform(project_id, start_dt, end_dt, count_devices=True):
+    """summarize_by_platform from the Parquet files, or None when the window is not cold."""
+    files = _cold_files(project_id, start_dt, end_dt)
+    if files is None:
+        return None
+    if not files:
+        return []
+    devices = "count(DISTINCT instance_id)" if count_devices else "0"
+    rows = _query(files, f"""
+        SELECT platform, {devices}, count(*), count(*) FILTER (WHERE level = 'ERROR')
+        FROM {{source}} WHERE {WINDOW} GROUP BY platform
+    """, start_dt, end_dt)
+    return [PlatformSummary(Platform(platform), *counts) for platform, *counts in rows]
+
+
+def cold_summary_by_tag(project_id, start_dt, end_dt, count_devices=True):
+    """summarize_by_tag from the Parquet files, or None when the window is not cold."""
+    files = _cold_files(project_id, start_dt, end_dt)
+    if files is None:
+        return None
+    if not files:
+        return []
+    devices = "count(DISTINCT instance_id)" if count_devices else "0"
+    rows = _query(files, f"""
+        SELECT log_tag_id, count(*), {devices}
+        FROM {{source}} WHERE {WINDOW} AND log_tag_id IS NOT NULL GROUP BY log_tag_id
+    """, start_dt, end_dt)
+    return [TagSummary(*row) for row in rows]
+
+
+def cold_summary_by_country(project_id, start_dt, end_dt):
+    """summarize_by_country from the Parquet files, or None when the window is not cold."""
+    files = _cold_files(project_id, start_dt, end_dt)
+    if files is None:
+        return None
+    if not files:
+        return []
+    rows = _query(files, f"""
+        SELECT country, count(DISTINCT instance_id) AS device_count
+        FROM {{source}} WHERE {WINDOW} GROUP BY country ORDER BY device_count DESC
+    """, start_dt, end_dt)
+    return [CountrySummary(*row) for row in rows]
@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+import zlib
+from app import db
+from app.models import DeviceLog
+from app.services.log_queries_services import log_rows_query
+from app.utils.date_util import to_iso_utc_many
+
+EXPORT_FIELDS = ('log_id', 'project_id', 'instance_id', 'level', 'tag', 'message',
+                 'actual_log_time', 'created_at')
+
+
+def build_export_query(project_id, start_dt=None, end_dt=None, level=None, log_tag_id=None,
+                       instance_id=None):
+    """Project logs for export, oldest first, with the tag joined in."""
+    query = log_rows_query(project_id)
+    if start_dt is not None:
+        query = query.filter(DeviceLog.actual_log_time >= start_dt)
+    if end_dt is not None:
+        query = query.filter(DeviceLog.actual_log_time < end_dt)
+    if level is not None:
+        query = query.filter(DeviceLog.level == level)
+    if log_tag_id is not None:
+        query = query.filter(DeviceLog.log_tag_id == log_tag_id)
+    if instance_id is not None:
+        query = query.filter(DeviceLog.instance_id == instance_id)
+    return query.order_by(DeviceLog.actual_log_time, DeviceLog.log_id)
+
+
+def open_export(query, batch_size):
+    """Execute with a server-side cursor; rows arrive ``batch_size`` at a time.
+
+    Executed up front so the request's bind routing (e.g. @use_replica)
+    applies, the caller then streams ``result.partitions()``.
+    """
+    return db.session.execute(query.statement.execution_options(yield_per=batch_size))
+
+
+def _export_values(rows):
+    actual_log_times = to_iso_utc_many([row.actual_log_time for row in rows])
+    created_ats = to_iso_utc_many([row.created_at for row in rows])
+    return [
+        (
+            row.log_id,
+            row.project_id,
+            row.instance_id,
+            row.level.value if row.level else None,
+            row.tag,
+            row.message,
+            actual_log_time,
+            created_at,
+        )
+        for row, actual_log_time, created_at in zip(rows, actual_log_times, created_ats)
+    ]
+
+
+def ndjson_chunks(result):
+    for rows in result.partitions():
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_FIELDS, values)), ensure_ascii=False) + "\n"
+            for values in _export_values(rows)
+        )
+
+
+def csv_chunks(result):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for rows in result.partitions():
+        writer.writerows(_export_values(rows))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip a stream of text chunks incrementally."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 → gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
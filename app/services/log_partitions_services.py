@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import exists, select, text
+from app import db
+from app.models import DeviceLog, RetentionPolicy
+
+PARENT_TABLE = "device_logs"
+DEFAULT_PARTITION = "device_logs_default"
+PARTITION_PREFIX = "device_logs_p"
+
+
+def partition_name(day):
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def partition_day(name):
+    """Return the day covered by a daily partition, or None for other tables."""
+    if not name.startswith(PARTITION_PREFIX):
+        return None
+    try:
+        return datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def list_log_partitions():
+    """Return {day: partition_name} for the daily partitions attached to device_logs."""
+    rows = db.session.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = :parent
+    """), {"parent": PARENT_TABLE}).scalars()
+
+    partitions = {}
+    for name in rows:
+        day = partition_day(name)
+        if day:
+            partitions[day] = name
+    return partitions
+
+
+def _create_partition(day):
+    name = partition_name(day)
+    bounds = {"start": day, "end": day + timedelta(days=1)}
+
+    has_default_rows = db.session.execute(text(f"""
+        SELECT 1 FROM {DEFAULT_PARTITION}
+        WHERE actual_log_time >= :start AND actual_log_time < :end
+        LIMIT 1
+    """), bounds).first()
+
+    if not has_default_rows:
+        db.session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} "
+            f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+        ))
+        return
+
+    # Rows for this day already landed in the default partition (late or
+    # future-dated logs). Postgres refuses to create an overlapping partition,
+    # so move them into a standalone table and attach that instead.
+    columns = ", ".join(c.name for c in DeviceLog.__table__.columns if c.computed is None)
+    db.session.execute(text(
+        f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)"
+    ))
+    db.session.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION}
+            WHERE actual_log_time >= :start AND actual_log_time < :end
+            RETURNING {columns}
+        )
+        INSERT INTO {name} ({columns}) SELECT {columns} FROM moved
+    """), bounds)
+    db.session.execute(text(
+        f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+    ))
+
+
+def ensure_log_partitions(days_ahead=None, start_day=None):
+    """Create the default partition and one partition per day up to today + days_ahead.
+
+    Returns the names of the partitions that were created.
+    """
+    if days_ahead is None:
+        days_ahead = current_app.config['LOG_PARTITION_DAYS_AHEAD']
+
+    today = datetime.now(timezone.utc).date()
+    day = start_day or today
+    last_day = today + timedelta(days=days_ahead)
+
+    db.session.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"
+    ))
+
+    existing = list_log_partitions()
+    created = []
+    while day <= last_day:
+        if day not in existing:
+            _create_partition(day)
+            created.append(partition_name(day))
+        day += timedelta(days=1)
+
+    db.session.commit()
+    return created
+
+
+def detach_log_partition(day, drop=True):
+    """Detach a daily partition, then drop it unless ``drop`` is False."""
+    name = partition_name(day)
+    db.session.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+    if drop:
+        db.session.execute(text(f"DROP TABLE {name}"))
+    db.session.commit()
+    return name
+
+
+def _retention_policies_in_use():
+    config = current_app.config
+    defaults = ('RETENTION_DEFAULT_INFO_DAYS', 'RETENTION_DEFAULT_WARNING_DAYS',
+                'RETENTION_DEFAULT_ERROR_DAYS', 'RETENTION_DEFAULT_SESSION_DAYS')
+    if any(config[name] for name in defaults):
+        return True
+    return db.session.scalar(select(exists().where(RetentionPolicy.project_id.isnot(None))))
+
+
+def expire_log_partitions(retention_days=None, detach_only=None):
+    """Detach (and by default drop) daily partitions older than retention_days.
+
+    A retention of 0 keeps everything. Returns the affected partition names.
+    Whole partitions go without archiving and regardless of per-project
+    policies, so this refuses (RuntimeError) once retention.py policies are
+    in use; retention.py run then owns expiry.
+    """
+    if retention_days is None:
+        retention_days = current_app.config['LOG_PARTITION_RETENTION_DAYS']
+    if detach_only is None:
+        detach_only = current_app.config['LOG_PARTITION_DETACH_ONLY']
+    if not retention_days:
+        return []
+    if _retention_policies_in_use():
+        raise RuntimeError(
+            "Retention policies are configured, expire logs with retention.py run "
+            "and unset LOG_PARTITION_RETENTION_DAYS"
+        )
+
+    cutoff = datetime.now(timezone.utc).date() - timedelta(days=retention_days)
+    expired = sorted(day for day in list_log_partitions() if day < cutoff)
+    return [detach_log_partition(day, drop=not detach_only) for day in expired]
@@ -0,0 +1,111 @@
+from sqlalchemy import tuple_
+from app import db
+from app.models import DeviceLog, LogTag
+from app.utils.cursor_util import decode_cursor, encode_cursor
+from app.utils.date_util import to_iso_utc_many
+
+
+def log_rows_query(project_id):
+    """Query of the serialized DeviceLog columns with the tag joined in.
+
+    Yields lightweight rows rather than DeviceLog entities: no identity map
+    and no lazy log_tag SELECT per row, so a page costs one statement.
+    Callers add their own filters and ordering; serialize with serialize_log_rows.
+    """
+    return (
+        db.session.query(
+            DeviceLog.log_id,
+            DeviceLog.project_id,
+            DeviceLog.instance_id,
+            DeviceLog.message,
+            DeviceLog.level,
+            LogTag.tag,
+            DeviceLog.actual_log_time,
+            DeviceLog.created_at,
+        )
+        .outerjoin(LogTag, LogTag.id == DeviceLog.log_tag_id)
+        .filter(DeviceLog.project_id == project_id)
+    )
+
+
+def serialize_log_rows(rows):
+    actual_log_times = to_iso_utc_many([row.actual_log_time for row in rows])
+    created_ats = to_iso_utc_many([row.created_at for row in rows])
+    return [
+        {
+            "log_id": row.log_id,
+            "instance_id": row.instance_id,
+            "project_id": row.project_id,
+            "level": row.level.value if row.level else None,
+            "tag": row.tag,
+            "message": row.message,
+            "actual_log_time": actual_log_time,
+            "created_at": created_at,
+        }
+        for row, actual_log_time, created_at in zip(rows, actual_log_times, created_ats)
+    ]
+
+
+def keyset_filter(query, actual_log_time, log_id, direction):
+    """Restrict a DeviceLog query to rows after/before a (time, id) position.
+
+    The plain time bound lets Postgres turn the seek into an index range
+    scan on idx_project_instance_time, the row comparison breaks ties.
+    """
+    if direction == "next":
+        return query.filter(
+            DeviceLog.actual_log_time <= actual_log_time,
+            tuple_(DeviceLog.actual_log_time, DeviceLog.log_id) < tuple_(actual_log_time, log_id),
+        )
+    return query.filter(
+        DeviceLog.actual_log_time >= actual_log_time,
+        tuple_(DeviceLog.actual_log_time, DeviceLog.log_id) > tuple_(actual_log_time, log_id),
+    )
+
+
+def seek_logs(query, actual_log_time, log_id, direction, limit):
+    """Fetch up to ``limit`` rows next to a position, newest first.
+
+    Returns (rows, has_more) where has_more tells whether rows exist beyond
+    the fetched ones in the same direction.
+    """
+    query = keyset_filter(query, actual_log_time, log_id, direction)
+    if direction == "next":
+        query = query.order_by(DeviceLog.actual_log_time.desc(), DeviceLog.log_id.desc())
+    else:
+        query = query.order_by(DeviceLog.actual_log_time.asc(), DeviceLog.log_id.asc())
+
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == "prev":
+        rows.reverse()
+    return rows, has_more
+
+
+def fetch_log_page(query, cursor, per_page):
+    """Keyset page of a DeviceLog query ordered by (actual_log_time, log_id) DESC.
+
+    Returns (rows, next_cursor, prev_cursor). Raises ValueError for a bad cursor.
+    """
+    if not cursor:
+        rows = (
+            query.order_by(DeviceLog.actual_log_time.desc(), DeviceLog.log_id.desc())
+            .limit(per_page + 1)
+            .all()
+        )
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1].actual_log_time, rows[-1].log_id, "next") if has_more else None
+        return rows, next_cursor, None
+
+    actual_log_time, log_id, direction = decode_cursor(cursor)
+    rows, has_more = seek_logs(query, actual_log_time, log_id, direction, per_page)
+    if not rows:
+        return rows, None, None
+
+    newer_exist = has_more if direction == "prev" else True
+    older_exist = has_more if direction == "next" else True
+    next_cursor = encode_cursor(rows[-1].actual_log_time, rows[-1].log_id, "next") if older_exist else None
+    prev_cursor = encode_cursor(rows[0].actual_log_time, rows[0].log_id, "prev") if newer_exist else None
+    return rows, next_cursor, prev_cursor
@@ -0,0 +1,264 @@
+import json
+import time
+from collections import defaultdict
+from flask import current_app
+from redis.exceptions import ResponseError
+from sqlalchemy.exc import DataError, IntegrityError
+from app import db
+from app.services.device_logs_services import parse_log_payload, save_logs
+from cache import r
+
+
+class QueueFullError(Exception):
+    """Raised when the ingestion stream is over LOG_QUEUE_MAX_LENGTH."""
+
+
+def _config():
+    return current_app.config
+
+
+def ensure_consumer_group():
+    cfg = _config()
+    try:
+        r.xgroup_create(cfg['LOG_QUEUE_STREAM'], cfg['LOG_QUEUE_GROUP'], id='0', mkstream=True)
+    except ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+
+def enqueue_logs(project_id, items):
+    """Validate logs and append the valid ones to the ingestion stream.
+
+    Device existence is checked by the worker; anything it cannot store ends
+    up in the dead-letter stream. Returns one status dict per item.
+    """
+    cfg = _config()
+    stream = cfg['LOG_QUEUE_STREAM']
+
+    # Counting the batch keeps one large request from overshooting the limit
+    if r.xlen(stream) + len(items) > cfg['LOG_QUEUE_MAX_LENGTH']:
+        raise QueueFullError()
+
+    results = [None] * len(items)
+    queued = []
+    for index, item in enumerate(items):
+        try:
+            parse_log_payload(item)
+            queued.append(index)
+        except ValueError as e:
+            results[index] = {'index': index, 'status': 'invalid', 'error': str(e)}
+
+    if queued:
+        pipe = r.pipeline(transaction=False)
+        for index in queued:
+            pipe.xadd(stream, {'project_id': project_id, 'payload': json.dumps(items[index])})
+        for index, entry_id in zip(queued, pipe.execute()):
+            results[index] = {'index': index, 'status': 'queued', 'entry_id': entry_id}
+
+    return results
+
+
+def _dead_letter(entries):
+    """Move (entry_id, fields, error) tuples to the dead-letter stream."""
+    if not entries:
+        return
+    cfg = _config()
+    pipe = r.pipeline(transaction=False)
+    for entry_id, fields, error in entries:
+        pipe.xadd(
+            cfg['LOG_QUEUE_DEAD_LETTER_STREAM'],
+            {
+                'source_id': entry_id,
+                'project_id': fields.get('project_id', ''),
+                'payload': fields.get('payload', ''),
+                'error': error,
+            },
+            maxlen=cfg['LOG_QUEUE_DEAD_LETTER_MAX_LENGTH'],
+            approximate=True,
+        )
+    pipe.execute()
+
+
+def _ack(entry_ids):
+    if not entry_ids:
+        return
+    cfg = _config()
+    pipe = r.pipeline(transaction=False)
+    pipe.xack(cfg['LOG_QUEUE_STREAM'], cfg['LOG_QUEUE_GROUP'], *entry_ids)
+    # Acked entries are deleted so XLEN stays equal to the backlog depth.
+    pipe.xdel(cfg['LOG_QUEUE_STREAM'], *entry_ids)
+    pipe.execute()
+
+
+def _claim_stale(consumer):
+    """Take over entries left pending by crashed workers.
+
+    Entries delivered LOG_QUEUE_MAX_DELIVERIES times are dead-lettered
+    instead of retried again.
+    """
+    cfg = _config()
+    stream, group = cfg['LOG_QUEUE_STREAM'], cfg['LOG_QUEUE_GROUP']
+
+    pending = r.xpending_range(
+        stream, group, min='-', max='+',
+        count=cfg['LOG_QUEUE_BATCH_SIZE'],
+        idle=cfg['LOG_QUEUE_CLAIM_IDLE_MS'],
+    )
+    if not pending:
+        return []
+
+    poisoned = [p['message_id'] for p in pending if p['times_delivered'] >= cfg['LOG_QUEUE_MAX_DELIVERIES']]
+    retry = [p['message_id'] for p in pending if p['times_delivered'] < cfg['LOG_QUEUE_MAX_DELIVERIES']]
+
+    if poisoned:
+        dead = []
+        for entry_id in poisoned:
+            for found_id, fields in r.xrange(stream, entry_id, entry_id):
+                dead.append((found_id, fields, 'Max deliveries exceeded'))
+        _dead_letter(dead)
+        _ack(poisoned)
+
+    if not retry:
+        return []
+    claimed = r.xclaim(stream, group, consumer, cfg['LOG_QUEUE_CLAIM_IDLE_MS'], retry)
+    # Entries trimmed from the stream come back as (id, None), nothing left to store
+    _ack([entry_id for entry_id, fields in claimed if fields is None])
+    return [(entry_id, fields) for entry_id, fields in claimed if fields is not None]
+
+
+def process_entries(entries):
+    """Write stream entries to device_logs, grouped per project.
+
+    Entries are acked once their project's batch is committed. When the
+    batch INSERT fails, its entries are retried one by one so a single bad
+    entry is dead-lettered alone; other database errors leave entries
+    pending so they are retried. Returns the number of entries handled.
+    """
+    by_project = defaultdict(list)
+    dead = []
+
+    for entry_id, fields in entries:
+        try:
+            project_id = int(fields['project_id'])
+            payload = json.loads(fields['payload'])
+        except (KeyError, ValueError, TypeError):
+            dead.append((entry_id, fields, 'Malformed queue entry'))
+            continue
+        by_project[project_id].append((entry_id, fields, payload))
+
+    _dead_letter(dead)
+    _ack([entry_id for entry_id, _, _ in dead])
+    handled = len(dead)
+
+    for project_id, project_entries in by_project.items():
+        try:
+            results = save_logs(project_id, [payload for _, _, payload in project_entries])
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception(
+                "Failed to store queued logs for project %s, retrying entries one by one", project_id
+            )
+            handled += _process_one_by_one(project_id, project_entries)
+            continue
+
+        failed = [
+            (entry_id, fields, result['error'])
+            for (entry_id, fields, _), result in zip(project_entries, results)
+            if result['status'] != 'created'
+        ]
+        _dead_letter(failed)
+        _ack([entry_id for entry_id, _, _ in project_entries])
+        handled += len(project_entries)
+
+    return handled
+
+
+def _process_one_by_one(project_id, project_entries):
+    """Store entries separately after their batch failed.
+
+    An entry whose own INSERT is rejected for its data is dead-lettered;
+    any other error leaves it pending for redelivery.
+    """
+    handled = 0
+    for entry_id, fields, payload in project_entries:
+        try:
+            result = save_logs(project_id, [payload])[0]
+        except (DataError, IntegrityError) as e:
+            db.session.rollback()
+            _dead_letter([(entry_id, fields, f'Rejected by database: {e.orig}')])
+            _ack([entry_id])
+            handled += 1
+            continue
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception("Failed to store queued log %s", entry_id)
+            continue
+
+        if result['status'] != 'created':
+            _dead_letter([(entry_id, fields, result['error'])])
+        _ack([entry_id])
+        handled += 1
+    return handled
+
+
+def drain_queue(consumer):
+    """Read one batch from the stream (plus any stale entries) and store it."""
+    cfg = _config()
+    entries = _claim_stale(consumer)
+
+    response = r.xreadgroup(
+        cfg['LOG_QUEUE_GROUP'], consumer,
+        {cfg['LOG_QUEUE_STREAM']: '>'},
+        count=cfg['LOG_QUEUE_BATCH_SIZE'],
+        block=None if entries else cfg['LOG_QUEUE_BLOCK_MS'],
+    )
+    for _, stream_entries in response or []:
+        entries.extend(stream_entries)
+
+    return process_entries(entries) if entries else 0
+
+
+def run_worker(consumer):
+    ensure_consumer_group()
+    current_app.logger.info("Log queue worker %s started", consumer)
+    while True:
+        try:
+            drain_queue(consumer)
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception("Log queue worker error")
+            time.sleep(1)
+
+
+def queue_stats():
+    cfg = _config()
+    stream = cfg['LOG_QUEUE_STREAM']
+
+    pipe = r.pipeline(transaction=False)
+    pipe.xlen(stream)
+    pipe.xlen(cfg['LOG_QUEUE_DEAD_LETTER_STREAM'])
+    depth, dead_letter_depth = pipe.execute()
+
+    pending = 0
+    consumers = 0
+    lag = None
+    try:
+        for group in r.xinfo_groups(stream):
+            if group['name'] == cfg['LOG_QUEUE_GROUP']:
+                pending = group['pending']
+                consumers = group['consumers']
+                lag = group.get('lag')
+    except ResponseError:
+        # Stream does not exist yet
+        pass
+
+    return {
+        'mode': cfg['LOG_INGEST_MODE'],
+        'stream': stream,
+        'depth': depth,
+        'max_depth': cfg['LOG_QUEUE_MAX_LENGTH'],
+        'pending': pending,
+        'lag': lag,
+        'consumers': consumers,
+        'dead_letter_depth': dead_letter_depth,
+    }
@@ -0,0 +1,262 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, case, delete, func, literal, or_, select, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app import db
+from app.models import Device, DeviceLog, LogHourlyRollup, LogLevel, Platform, Project
+from app.services.log_analytics_services import (
+    cold_summary_by_country,
+    cold_summary_by_platform,
+    cold_summary_by_tag,
+)
+
+HOUR = timedelta(hours=1)
+# pg_advisory_xact_lock(ROLLUP_LOCK_KEY, project_id): ingest takes it shared,
+# rebuild_log_rollups exclusive, so a rebuild only holds up its own project
+ROLLUP_LOCK_KEY = 7410001
+
+
+def floor_hour(dt):
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def ceil_hour(dt):
+    hour = floor_hour(dt)
+    return hour if hour == dt else hour + HOUR
+
+
+def record_log_rollups(project_id, rows, devices):
+    """Add freshly inserted log rows to the hourly rollups.
+
+    ``rows`` are device_logs column dicts, ``devices`` maps instance_id to a
+    row with platform and country. Runs in the caller's transaction.
+    """
+    counts = defaultdict(lambda: [0, 0])
+    for row in rows:
+        key = (floor_hour(row['actual_log_time']), row['instance_id'], row['log_tag_id'] or 0)
+        counts[key][0] += 1
+        if row['level'] == LogLevel.ERROR:
+            counts[key][1] += 1
+
+    if not counts:
+        return
+
+    # Waits for a running rebuild, so its DELETE + INSERT never races this upsert
+    db.session.execute(select(func.pg_advisory_xact_lock_shared(ROLLUP_LOCK_KEY, project_id)))
+
+    # Sorted so concurrent batches lock rollup rows in the same order
+    values = [
+        {
+            'project_id': project_id,
+            'hour': hour,
+            'instance_id': instance_id,
+            'log_tag_id': log_tag_id,
+            'platform': devices[instance_id].platform or Platform.UNKNOWN,
+            'country': devices[instance_id].country,
+            'log_count': log_count,
+            'error_count': error_count,
+        }
+        for (hour, instance_id, log_tag_id), (log_count, error_count) in sorted(counts.items())
+    ]
+
+    stmt = pg_insert(LogHourlyRollup).values(values)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['project_id', 'hour', 'instance_id', 'log_tag_id'],
+        set_={
+            'log_count': LogHourlyRollup.log_count + stmt.excluded.log_count,
+            'error_count': LogHourlyRollup.error_count + stmt.excluded.error_count,
+            'platform': stmt.excluded.platform,
+            'country': stmt.excluded.country,
+        },
+    ))
+
+
+def _raw_activity(project_id, time_filter):
+    return (
+        select(
+            DeviceLog.instance_id.label('instance_id'),
+            Device.platform.label('platform'),
+            func.coalesce(DeviceLog.log_tag_id, 0).label('log_tag_id'),
+            Device.country.label('country'),
+            func.count(DeviceLog.log_id).label('log_count'),
+            func.sum(case((DeviceLog.level == LogLevel.ERROR, 1), else_=0)).label('error_count'),
+        )
+        .join(Device, Device.instance_id == DeviceLog.instance_id)
+        .where(DeviceLog.project_id == project_id, time_filter)
+        .group_by(DeviceLog.instance_id, Device.platform, DeviceLog.log_tag_id, Device.country)
+    )
+
+
+def activity_subquery(project_id, start_dt, end_dt):
+    """Per device/tag log and error counts for [start_dt, end_dt).
+
+    Whole hours are read from log_hourly_rollups, only the partial-hour
+    edges touch device_logs. Columns: instance_id, platform, log_tag_id,
+    country, log_count, error_count (one row per source, not deduplicated).
+    """
+    first_hour = ceil_hour(start_dt)
+    last_hour = floor_hour(end_dt)
+
+    if first_hour >= last_hour:
+        # Window is inside a single hour, nothing to gain from rollups
+        return _raw_activity(project_id, and_(
+            DeviceLog.actual_log_time >= start_dt,
+            DeviceLog.actual_log_time < end_dt,
+        )).subquery()
+
+    rollups = (
+        select(
+            LogHourlyRollup.instance_id,
+            LogHourlyRollup.platform,
+            LogHourlyRollup.log_tag_id,
+            LogHourlyRollup.country,
+            LogHourlyRollup.log_count,
+            LogHourlyRollup.error_count,
+        )
+        .where(
+            LogHourlyRollup.project_id == project_id,
+            LogHourlyRollup.hour >= first_hour,
+            LogHourlyRollup.hour < last_hour,
+        )
+    )
+
+    edges = []
+    if start_dt < first_hour:
+        edges.append(and_(DeviceLog.actual_log_time >= start_dt, DeviceLog.actual_log_time < first_hour))
+    if last_hour < end_dt:
+        edges.append(and_(DeviceLog.actual_log_time >= last_hour, DeviceLog.actual_log_time < end_dt))
+
+    if not edges:
+        return rollups.subquery()
+    return union_all(rollups, _raw_activity(project_id, or_(*edges))).subquery()
+
+
+def _distinct_devices(activity, count_devices):
+    # Skipped when the caller takes device counts from the sketches instead
+    if count_devices:
+        return func.count(func.distinct(activity.c.instance_id))
+    return literal(0)
+
+
+def summarize_by_platform(project_id, start_dt, end_dt, count_devices=True):
+    # Windows past the hot horizon are read from the exported Parquet files
+    cold = cold_summary_by_platform(project_id, start_dt, end_dt, count_devices)
+    if cold is not None:
+        return cold
+
+    activity = activity_subquery(project_id, start_dt, end_dt)
+    return db.session.execute(
+        select(
+            activity.c.platform,
+            _distinct_devices(activity, count_devices).label('total_devices'),
+            func.coalesce(func.sum(activity.c.log_count), 0).label('total_logs'),
+            func.coalesce(func.sum(activity.c.error_count), 0).label('total_errors'),
+        )
+        .group_by(activity.c.platform)
+    ).all()
+
+
+def summarize_by_tag(project_id, start_dt, end_dt, count_devices=True):
+    cold = cold_summary_by_tag(project_id, start_dt, end_dt, count_devices)
+    if cold is not None:
+        return cold
+
+    activity = activity_subquery(project_id, start_dt, end_dt)
+    return db.session.execute(
+        select(
+            activity.c.log_tag_id,
+            func.coalesce(func.sum(activity.c.log_count), 0).label('total_count'),
+            _distinct_devices(activity, count_devices).label('device_count'),
+        )
+        .where(activity.c.log_tag_id != 0)
+        .group_by(activity.c.log_tag_id)
+    ).all()
+
+
+def summarize_by_country(project_id, start_dt, end_dt):
+    cold = cold_summary_by_country(project_id, start_dt, end_dt)
+    if cold is not None:
+        return cold
+
+    activity = activity_subquery(project_id, start_dt, end_dt)
+    device_count = func.count(func.distinct(activity.c.instance_id))
+    return db.session.execute(
+        select(activity.c.country, device_count.label('device_count'))
+        .group_by(activity.c.country)
+        .order_by(device_count.desc())
+    ).all()
+
+
+def _rebuild_project_hour(project_id, hour_start):
+    hour_end = hour_start + HOUR
+    hour = func.date_trunc('hour', DeviceLog.actual_log_time)
+    source = (
+        select(
+            DeviceLog.project_id,
+            hour,
+            DeviceLog.instance_id,
+            func.coalesce(DeviceLog.log_tag_id, 0),
+            Device.platform,
+            Device.country,
+            func.count(DeviceLog.log_id),
+            func.sum(case((DeviceLog.level == LogLevel.ERROR, 1), else_=0)),
+        )
+        .join(Device, Device.instance_id == DeviceLog.instance_id)
+        .where(
+            DeviceLog.project_id == project_id,
+            DeviceLog.actual_log_time >= hour_start,
+            DeviceLog.actual_log_time < hour_end,
+        )
+        .group_by(DeviceLog.project_id, hour, DeviceLog.instance_id, DeviceLog.log_tag_id,
+                  Device.platform, Device.country)
+    )
+
+    db.session.execute(select(func.pg_advisory_xact_lock(ROLLUP_LOCK_KEY, project_id)))
+    db.session.execute(delete(LogHourlyRollup).where(
+        LogHourlyRollup.project_id == project_id,
+        LogHourlyRollup.hour >= hour_start,
+        LogHourlyRollup.hour < hour_end,
+    ))
+    stmt = pg_insert(LogHourlyRollup).from_select(
+        ['project_id', 'hour', 'instance_id', 'log_tag_id', 'platform', 'country',
+         'log_count', 'error_count'],
+        source,
+    )
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['project_id', 'hour', 'instance_id', 'log_tag_id'],
+        set_={
+            'log_count': stmt.excluded.log_count,
+            'error_count': stmt.excluded.error_count,
+            'platform': stmt.excluded.platform,
+            'country': stmt.excluded.country,
+        },
+    ))
+    db.session.commit()
+
+
+def rebuild_log_rollups(start_dt, end_dt, project_id=None):
+    """Recompute rollups for the whole hours in [start_dt, end_dt) from device_logs.
+
+    Corrects drift from logs that were edited or deleted after ingestion and
+    backfills history. Only closed hours are rebuilt, the live hour is left to
+    ingest. Without ``project_id`` every project is rebuilt in turn.
+
+    Each project-hour is one transaction holding that project's rollup lock
+    exclusively, so only that project's ingest batches wait, and only briefly,
+    instead of upserting between the DELETE and the INSERT.
+    """
+    start_hour = floor_hour(start_dt)
+    end_hour = min(ceil_hour(end_dt), floor_hour(datetime.now(timezone.utc)))
+    if start_hour >= end_hour:
+        return
+
+    if project_id is None:
+        project_ids = db.session.execute(select(Project.project_id).order_by(Project.project_id)).scalars().all()
+    else:
+        project_ids = [project_id]
+
+    for pid in project_ids:
+        hour = start_hour
+        while hour < end_hour:
+            _rebuild_project_hour(pid, hour)
+            hour += HOUR
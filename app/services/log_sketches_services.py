@@ -0,0 +1,190 @@
+import math
+from collections import defaultdict
+from datetime import timedelta, timezone
+from flask import current_app
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from app import db
+from app.models import LogHourlyRollup, Platform
+from app.services.log_rollups_services import HOUR, floor_hour
+from cache import r
+
+# Redis HyperLogLog standard error (16384 registers)
+HLL_STANDARD_ERROR = 0.0081
+# ~95% of estimates fall within two standard errors
+HLL_CONFIDENCE_Z = 2
+
+DIMENSIONS = ("platform", "tag", "country")
+
+
+def _sketch_key(project_id, dimension, value, hour):
+    return f"hll:{project_id}:{dimension}:{value}:{hour.strftime('%Y%m%d%H')}"
+
+
+def _values_key(project_id, dimension):
+    return f"hll_values:{project_id}:{dimension}"
+
+
+def _to_utc(dt):
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def _hours(start_dt, end_dt):
+    """UTC hours touching [start_dt, end_dt), whatever offset the window was given in."""
+    start_dt, end_dt = _to_utc(start_dt), _to_utc(end_dt)
+    hours = []
+    hour = floor_hour(start_dt)
+    while hour < end_dt:
+        hours.append(hour)
+        hour += HOUR
+    return hours
+
+
+def _dimension_values(platform, country, log_tag_id):
+    values = {
+        "platform": (platform or Platform.UNKNOWN).value,
+        "country": country or "",
+    }
+    if log_tag_id:
+        values["tag"] = str(log_tag_id)
+    return values
+
+
+def _write_sketches(project_id, members):
+    """PFADD {(dimension, value, hour): instance_ids} and register the values."""
+    retention = timedelta(days=current_app.config['LOG_SKETCH_RETENTION_DAYS'])
+    pipe = r.pipeline(transaction=False)
+    seen = defaultdict(set)
+    latest_expiry = None
+    for (dimension, value, hour), instance_ids in members.items():
+        key = _sketch_key(project_id, dimension, value, hour)
+        pipe.pfadd(key, *instance_ids)
+        # Sketches expire by the hour they describe, not by when they were written.
+        # Aware UTC: redis-py reads a naive datetime (rollup hours) as local time
+        hour = _to_utc(hour)
+        pipe.expireat(key, hour + HOUR + retention)
+        seen[dimension].add(value)
+        latest_expiry = max(latest_expiry or hour, hour + HOUR + retention)
+    for dimension, values in seen.items():
+        key = _values_key(project_id, dimension)
+        pipe.sadd(key, *values)
+        pipe.expireat(key, latest_expiry)
+    pipe.execute()
+
+
+def record_device_sketches(project_id, rows, devices):
+    """Add freshly inserted log rows to the hourly distinct-device sketches.
+
+    Same inputs as record_log_rollups. Best effort: the sketches only back
+    approximate counts, so a Redis failure is logged and ingestion goes on.
+    """
+    if not current_app.config['LOG_SKETCHES_ENABLED'] or not rows:
+        return
+
+    members = defaultdict(set)
+    for row in rows:
+        device = devices[row['instance_id']]
+        hour = floor_hour(_to_utc(row['actual_log_time']))
+        for dimension, value in _dimension_values(device.platform, device.country, row['log_tag_id']).items():
+            members[(dimension, value, hour)].add(row['instance_id'])
+
+    try:
+        _write_sketches(project_id, members)
+    except RedisError:
+        current_app.logger.warning("Could not update device sketches for project %s", project_id)
+
+
+def approx_distinct_devices(project_id, dimension, start_dt, end_dt):
+    """Estimated distinct devices per value of ``dimension`` over [start_dt, end_dt).
+
+    PFCOUNT merges the hourly sketches of every hour the window touches, so
+    partial edge hours count whole. Returns {value: estimate}, or None if
+    Redis is unavailable or has lost the project's value registry, so the
+    caller can fall back to the exact query.
+    """
+    hours = _hours(start_dt, end_dt)
+    try:
+        values = sorted(r.smembers(_values_key(project_id, dimension)))
+        if not values:
+            return None
+        if not hours:
+            return {}
+        pipe = r.pipeline(transaction=False)
+        for value in values:
+            pipe.pfcount(*(_sketch_key(project_id, dimension, value, h) for h in hours))
+        counts = pipe.execute()
+    except RedisError:
+        current_app.logger.warning("Device sketches unavailable, falling back to exact counts")
+        return None
+
+    return {value: count for value, count in zip(values, counts) if count}
+
+
+def replace_device_sketches(project_id, start_dt, end_dt):
+    """Drop a project's sketches for the hours touching [start_dt, end_dt) and rebuild them.
+
+    For rows removed after ingestion (retention): PFADD can't take a device
+    back out, so the hours are cleared first. Call after rebuild_log_rollups.
+    Best effort like ingestion.
+    """
+    if not current_app.config['LOG_SKETCHES_ENABLED']:
+        return
+    hours = _hours(start_dt, end_dt)
+    if not hours:
+        return
+    try:
+        pipe = r.pipeline(transaction=False)
+        for dimension in DIMENSIONS:
+            for value in r.smembers(_values_key(project_id, dimension)):
+                pipe.delete(*(_sketch_key(project_id, dimension, value, hour) for hour in hours))
+        pipe.execute()
+        rebuild_device_sketches(start_dt, end_dt, project_id)
+    except RedisError:
+        current_app.logger.warning("Could not rebuild device sketches for project %s", project_id)
+
+
+def error_bounds(estimate):
+    """(low, high) ~95% interval for a HyperLogLog estimate."""
+    margin = math.ceil(estimate * HLL_STANDARD_ERROR * HLL_CONFIDENCE_Z)
+    return max(estimate - margin, 0), estimate + margin
+
+
+def approximation_info():
+    return {
+        "method": "hyperloglog",
+        "relative_standard_error": HLL_STANDARD_ERROR,
+        "confidence": 0.95,
+        "granularity": "hour",
+    }
+
+
+def rebuild_device_sketches(start_dt, end_dt, project_id=None):
+    """Backfill sketches for the whole hours in [start_dt, end_dt) from log_hourly_rollups.
+
+    Rollups keep one row per device, so the rebuilt sketches match what
+    ingestion would have recorded. PFADD is idempotent, no clearing needed.
+    """
+    query = (
+        select(
+            LogHourlyRollup.project_id,
+            LogHourlyRollup.hour,
+            LogHourlyRollup.instance_id,
+            LogHourlyRollup.log_tag_id,
+            LogHourlyRollup.platform,
+            LogHourlyRollup.country,
+        )
+        .where(LogHourlyRollup.hour >= floor_hour(start_dt), LogHourlyRollup.hour < end_dt)
+        .execution_options(yield_per=10000)
+    )
+    if project_id is not None:
+        query = query.where(LogHourlyRollup.project_id == project_id)
+
+    members = defaultdict(lambda: defaultdict(set))
+    for row in db.session.execute(query):
+        for dimension, value in _dimension_values(row.platform, row.country, row.log_tag_id).items():
+            members[row.project_id][(dimension, value, row.hour)].add(row.instance_id)
+
+    for pid, project_members in members.items():
+        _write_sketches(pid, project_members)
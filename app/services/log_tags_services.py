@@ -0,0 +1,117 @@
+from flask import current_app
+from redis.exceptions import RedisError
+from sqlalchemy import event, select
+from sqlalchemy.orm import object_session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app import db
+from app.models import LogTag
+from app.utils.after_commit import run_after_commit
+from app.utils.ttl_cache import TTLCache
+from cache import cache_log_tag_ids, delete_log_tag, get_log_tag_ids
+
+# (project_id, tag) -> log_tag_id, per worker process
+_local_tags = None
+
+
+def _local_cache():
+    global _local_tags
+    if _local_tags is None:
+        _local_tags = TTLCache(
+            maxsize=current_app.config['LOG_TAG_CACHE_SIZE'],
+            ttl=current_app.config['LOG_TAG_CACHE_TTL'],
+        )
+    return _local_tags
+
+
+def _fetch_log_tag_ids(project_id, tags):
+    rows = db.session.execute(
+        select(LogTag.tag, LogTag.id)
+        .where(LogTag.project_id == project_id, LogTag.tag.in_(tags))
+    ).all()
+    return {row.tag: row.id for row in rows}
+
+
+def resolve_log_tag_ids(project_id, tag_names):
+    """Map tag names to log_tag ids for a project, creating missing tags.
+
+    Lookups go through the in-process LRU, then the shared Redis hash
+    (LOG_TAG_REDIS_CACHE), then the database. Missing tags are created with
+    INSERT ... ON CONFLICT DO NOTHING on uq_tag_per_project so concurrent
+    writers never raise IntegrityError.
+    """
+    local = _local_cache()
+    tag_ids = {}
+    missing = set()
+
+    for tag in set(tag_names):
+        log_tag_id = local.get((project_id, tag))
+        if log_tag_id is None:
+            missing.add(tag)
+        else:
+            tag_ids[tag] = log_tag_id
+
+    if not missing:
+        return tag_ids
+
+    use_redis = current_app.config['LOG_TAG_REDIS_CACHE']
+    if use_redis:
+        try:
+            shared = get_log_tag_ids(project_id, list(missing))
+        except RedisError:
+            shared = {}
+        for tag, log_tag_id in shared.items():
+            local.set((project_id, tag), log_tag_id)
+        tag_ids.update(shared)
+        missing -= shared.keys()
+
+    if not missing:
+        return tag_ids
+
+    found = _fetch_log_tag_ids(project_id, missing)
+
+    # Only tags that already existed are cached; ids created below are not
+    # committed yet and would be dangling if this transaction rolls back.
+    for tag, log_tag_id in found.items():
+        local.set((project_id, tag), log_tag_id)
+    if use_redis and found:
+        try:
+            cache_log_tag_ids(project_id, found)
+        except RedisError:
+            pass
+    tag_ids.update(found)
+
+    created = missing - found.keys()
+    if created:
+        db.session.execute(
+            pg_insert(LogTag)
+            .values([{'tag': tag, 'project_id': project_id} for tag in created])
+            .on_conflict_do_nothing(constraint='uq_tag_per_project')
+        )
+        tag_ids.update(_fetch_log_tag_ids(project_id, created))
+
+    return tag_ids
+
+
+def invalidate_log_tag(project_id, tag):
+    _local_cache().pop((project_id, tag))
+    if current_app.config['LOG_TAG_REDIS_CACHE']:
+        try:
+            delete_log_tag(project_id, tag)
+        except RedisError:
+            current_app.logger.warning("Could not evict log tag %r from Redis", tag)
+
+
+def is_log_tag_fk_violation(error):
+    """True for an IntegrityError raised by a device_logs row pointing at a deleted tag."""
+    orig = getattr(error, 'orig', None)
+    diag = getattr(orig, 'diag', None)
+    return (
+        getattr(orig, 'pgcode', None) == '23503'
+        and 'log_tag' in (getattr(diag, 'constraint_name', None) or '')
+    )
+
+
+@event.listens_for(LogTag, 'after_delete')
+def _evict_deleted_log_tag(mapper, connection, target):
+    # Evicting before COMMIT would let a concurrent lookup re-cache the old id
+    run_after_commit(object_session(target), invalidate_log_tag, target.project_id, target.tag)
@@ -0,0 +1,537 @@
+import os
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import column, delete, func, select, table, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app import db
+from app.models import Device, DeviceLog, DeviceSession, LogLevel, LogTag, Project, RetentionPolicy
+from app.services.device_counters_services import rebuild_device_counters
+from app.services.log_analytics_services import mark_stale
+from app.services.log_partitions_services import detach_log_partition, list_log_partitions
+from app.services.log_rollups_services import rebuild_log_rollups
+from app.services.log_sketches_services import replace_device_sketches
+from response_cache import invalidate_project_responses
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # archiving needs pyarrow, deletion without archive does not
+    pa = None
+    pq = None
+
+LEVEL_FIELDS = {
+    LogLevel.INFO: "info_days",
+    LogLevel.WARNING: "warning_days",
+    LogLevel.ERROR: "error_days",
+}
+POLICY_FIELDS = (*LEVEL_FIELDS.values(), "session_days")
+
+LOGS_TABLE = "device_logs"
+SESSIONS_TABLE = "device_sessions"
+
+LOG_COLUMNS = (
+    DeviceLog.log_id,
+    DeviceLog.project_id,
+    DeviceLog.instance_id,
+    DeviceLog.message,
+    DeviceLog.level,
+    DeviceLog.log_tag_id,
+    DeviceLog.actual_log_time,
+    DeviceLog.created_at,
+)
+SESSION_COLUMNS = (
+    DeviceSession.id,
+    DeviceSession.project_id,
+    DeviceSession.instance_id,
+    DeviceSession.actual_log_time,
+    DeviceSession.idempotency_key,
+    DeviceSession.created_at,
+)
+
+
+def _schema(table):
+    if table == LOGS_TABLE:
+        return pa.schema([
+            ("log_id", pa.int64()),
+            ("project_id", pa.int32()),
+            ("instance_id", pa.string()),
+            ("message", pa.string()),
+            ("level", pa.string()),
+            ("log_tag_id", pa.int32()),
+            ("actual_log_time", pa.timestamp("us")),
+            ("created_at", pa.timestamp("us")),
+        ])
+    return pa.schema([
+        ("id", pa.int64()),
+        ("project_id", pa.int32()),
+        ("instance_id", pa.string()),
+        ("actual_log_time", pa.timestamp("us")),
+        ("idempotency_key", pa.string()),
+        ("created_at", pa.timestamp("us")),
+    ])
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("pyarrow is required to read or write retention archives (pip install pyarrow)")
+
+
+def _naive_utc(dt):
+    if dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# --- Policies ---
+
+def _default_days(field):
+    days = current_app.config[f"RETENTION_DEFAULT_{field.upper()}"]
+    return days or None
+
+
+def _policy_dict(project_id, policy):
+    if policy is None:
+        return {
+            "project_id": project_id,
+            **{field: _default_days(field) for field in POLICY_FIELDS},
+            "archive": True,
+            "source": "default",
+        }
+    return {
+        "project_id": project_id,
+        **{field: getattr(policy, field) for field in POLICY_FIELDS},
+        "archive": policy.archive,
+        "source": "project",
+    }
+
+
+def effective_policy(project_id):
+    """Days to keep per level and for sessions (None = forever), plus the archive flag.
+
+    Fields left NULL on the project's retention_policies row keep data forever;
+    projects without a row fall back to the RETENTION_DEFAULT_* settings.
+    """
+    return _policy_dict(project_id, db.session.get(RetentionPolicy, project_id))
+
+
+def set_policy(project_id, values):
+    """Create or update a project's policy from a dict of POLICY_FIELDS and/or archive."""
+    policy = db.session.get(RetentionPolicy, project_id)
+    if policy is None:
+        policy = RetentionPolicy(project_id=project_id)
+        db.session.add(policy)
+    for field in POLICY_FIELDS:
+        if field in values:
+            setattr(policy, field, values[field])
+    if "archive" in values:
+        policy.archive = bool(values["archive"])
+    db.session.commit()
+    return _policy_dict(project_id, policy)
+
+
+def all_policies():
+    """effective_policy for every project, in one query."""
+    rows = db.session.execute(
+        select(Project.project_id, RetentionPolicy)
+        .outerjoin(RetentionPolicy, RetentionPolicy.project_id == Project.project_id)
+    ).all()
+    return {row.project_id: _policy_dict(row.project_id, row.RetentionPolicy) for row in rows}
+
+
+# --- Archive files ---
+
+def archive_dir(table, project_id, day=None):
+    """<RETENTION_ARCHIVE_DIR>/<table>/project_id=<id>/date=<YYYY-MM-DD>, hive-style."""
+    path = os.path.join(current_app.config["RETENTION_ARCHIVE_DIR"], table, f"project_id={project_id}")
+    if day is not None:
+        path = os.path.join(path, f"date={day:%Y-%m-%d}")
+    return path
+
+
+def _archive_row(table, row):
+    if table == LOGS_TABLE:
+        return {
+            "log_id": row.log_id,
+            "project_id": row.project_id,
+            "instance_id": row.instance_id,
+            "message": row.message,
+            "level": row.level.value if isinstance(row.level, LogLevel) else row.level,
+            "log_tag_id": row.log_tag_id,
+            "actual_log_time": _naive_utc(row.actual_log_time),
+            "created_at": _naive_utc(row.created_at) if row.created_at else None,
+        }
+    return {
+        "id": row.id,
+        "project_id": row.project_id,
+        "instance_id": row.instance_id,
+        "actual_log_time": _naive_utc(row.actual_log_time),
+        "idempotency_key": row.idempotency_key,
+        "created_at": _naive_utc(row.created_at) if row.created_at else None,
+    }
+
+
+def write_archive(table, project_id, rows):
+    """Write rows (ordered by actual_log_time) as Parquet, one file per UTC day.
+
+    File names carry the time range and first id so re-archiving the same
+    chunk after a failed delete overwrites instead of duplicating. Each file
+    is written under a temporary name and renamed, so a crash never leaves a
+    truncated archive behind. Returns the written paths.
+    """
+    _require_pyarrow()
+    id_field = "log_id" if table == LOGS_TABLE else "id"
+    by_day = {}
+    for row in rows:
+        record = _archive_row(table, row)
+        by_day.setdefault(record["actual_log_time"].date(), []).append(record)
+
+    paths = []
+    for day, records in by_day.items():
+        directory = archive_dir(table, project_id, day)
+        os.makedirs(directory, exist_ok=True)
+        first, last = records[0], records[-1]
+        name = (
+            f"{first['actual_log_time']:%Y%m%dT%H%M%S}-{last['actual_log_time']:%Y%m%dT%H%M%S}"
+            f"-{first[id_field]}.parquet"
+        )
+        path = os.path.join(directory, name)
+        tmp_path = path + ".tmp"
+        pq.write_table(
+            pa.Table.from_pylist(records, schema=_schema(table)),
+            tmp_path,
+            compression=current_app.config["RETENTION_ARCHIVE_COMPRESSION"],
+        )
+        os.replace(tmp_path, path)
+        paths.append(path)
+    return paths
+
+
+def list_archives(table, project_id, start=None, end=None):
+    """Archive files of a project whose day overlaps [start, end), oldest first."""
+    root = archive_dir(table, project_id)
+    if not os.path.isdir(root):
+        return []
+    start_day = _naive_utc(start).date() if start else None
+    end_day = _naive_utc(end).date() if end else None
+
+    paths = []
+    for entry in sorted(os.listdir(root)):
+        if not entry.startswith("date="):
+            continue
+        try:
+            day = datetime.strptime(entry[len("date="):], "%Y-%m-%d").date()
+        except ValueError:
+            continue
+        if (start_day and day < start_day) or (end_day and day > end_day):
+            continue
+        directory = os.path.join(root, entry)
+        paths.extend(
+            os.path.join(directory, name)
+            for name in sorted(os.listdir(directory))
+            if name.endswith(".parquet")
+        )
+    return paths
+
+
+# --- Expiry ---
+
+def _expire_chunks(table, project_id, conditions, archive, chunk_size, days):
+    """Archive then delete expired rows chunk by chunk, oldest first, one commit per chunk.
+
+    Chunks are read in (project_id, actual_log_time) index order and deleted by
+    primary key, so each transaction stays short and touches a narrow index range.
+    Adds the UTC days of the deleted rows to ``days``.
+    """
+    if table == LOGS_TABLE:
+        model, columns, id_column = DeviceLog, LOG_COLUMNS, DeviceLog.log_id
+    else:
+        model, columns, id_column = DeviceSession, SESSION_COLUMNS, DeviceSession.id
+
+    deleted = 0
+    while True:
+        rows = db.session.execute(
+            select(*columns)
+            .where(model.project_id == project_id, *conditions)
+            .order_by(model.actual_log_time, id_column)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+
+        if archive:
+            write_archive(table, project_id, rows)
+
+        result = db.session.execute(
+            delete(model)
+            .where(
+                model.project_id == project_id,
+                # Time bounds let Postgres prune device_logs partitions
+                model.actual_log_time >= rows[0].actual_log_time,
+                model.actual_log_time <= rows[-1].actual_log_time,
+                id_column.in_([row[0] for row in rows]),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        deleted += result.rowcount
+        days.update(_naive_utc(row.actual_log_time).date() for row in rows)
+        if len(rows) < chunk_size:
+            break
+    return deleted
+
+
+def _log_conditions(policy, now):
+    """One (level IN ..., time < cutoff) condition pair per distinct retention period."""
+    levels_by_days = {}
+    for level, field in LEVEL_FIELDS.items():
+        if policy[field]:
+            levels_by_days.setdefault(policy[field], []).append(level)
+    return [
+        (DeviceLog.level.in_(levels), DeviceLog.actual_log_time < now - timedelta(days=days))
+        for days, levels in sorted(levels_by_days.items())
+    ]
+
+
+def _day_bounds(day):
+    start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def _refresh_derived(project_ids, log_days, session_days=()):
+    """Recompute what ingestion aggregated from rows expiry or restore changed.
+
+    Rollups, sketches and daily counters of the given projects are rebuilt for
+    the touched UTC days, and exported Parquet days are marked stale.
+    """
+    log_days, session_days = set(log_days), set(session_days)
+    mark_stale(log_days)
+    for project_id in project_ids:
+        for day in sorted(log_days):
+            start, end = _day_bounds(day)
+            rebuild_log_rollups(start, end, project_id)
+            replace_device_sketches(project_id, start, end)
+        for day in sorted(log_days | session_days):
+            rebuild_device_counters(*_day_bounds(day), project_id)
+
+
+def _invalidate_responses(project_id, counts):
+    """Drop cached responses that may still count rows deleted or restored."""
+    if counts.get(LOGS_TABLE):
+        invalidate_project_responses(project_id, "logs")
+    if counts.get(SESSIONS_TABLE):
+        # Session counts are cached under the device list's scope
+        invalidate_project_responses(project_id, "devices")
+
+
+def expire_project(project_id, policy=None, now=None, dry_run=False):
+    """Apply one project's policy. Returns {"logs": n, "sessions": n} rows deleted (or due, on dry run)."""
+    if policy is None:
+        policy = effective_policy(project_id)
+    now = now or datetime.now(timezone.utc)
+    chunk_size = current_app.config["RETENTION_CHUNK_SIZE"]
+    if policy["archive"] and not dry_run:
+        _require_pyarrow()
+
+    work = [(LOGS_TABLE, conditions) for conditions in _log_conditions(policy, now)]
+    if policy["session_days"]:
+        work.append((
+            SESSIONS_TABLE,
+            (DeviceSession.actual_log_time < now - timedelta(days=policy["session_days"]),),
+        ))
+
+    counts = {LOGS_TABLE: 0, SESSIONS_TABLE: 0}
+    days = {LOGS_TABLE: set(), SESSIONS_TABLE: set()}
+    for table, conditions in work:
+        model = DeviceLog if table == LOGS_TABLE else DeviceSession
+        if dry_run:
+            counts[table] += db.session.execute(
+                select(func.count()).select_from(model).where(model.project_id == project_id, *conditions)
+            ).scalar()
+        else:
+            counts[table] += _expire_chunks(table, project_id, conditions, policy["archive"], chunk_size, days[table])
+
+    if not dry_run:
+        _refresh_derived([project_id], days[LOGS_TABLE], days[SESSIONS_TABLE])
+        _invalidate_responses(project_id, counts)
+    if not dry_run and any(counts.values()):
+        current_app.logger.info(
+            f"Retention: project {project_id} deleted {counts[LOGS_TABLE]} logs, "
+            f"{counts[SESSIONS_TABLE]} sessions"
+        )
+    return {"logs": counts[LOGS_TABLE], "sessions": counts[SESSIONS_TABLE]}
+
+
+def droppable_log_partitions(policies, now=None):
+    """Daily partitions whose every row is expired for every project.
+
+    Only possible when each project expires every level; the longest
+    retention across all projects decides the cutoff.
+    """
+    if not policies:
+        return []
+    longest = 0
+    for policy in policies.values():
+        for field in LEVEL_FIELDS.values():
+            if not policy[field]:
+                return []
+            longest = max(longest, policy[field])
+
+    now = now or datetime.now(timezone.utc)
+    cutoff = (now - timedelta(days=longest)).date()
+    # A partition holds [day, day + 1), fully expired once day + 1 <= cutoff
+    return sorted(day for day in list_log_partitions() if day < cutoff)
+
+
+def _detached_log_table(name):
+    return table(name, *(column(c.key) for c in LOG_COLUMNS))
+
+
+def drop_log_partition(day, policies, dry_run=False):
+    """Detach a fully expired daily partition, archive it (for projects that archive), then drop it.
+
+    Detaching first means no late row can land in the partition between
+    archiving and dropping; rows for the day that arrive afterwards go to the
+    default partition and are expired row by row. Rows are streamed in
+    (project_id, actual_log_time) order with a server-side cursor, so memory
+    stays bounded by RETENTION_CHUNK_SIZE. Returns the number of rows the
+    partition held.
+    """
+    chunk_size = current_app.config["RETENTION_CHUNK_SIZE"]
+    start, end = _day_bounds(day)
+
+    if dry_run:
+        window = (DeviceLog.actual_log_time >= start, DeviceLog.actual_log_time < end)
+        return db.session.execute(select(func.count()).select_from(DeviceLog).where(*window)).scalar()
+
+    archived_projects = [pid for pid, policy in policies.items() if policy["archive"]]
+    if archived_projects:
+        _require_pyarrow()
+
+    name = detach_log_partition(day, drop=False)
+    detached = _detached_log_table(name)
+    try:
+        total = _archive_detached(detached, archived_projects, chunk_size) if archived_projects else 0
+    except Exception:
+        # Nothing is lost: the rows stay in the detached table for a manual retry
+        db.session.rollback()
+        current_app.logger.exception(f"Retention: could not archive detached partition {name}, left in place")
+        raise
+
+    db.session.execute(text(f"DROP TABLE {name}"))
+    db.session.commit()
+    _refresh_derived(policies, [day])
+    for project_id in policies:
+        invalidate_project_responses(project_id, "logs")
+    current_app.logger.info(f"Retention: dropped partition {name} ({total} rows archived)")
+    return total
+
+
+def _archive_detached(detached, archived_projects, chunk_size):
+    total = 0
+    result = db.session.execute(
+        select(detached)
+        .where(detached.c.project_id.in_(archived_projects))
+        .order_by(detached.c.project_id, detached.c.actual_log_time, detached.c.log_id),
+        execution_options={"yield_per": chunk_size},
+    )
+    for batch in result.partitions():
+        project_rows = {}
+        for row in batch:
+            project_rows.setdefault(row.project_id, []).append(row)
+        for project_id, rows in project_rows.items():
+            write_archive(LOGS_TABLE, project_id, rows)
+        total += len(batch)
+    result.close()
+    return total
+
+
+def run_retention(project_id=None, dry_run=False, now=None):
+    """Enforce retention policies, dropping whole partitions first where possible.
+
+    Partitions are only dropped on a full run (no project_id). Returns a summary
+    of partitions dropped and rows deleted per project.
+    """
+    now = now or datetime.now(timezone.utc)
+    policies = all_policies()
+    summary = {"partitions": [], "projects": {}}
+
+    if project_id is None:
+        for day in droppable_log_partitions(policies, now):
+            rows = drop_log_partition(day, policies, dry_run=dry_run)
+            summary["partitions"].append({"day": day.isoformat(), "rows": rows})
+    else:
+        policies = {project_id: policies[project_id]} if project_id in policies else {}
+
+    for pid, policy in policies.items():
+        counts = expire_project(pid, policy, now=now, dry_run=dry_run)
+        if any(counts.values()):
+            summary["projects"][pid] = counts
+    return summary
+
+
+# --- Restore ---
+
+def _restore_batch(table, records):
+    if table == LOGS_TABLE:
+        # Devices or tags removed since archiving would violate the foreign keys
+        instance_ids = {r["instance_id"] for r in records}
+        known_devices = set(db.session.execute(
+            select(Device.instance_id).where(Device.instance_id.in_(instance_ids))
+        ).scalars())
+        tag_ids = {r["log_tag_id"] for r in records if r["log_tag_id"] is not None}
+        known_tags = set(db.session.execute(
+            select(LogTag.id).where(LogTag.id.in_(tag_ids))
+        ).scalars()) if tag_ids else set()
+
+        values = [
+            {
+                **r,
+                "level": LogLevel(r["level"]),
+                "log_tag_id": r["log_tag_id"] if r["log_tag_id"] in known_tags else None,
+            }
+            for r in records
+            if r["instance_id"] in known_devices
+        ]
+        model = DeviceLog
+    else:
+        instance_ids = {r["instance_id"] for r in records}
+        known_devices = set(db.session.execute(
+            select(Device.instance_id).where(Device.instance_id.in_(instance_ids))
+        ).scalars())
+        values = [r for r in records if r["instance_id"] in known_devices]
+        model = DeviceSession
+
+    if not values:
+        return 0
+    # Rows still present (or re-restored) are skipped by their primary key
+    result = db.session.execute(pg_insert(model).values(values).on_conflict_do_nothing())
+    db.session.commit()
+    return result.rowcount
+
+
+def restore_archive(table, project_id, start, end):
+    """Re-import archived rows of a project with actual_log_time in [start, end).
+
+    Restored rows are older than the policy cutoff, so the next retention run
+    expires them again unless the project's policy is relaxed first.
+    Returns the number of rows inserted.
+    """
+    _require_pyarrow()
+    chunk_size = current_app.config["RETENTION_CHUNK_SIZE"]
+    start, end = _naive_utc(start), _naive_utc(end)
+    filters = [("actual_log_time", ">=", start), ("actual_log_time", "<", end)]
+
+    restored = 0
+    days = set()
+    for path in list_archives(table, project_id, start, end):
+        records = pq.read_table(path, filters=filters).to_pylist()
+        for i in range(0, len(records), chunk_size):
+            restored += _restore_batch(table, records[i:i + chunk_size])
+        days.update(r["actual_log_time"].date() for r in records)
+    if restored:
+        if table == LOGS_TABLE:
+            _refresh_derived([project_id], days)
+        else:
+            _refresh_derived([project_id], (), days)
+    _invalidate_responses(project_id, {table: restored})
+    return restored
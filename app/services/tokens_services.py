@@ -0,0 +1,70 @@
+from flask import current_app
+from redis.exceptions import RedisError
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+from app.models import Token, TokenStatus
+from app.utils.after_commit import run_after_commit
+from cache import (
+    acquire_valid_tokens_load,
+    add_valid_tokens,
+    mark_valid_tokens_loaded,
+    revoke_token,
+)
+
+
+def load_valid_tokens():
+    """Fill the shared known-valid token set from the database.
+
+    Returns False if another worker is already loading it. Entries are only
+    added here; revocations remove them, and stale entries just fall through
+    to the database check.
+    """
+    if not acquire_valid_tokens_load():
+        return False
+    tokens = Token.query.with_entities(Token.token).filter(Token.status == TokenStatus.ACTIVE)
+    add_valid_tokens([row.token for row in tokens])
+    mark_valid_tokens_loaded()
+    return True
+
+
+def _revoke(token):
+    try:
+        revoke_token(token)
+    except RedisError:
+        current_app.logger.exception("Could not publish token revocation")
+
+
+def _register(token):
+    try:
+        add_valid_tokens([token])
+    except RedisError:
+        current_app.logger.exception("Could not register token")
+
+
+# Cache changes are published only once the row change is committed. Earlier,
+# a concurrent auth miss could still read the ACTIVE row and re-cache it.
+
+@event.listens_for(Token, 'after_insert')
+def _register_new_token(mapper, connection, target):
+    if target.status in (None, TokenStatus.ACTIVE):
+        run_after_commit(object_session(target), _register, target.token)
+
+
+@event.listens_for(Token, 'after_update')
+def _revoke_deactivated_token(mapper, connection, target):
+    session = object_session(target)
+    history = inspect(target).attrs.status.history
+    if history.has_changes():
+        if target.status == TokenStatus.ACTIVE:
+            run_after_commit(session, _register, target.token)
+        else:
+            run_after_commit(session, _revoke, target.token)
+
+    token_history = inspect(target).attrs.token.history
+    for old_token in token_history.deleted or ():
+        run_after_commit(session, _revoke, old_token)
+
+
+@event.listens_for(Token, 'after_delete')
+def _revoke_deleted_token(mapper, connection, target):
+    run_after_commit(object_session(target), _revoke, target.token)
@@ -0,0 +1,25 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Callbacks queued on session.info, run once the transaction has committed
+_CALLBACKS_KEY = 'after_commit_callbacks'
+
+
+def run_after_commit(session, callback, *args):
+    """Run ``callback(*args)`` after ``session`` commits, drop it on rollback.
+
+    For cache invalidations that other processes must not undo by reading
+    the old row before the change is visible.
+    """
+    session.info.setdefault(_CALLBACKS_KEY, []).append((callback, args))
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_callbacks(session):
+    for callback, args in session.info.pop(_CALLBACKS_KEY, ()):
+        callback(*args)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_callbacks(session):
+    session.info.pop(_CALLBACKS_KEY, None)
@@ -0,0 +1,45 @@
+import base64
+import json
+from datetime import datetime
+
+
+def encode_cursor(actual_log_time, log_id, direction):
+    """Opaque cursor for (actual_log_time, log_id) keyset pagination.
+
+    direction is "next" (older rows) or "prev" (newer rows).
+    """
+    payload = json.dumps({
+        "t": actual_log_time.isoformat(),
+        "id": log_id,
+        "d": direction,
+    }, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return (actual_log_time, log_id, direction). Raises ValueError if invalid."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction = payload["d"]
+        if direction not in ("next", "prev"):
+            raise ValueError
+        return datetime.fromisoformat(payload["t"]), int(payload["id"]), direction
+    except (KeyError, TypeError, ValueError, json.JSONDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def encode_rank_cursor(rank, log_id):
+    """Opaque cursor for (rank, log_id) pagination of search results."""
+    payload = json.dumps({"r": rank, "id": log_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_rank_cursor(cursor):
+    """Return (rank, log_id). Raises ValueError if invalid."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(payload["r"]), int(payload["id"])
+    except (KeyError, TypeError, ValueError, json.JSONDecodeError):
+        raise ValueError("Invalid cursor")
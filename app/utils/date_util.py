@@ -1,14 +1,36 @@
+import time
 from datetime import timezone,datetime
 
+# Naive DB timestamps go through astimezone() as local time; when the
+# server runs in UTC that conversion is a no-op and can be skipped.
+_LOCAL_IS_UTC = time.timezone == 0 and not time.daylight
+
 def to_iso_utc(dt):
     if dt is None:
         return None
     return dt.astimezone(timezone.utc).isoformat().replace('+00:00', 'Z')
 
+def to_iso_utc_many(values):
+    """to_iso_utc over a column of datetimes, same output.
+
+    Formats the whole column in one comprehension, without the
+    astimezone()/replace() round trip when it is a no-op.
+    """
+    if not _LOCAL_IS_UTC:
+        return [to_iso_utc(dt) for dt in values]
+    utc = timezone.utc
+    return [
+        None if dt is None
+        else dt.isoformat() + 'Z' if dt.tzinfo is None
+        else dt.replace(tzinfo=None).isoformat() + 'Z' if dt.tzinfo is utc
+        else to_iso_utc(dt)
+        for dt in values
+    ]
+
 def parse_iso_datetime(value):
     dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
 
     if dt.tzinfo is None:
         dt = dt.replace(tzinfo=timezone.utc)
 
-    return dt.astimezone(timezone.utc)
\ No newline at end of file
+    return dt.astimezone(timezone.utc)
@@ -0,0 +1,52 @@
+import threading
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait to check out a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "slow_checkouts": 0,
+        }
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self._stats["timeouts"] += 1
+            raise
+        finally:
+            waited_ms = (time.perf_counter() - started) * 1000
+            with self._stats_lock:
+                self._stats["checkouts"] += 1
+                self._stats["total_wait_ms"] += waited_ms
+                self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], waited_ms)
+                if waited_ms >= 10:
+                    self._stats["slow_checkouts"] += 1
+
+    def wait_stats(self, reset=False):
+        """Checkout wait counters since start (or the last reset) plus current pool usage."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            if reset:
+                for key in self._stats:
+                    self._stats[key] = 0
+        stats["avg_wait_ms"] = stats["total_wait_ms"] / stats["checkouts"] if stats["checkouts"] else 0.0
+        stats.update({
+            "pool_size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": self.overflow(),
+        })
+        return stats
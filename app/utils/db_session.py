@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, has_app_context, has_request_context
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = "replica"
+
+# 0 when the replica has replayed everything it received, otherwise the
+# age of the last replayed transaction. An idle primary produces no new
+# transactions, so the timestamp alone would report growing lag.
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+_replica_state = {"checked_at": None, "lag": None, "healthy": False, "error": None}
+_replica_lock = threading.Lock()
+
+
+def statement_timeout(ms):
+    """Run the endpoint's queries with ``SET LOCAL statement_timeout``.
+
+    SET LOCAL only lasts for the transaction, so it is safe with
+    transaction pooling. New transactions get it from the after_begin hook;
+    one already open (e.g. @token_required queried the DB on a cache miss)
+    gets it right away.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            from app import db
+
+            g.statement_timeout_ms = ms
+            if db.session.in_transaction():
+                db.session.connection().exec_driver_sql(f"SET LOCAL statement_timeout = {int(ms)}")
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+
+def use_replica(f):
+    """Route the endpoint's reads to the read replica when one is configured
+    and within DB_REPLICA_MAX_LAG_SECONDS; falls back to the primary otherwise.
+
+    Writes and flushes always go to the primary. Apply it below
+    @token_required so authentication keeps reading from the primary.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        g.use_replica = True
+        try:
+            return f(*args, **kwargs)
+        finally:
+            g.use_replica = False
+    return decorated
+
+
+def _measure_replica_lag(engine):
+    with engine.connect() as conn:
+        return float(conn.execute(REPLICA_LAG_SQL).scalar() or 0)
+
+
+def replica_status(force=False):
+    """Cached replica lag check, refreshed every DB_REPLICA_LAG_CHECK_INTERVAL seconds."""
+    config = current_app.config
+    engine = current_app.extensions["sqlalchemy"].engines.get(REPLICA_BIND)
+    if engine is None:
+        return {"configured": False, "healthy": False}
+
+    now = time.monotonic()
+    checked_at = _replica_state["checked_at"]
+    if force or checked_at is None or now - checked_at >= config["DB_REPLICA_LAG_CHECK_INTERVAL"]:
+        with _replica_lock:
+            checked_at = _replica_state["checked_at"]
+            if force or checked_at is None or now - checked_at >= config["DB_REPLICA_LAG_CHECK_INTERVAL"]:
+                try:
+                    lag = _measure_replica_lag(engine)
+                    _replica_state.update(
+                        lag=lag,
+                        healthy=lag <= config["DB_REPLICA_MAX_LAG_SECONDS"],
+                        error=None,
+                    )
+                except Exception as e:
+                    logger.warning("Replica lag check failed: %s", e)
+                    _replica_state.update(lag=None, healthy=False, error=str(e))
+                _replica_state["checked_at"] = time.monotonic()
+
+    return {
+        "configured": True,
+        "healthy": _replica_state["healthy"],
+        "lag_seconds": _replica_state["lag"],
+        "max_lag_seconds": config["DB_REPLICA_MAX_LAG_SECONDS"],
+        "error": _replica_state["error"],
+    }
+
+
+class RoutingSession(FlaskSession):
+    """Session that sends reads to the replica bind inside @use_replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and has_request_context()
+            and g.get("use_replica")
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+            and replica_status()["healthy"]
+        ):
+            return current_app.extensions["sqlalchemy"].engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_statement_timeout(session, transaction, connection):
+    if not has_app_context():
+        return
+    timeout_ms = None
+    if has_request_context():
+        timeout_ms = g.get("statement_timeout_ms")
+    if timeout_ms is not None:
+        # Explicit per-endpoint value, 0 lifts the connection default
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+        return
+    config = current_app.config
+    if not config["DB_PGBOUNCER_MODE"]:
+        # Set at connect time through the startup options instead
+        return
+    timeout_ms = config["DB_STATEMENT_TIMEOUT_MS"]
+    if timeout_ms:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
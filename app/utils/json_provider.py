@@ -0,0 +1,55 @@
+import enum
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib provider
+    orjson = None
+
+
+class EnumJSONProvider(DefaultJSONProvider):
+    """Stdlib provider that also encodes enums by value, like OrjsonProvider.
+
+    Everything else, raw datetimes included (HTTP-date), is left to Flask's
+    default so both providers give identical responses.
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, enum.Enum):
+            return o.value
+        return DefaultJSONProvider.default(o)
+
+
+if orjson is not None:
+    class OrjsonProvider(EnumJSONProvider):
+        """orjson-backed provider: native enum/dataclass encoding in C.
+
+        Raw datetimes are passed through to EnumJSONProvider.default, so they
+        keep Flask's HTTP-date format; routes that want ISO 8601 format them
+        before returning (to_iso_utc_many).
+        """
+
+        def _options(self, **kwargs):
+            option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            if kwargs.get("sort_keys", self.sort_keys):
+                option |= orjson.OPT_SORT_KEYS
+            if kwargs.get("indent") or (self.compact is False) or (self.compact is None and self._app.debug):
+                option |= orjson.OPT_INDENT_2
+            return option
+
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, default=self.default, option=self._options(**kwargs)).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+else:
+    OrjsonProvider = None
+
+
+def configure_json(app):
+    """Install the JSON provider selected by JSON_PROVIDER (orjson | default)."""
+    if app.config["JSON_PROVIDER"] == "orjson" and OrjsonProvider is not None:
+        app.json = OrjsonProvider(app)
+    else:
+        app.json = EnumJSONProvider(app)
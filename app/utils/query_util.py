@@ -0,0 +1,20 @@
+import json
+from app import db
+
+
+def estimate_count(query):
+    """Row estimate from the planner (EXPLAIN), without scanning the rows.
+
+    Accepts an ORM Query or a Core select.
+    """
+    statement = getattr(query, "statement", query)
+    compiled = statement.compile(
+        dialect=db.session.get_bind().dialect,
+        compile_kwargs={"literal_binds": True},
+    )
+    plan = db.session.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}"
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,57 @@
+# backfill_device_country.py
+# Sets Device.country from a CSV of instance_id,ip pairs (e.g. extracted from
+# the nginx access log of POST /api/devices/init), resolved with the GeoIP service.
+#   python backfill_device_country.py devices_ips.csv
+#   python backfill_device_country.py devices_ips.csv --overwrite --batch-size 5000
+import argparse
+import csv
+from sqlalchemy import bindparam, update
+from app import create_app, db
+from app.models import Device
+from app.services.geoip_services import lookup_countries
+
+
+def backfill(rows, overwrite):
+    countries = lookup_countries(ip for _, ip in rows)
+    params = [
+        {"b_instance_id": instance_id, "b_country": countries[ip]}
+        for instance_id, ip in rows
+        if countries.get(ip)
+    ]
+    if not params:
+        return 0
+
+    stmt = (
+        update(Device.__table__)
+        .where(Device.__table__.c.instance_id == bindparam("b_instance_id"))
+        .values(country=bindparam("b_country"))
+    )
+    if not overwrite:
+        stmt = stmt.where(Device.__table__.c.country.is_(None))
+    db.session.execute(stmt, params)
+    db.session.commit()
+    return len(params)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill Device.country from IP addresses")
+    parser.add_argument("csv_path", help="CSV with instance_id,ip columns (no header)")
+    parser.add_argument("--overwrite", action="store_true", help="Replace countries already set")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        total = 0
+        batch = []
+        with open(args.csv_path, newline="") as f:
+            for row in csv.reader(f):
+                if len(row) < 2:
+                    continue
+                batch.append((row[0].strip(), row[1].strip()))
+                if len(batch) >= args.batch_size:
+                    total += backfill(batch, args.overwrite)
+                    batch = []
+        if batch:
+            total += backfill(batch, args.overwrite)
+        print(f"✅ Updated country for up to {total} devices")
@@ -0,0 +1,123 @@
+# benchmarks/explain_get_devices.py
+# EXPLAIN ANALYZE of the GET /api/devices aggregation for one project, with the
+# number of device_logs / device_sessions / device_daily_counters rows each
+# scan actually read.
+# The query is tenant-local when no table reads more rows than the project
+# itself has in the window; exits 1 otherwise.
+#
+#   python benchmarks/explain_get_devices.py --project-id 3 --days 7
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import Device, DeviceDailyCounter, DeviceLog, DeviceSession  # noqa: E402
+from app.services.devices_services import device_activity_subqueries  # noqa: E402
+
+TABLES = ("device_logs", "device_sessions", "device_daily_counters")
+
+
+def build_query(project_id, start_dt, end_dt):
+    log_subq, session_subq = device_activity_subqueries(project_id, start_dt, end_dt)
+    return (
+        db.session.query(
+            Device.instance_id,
+            func.coalesce(log_subq.c.log_count, 0),
+            func.coalesce(session_subq.c.session_count, 0),
+        )
+        .join(log_subq, log_subq.c.instance_id == Device.instance_id)
+        .outerjoin(session_subq, session_subq.c.instance_id == Device.instance_id)
+        .filter(Device.project_id == project_id)
+    )
+
+
+def explain(query):
+    compiled = query.statement.compile(
+        dialect=db.session.get_bind().dialect,
+        compile_kwargs={"literal_binds": True},
+    )
+    plan = db.session.connection().exec_driver_sql(
+        f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {compiled}"
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def rows_read(node, totals):
+    """Sum rows read per table, including rows discarded by filters."""
+    relation = node.get("Relation Name", "")
+    for table in TABLES:
+        # Partitions are named device_logs_pYYYYMMDD (plus device_logs_default)
+        if relation == table or relation.startswith(f"{table}_"):
+            loops = node.get("Actual Loops", 1)
+            read = node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0) \
+                + node.get("Rows Removed by Index Recheck", 0)
+            totals[table] = totals.get(table, 0) + read * loops
+    for child in node.get("Plans", []):
+        rows_read(child, totals)
+    return totals
+
+
+def tenant_rows(project_id, start_dt, end_dt):
+    logs = db.session.query(func.count()).select_from(DeviceLog).filter(
+        DeviceLog.project_id == project_id,
+        DeviceLog.actual_log_time >= start_dt,
+        DeviceLog.actual_log_time < end_dt,
+    ).scalar()
+    sessions = db.session.query(func.count()).select_from(DeviceSession).filter(
+        DeviceSession.project_id == project_id,
+        DeviceSession.actual_log_time >= start_dt,
+        DeviceSession.actual_log_time < end_dt,
+    ).scalar()
+    counters = db.session.query(func.count()).select_from(DeviceDailyCounter).filter(
+        DeviceDailyCounter.project_id == project_id,
+        DeviceDailyCounter.day >= start_dt.date(),
+        DeviceDailyCounter.day <= end_dt.date(),
+    ).scalar()
+    return {"device_logs": logs, "device_sessions": sessions, "device_daily_counters": counters}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that GET /api/devices stays tenant-local")
+    parser.add_argument("--project-id", type=int, required=True)
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--plan", action="store_true", help="Print the full JSON plan")
+    args = parser.parse_args()
+
+    end_dt = datetime.now(timezone.utc)
+    start_dt = end_dt - timedelta(days=args.days)
+
+    app = create_app()
+    with app.app_context():
+        query = build_query(args.project_id, start_dt, end_dt)
+
+        timings = []
+        for _ in range(args.runs):
+            t0 = time.perf_counter()
+            query.all()
+            timings.append((time.perf_counter() - t0) * 1000)
+        timings.sort()
+
+        plan = explain(query)
+        read = rows_read(plan["Plan"], {})
+        own = tenant_rows(args.project_id, start_dt, end_dt)
+
+        if args.plan:
+            print(json.dumps(plan, indent=2))
+        print(f"median {timings[len(timings) // 2]:.1f} ms, "
+              f"planning {plan['Planning Time']:.1f} ms, execution {plan['Execution Time']:.1f} ms")
+
+        ok = True
+        for table in TABLES:
+            status = "ok" if read.get(table, 0) <= own[table] else "READS OTHER TENANTS"
+            ok = ok and status == "ok"
+            print(f"{table}: read {read.get(table, 0)} rows, project has {own[table]} → {status}")
+        sys.exit(0 if ok else 1)
@@ -0,0 +1,94 @@
+# benchmarks/serialization.py
+# Serialization time for a 10k-row log page: per-row to_iso_utc + the stdlib
+# JSON provider (before) vs to_iso_utc_many + the orjson provider (after).
+# No database needed.
+#
+#   python benchmarks/serialization.py --rows 10000 --runs 20
+import argparse
+import os
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from app.models import LogLevel  # noqa: E402
+from app.services.log_queries_services import serialize_log_rows  # noqa: E402
+from app.utils.date_util import to_iso_utc  # noqa: E402
+from app.utils.json_provider import EnumJSONProvider, OrjsonProvider  # noqa: E402
+
+LogRow = namedtuple("LogRow", "log_id project_id instance_id message level tag actual_log_time created_at")
+
+
+def make_rows(n):
+    start = datetime(2026, 1, 1)
+    levels = list(LogLevel)
+    return [
+        LogRow(
+            log_id=i,
+            project_id=1,
+            instance_id=f"dvc_{i % 500:05d}",
+            message=f"Request {i} finished in {i % 977} ms",
+            level=levels[i % len(levels)],
+            tag="checkout" if i % 3 else None,
+            actual_log_time=start + timedelta(milliseconds=137 * i),
+            created_at=start + timedelta(milliseconds=137 * i + 50),
+        )
+        for i in range(n)
+    ]
+
+
+def serialize_before(rows):
+    return [
+        {
+            "log_id": row.log_id,
+            "instance_id": row.instance_id,
+            "project_id": row.project_id,
+            "level": row.level.value if row.level else None,
+            "tag": row.tag,
+            "message": row.message,
+            "actual_log_time": to_iso_utc(row.actual_log_time),
+            "created_at": to_iso_utc(row.created_at),
+        }
+        for row in rows
+    ]
+
+
+def best_of(runs, fn):
+    timings = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare log page serialization paths")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    rows = make_rows(args.rows)
+    default_provider = DefaultJSONProvider(app)
+    fast_provider = OrjsonProvider(app) if OrjsonProvider is not None else EnumJSONProvider(app)
+
+    with app.app_context():
+        before_body = default_provider.response({"logs": serialize_before(rows)}).get_data()
+        after_body = fast_provider.response({"logs": serialize_log_rows(rows)}).get_data()
+        assert default_provider.loads(before_body) == default_provider.loads(after_body), "outputs differ"
+
+        cases = [
+            ("rows → dicts   (per-row to_iso_utc)", lambda: serialize_before(rows)),
+            ("rows → dicts   (to_iso_utc_many)", lambda: serialize_log_rows(rows)),
+            ("end to end     (before: stdlib provider)", lambda: default_provider.response({"logs": serialize_before(rows)})),
+            (f"end to end     (after: {type(fast_provider).__name__})",
+             lambda: fast_provider.response({"logs": serialize_log_rows(rows)})),
+        ]
+        print(f"{args.rows} rows, best of {args.runs}")
+        for name, fn in cases:
+            print(f"  {name:<44} {best_of(args.runs, fn):8.1f} ms")
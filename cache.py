@@ -1,24 +1,164 @@
 import redis
+import hashlib
 import json
+import os
+import threading
+import time
 from app.config import Config
+from app.utils.ttl_cache import TTLCache
 
 r = redis.from_url(Config.REDIS_URL, decode_responses=True)
 
+TOKEN_REVOCATION_CHANNEL = "token_revocations"
+
+# token -> (user_id, project_id), in front of Redis for this process
+_local_sessions = TTLCache(maxsize=Config.TOKEN_CACHE_SIZE, ttl=Config.TOKEN_CACHE_TTL)
+# token hash -> True for tokens recently rejected
+_local_invalid = TTLCache(maxsize=Config.TOKEN_CACHE_SIZE, ttl=Config.INVALID_TOKEN_TTL)
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+def _listen_for_revocations():
+    """Evict revoked tokens from this process as soon as they are published"""
+    while True:
+        try:
+            pubsub = r.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(TOKEN_REVOCATION_CHANNEL)
+            # Anything cached while disconnected may have missed a revocation
+            _local_sessions.clear()
+            for message in pubsub.listen():
+                _local_sessions.pop(message["data"])
+        except redis.RedisError:
+            _local_sessions.clear()
+            time.sleep(1)
+
+def _ensure_revocation_listener():
+    """Start the listener thread once per process (after any fork)"""
+    global _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        if _listener_pid != os.getpid():
+            threading.Thread(target=_listen_for_revocations, daemon=True).start()
+            _listener_pid = os.getpid()
+
 def cache_token(token, user_id, project_id):
     """Cache token and user_id for 1 hour"""
-    data = {"user_id": user_id,"project_id":project_id}
-    r.setex(f"token:{token}", 3600, json.dumps(data))
+    r.setex(f"token:{token}", 3600, f"{user_id}:{project_id}")
+    _local_sessions.set(token, (user_id, project_id))
 
 def get_user_by_token(token):
     """Retrieve user_id from cache"""
-    data = r.get(f"token:{token}")
-    if data:
-        return json.loads(data).get("user_id")
-    return None
+    session = get_user_session(token)
+    return session[0] if session else None
 
 def get_user_session(token):
-    """Retrieve user_id and project_id from cache"""
+    """Retrieve (user_id, project_id) from cache"""
+    _ensure_revocation_listener()
+    session = _local_sessions.get(token)
+    if session:
+        return session
+
     data = r.get(f"token:{token}")
-    if data:
-        return json.loads(data)
-    return None
\ No newline at end of file
+    if not data:
+        return None
+    if data.startswith("{"):
+        # Entry written before the compact format
+        data = json.loads(data)
+        session = (data["user_id"], data["project_id"])
+    else:
+        user_id, project_id = data.split(":")
+        session = (int(user_id), int(project_id))
+    _local_sessions.set(token, session)
+    return session
+
+def revoke_token(token):
+    """Remove token from every cache tier and notify other processes"""
+    _local_sessions.pop(token)
+    pipe = r.pipeline(transaction=False)
+    pipe.delete(f"token:{token}")
+    pipe.srem("valid_token_hashes", token_hash(token))
+    pipe.publish(TOKEN_REVOCATION_CHANNEL, token)
+    pipe.execute()
+
+def token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def cache_invalid_token(token):
+    """Remember a rejected token for a short time"""
+    hashed = token_hash(token)
+    _local_invalid.set(hashed, True)
+    r.setex(f"token_invalid:{hashed}", Config.INVALID_TOKEN_TTL, 1)
+
+def is_token_known_invalid(token):
+    """True if token was rejected recently"""
+    hashed = token_hash(token)
+    if _local_invalid.get(hashed):
+        return True
+    if r.exists(f"token_invalid:{hashed}"):
+        _local_invalid.set(hashed, True)
+        return True
+    return False
+
+def add_valid_tokens(tokens):
+    """Add tokens to the shared set of known-valid token hashes"""
+    hashes = [token_hash(token) for token in tokens]
+    if hashes:
+        pipe = r.pipeline(transaction=False)
+        pipe.sadd("valid_token_hashes", *hashes)
+        if len(hashes) == 1:
+            # A token created after being rejected must not stay rejected
+            pipe.delete(f"token_invalid:{hashes[0]}")
+        pipe.execute()
+
+def is_token_possibly_valid(token):
+    """True/False from the known-valid set, None while the set is not loaded"""
+    pipe = r.pipeline(transaction=False)
+    pipe.exists("valid_token_hashes:ready")
+    pipe.sismember("valid_token_hashes", token_hash(token))
+    ready, member = pipe.execute()
+    if not ready:
+        return None
+    return bool(member)
+
+def acquire_valid_tokens_load():
+    """Only one worker (re)loads the known-valid set at a time"""
+    return bool(r.set("valid_token_hashes:loading", 1, nx=True, ex=30))
+
+def mark_valid_tokens_loaded():
+    """The set is trusted until the flag expires, then reloaded from the DB"""
+    pipe = r.pipeline(transaction=False)
+    pipe.setex("valid_token_hashes:ready", Config.VALID_TOKEN_SET_TTL, 1)
+    pipe.delete("valid_token_hashes:loading")
+    pipe.execute()
+
+def record_auth_failure(ip, token):
+    """Count a failed authentication per IP and per token (window slides while failing)"""
+    window = Config.AUTH_FAILURE_WINDOW
+    pipe = r.pipeline(transaction=False)
+    for key in (f"auth_fail:ip:{ip}", f"auth_fail:token:{token_hash(token)}"):
+        pipe.incr(key)
+        pipe.expire(key, window)
+    pipe.execute()
+
+def is_auth_throttled(ip, token):
+    """True once an IP or token exceeded AUTH_FAILURE_LIMIT failures in the window"""
+    counts = r.mget(f"auth_fail:ip:{ip}", f"auth_fail:token:{token_hash(token)}")
+    return any(int(count or 0) >= Config.AUTH_FAILURE_LIMIT for count in counts)
+
+def get_log_tag_ids(project_id, tags):
+    """Retrieve cached log_tag ids for a project, as {tag: id}"""
+    values = r.hmget(f"log_tags:{project_id}", tags)
+    return {tag: int(value) for tag, value in zip(tags, values) if value is not None}
+
+def cache_log_tag_ids(project_id, tag_ids):
+    """Cache {tag: log_tag_id} for a project for 1 day"""
+    key = f"log_tags:{project_id}"
+    pipe = r.pipeline(transaction=False)
+    pipe.hset(key, mapping=tag_ids)
+    pipe.expire(key, 86400)
+    pipe.execute()
+
+def delete_log_tag(project_id, tag):
+    """Remove a deleted log tag from cache"""
+    r.hdel(f"log_tags:{project_id}", tag)
@@ -0,0 +1,40 @@
+# compact_rollups.py
+# Rebuilds log_hourly_rollups from device_logs, one project-hour per transaction.
+# Backfill:  python compact_rollups.py --start 2026-01-01T00:00:00Z
+# Cron:      python compact_rollups.py --hours 3
+# --sketches also refills the approx=true HyperLogLog sketches from the rebuilt rollups.
+# --counters also rebuilds the per-device daily counters of GET /api/devices (whole UTC days).
+import argparse
+from datetime import datetime, timedelta, timezone
+from app import create_app
+from app.services.log_rollups_services import floor_hour, rebuild_log_rollups
+from app.services.log_sketches_services import rebuild_device_sketches
+from app.services.device_counters_services import rebuild_device_counters
+from app.utils.date_util import parse_iso_datetime
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild hourly log rollups")
+    parser.add_argument("--start", help="ISO 8601 start (defaults to now - --hours)")
+    parser.add_argument("--end", help="ISO 8601 end (defaults to now)")
+    parser.add_argument("--hours", type=int, default=3, help="Window to rebuild when --start is omitted")
+    parser.add_argument("--project-id", type=int, default=None)
+    parser.add_argument("--sketches", action="store_true", help="Also rebuild distinct-device sketches")
+    parser.add_argument("--counters", action="store_true", help="Also rebuild per-device daily counters")
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc)
+    end = parse_iso_datetime(args.end) if args.end else now
+    start = parse_iso_datetime(args.start) if args.start else floor_hour(now) - timedelta(hours=args.hours)
+
+    app = create_app()
+    with app.app_context():
+        chunk_start = start
+        while chunk_start < end:
+            chunk_end = min(chunk_start + timedelta(days=1), end)
+            rebuild_log_rollups(chunk_start, chunk_end, args.project_id)
+            if args.sketches:
+                rebuild_device_sketches(chunk_start, chunk_end, args.project_id)
+            if args.counters:
+                rebuild_device_counters(chunk_start, chunk_end, args.project_id)
+            print(f"Rebuilt rollups {chunk_start.isoformat()} → {chunk_end.isoformat()}")
+            chunk_start = chunk_end
@@ -1,8 +1,10 @@
 # create_tables_prod.py
 from app import create_app, db
+from app.services.log_partitions_services import ensure_log_partitions
 
 if __name__ == "__main__":
     app = create_app()
     with app.app_context():
         db.create_all()
+        ensure_log_partitions()
         print("All tables created successfully!")
@@ -0,0 +1,21 @@
+# log_worker.py
+# Drains the Redis ingestion stream into device_logs (LOG_INGEST_MODE=queue).
+# Run one or more per host: python log_worker.py --consumer worker-1
+import argparse
+import os
+import socket
+from app import create_app
+from app.services.log_queue_services import run_worker
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write queued device logs to the database")
+    parser.add_argument(
+        "--consumer",
+        default=f"{socket.gethostname()}-{os.getpid()}",
+        help="Consumer name within the Redis consumer group",
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        run_worker(args.consumer)
@@ -0,0 +1,32 @@
+# maintain_partitions.py
+# Pre-creates future device_logs partitions and expires old ones.
+# Run daily from cron: python maintain_partitions.py
+#
+# Expiry drops whole partitions without archiving and ignores per-project
+# retention policies. Once any policy or RETENTION_DEFAULT_* is set it is
+# refused; leave LOG_PARTITION_RETENTION_DAYS at 0 and run retention.py instead.
+import argparse
+import sys
+from app import create_app
+from app.services.log_partitions_services import ensure_log_partitions, expire_log_partitions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain daily device_logs partitions")
+    parser.add_argument("--days-ahead", type=int, default=None,
+                        help="Create partitions up to this many days ahead (LOG_PARTITION_DAYS_AHEAD)")
+    parser.add_argument("--retention-days", type=int, default=None,
+                        help="Expire partitions older than this, 0 keeps all (LOG_PARTITION_RETENTION_DAYS)")
+    parser.add_argument("--detach-only", action="store_true", default=None,
+                        help="Detach expired partitions instead of dropping them")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        created = ensure_log_partitions(args.days_ahead)
+        print(f"Created {len(created)} partition(s): {', '.join(created) or '-'}")
+
+        try:
+            expired = expire_log_partitions(args.retention_days, args.detach_only)
+        except RuntimeError as e:
+            sys.exit(f"Not expiring partitions: {e}")
+        print(f"Expired {len(expired)} partition(s): {', '.join(expired) or '-'}")
@@ -0,0 +1,40 @@
+"""add full text search to device_logs.message
+
+Revision ID: 26260d9a6e85
+Revises: 984f7782dd16
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '26260d9a6e85'
+down_revision = '984f7782dd16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Stored generated column: Postgres keeps it current on every insert/update.
+    # Rewrites every partition, run during a maintenance window on large tables.
+    op.execute("""
+        ALTER TABLE device_logs
+        ADD COLUMN message_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', message)) STORED
+    """)
+
+    op.create_index('ix_device_logs_message_tsv', 'device_logs', ['message_tsv'],
+                    unique=False, postgresql_using='gin')
+    op.create_index('ix_device_logs_message_trgm', 'device_logs', ['message'],
+                    unique=False, postgresql_using='gin',
+                    postgresql_ops={'message': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_device_logs_message_trgm', table_name='device_logs')
+    op.drop_index('ix_device_logs_message_tsv', table_name='device_logs')
+    op.drop_column('device_logs', 'message_tsv')
@@ -0,0 +1,168 @@
+"""partition device_logs by day on actual_log_time
+
+Revision ID: 498132dfcfd3
+Revises: a84f7c2d9e31
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+import os
+from datetime import timedelta
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '498132dfcfd3'
+down_revision = 'a84f7c2d9e31'
+branch_labels = None
+depends_on = None
+
+DAYS_AHEAD = 7
+# Legacy rows older than this (client clocks can be years off) are left in
+# device_logs_default instead of getting a partition per day
+HISTORY_DAYS = int(os.getenv('LOG_PARTITION_HISTORY_DAYS', 400))
+BATCH_SIZE = 10000
+
+COLUMNS = "log_id, project_id, instance_id, message, level, log_tag_id, actual_log_time, created_at"
+
+INDEXES = [
+    ('ix_device_logs_project_id', ['project_id']),
+    ('ix_device_logs_instance_id', ['instance_id']),
+    ('ix_device_logs_level', ['level']),
+    ('ix_device_logs_log_tag_id', ['log_tag_id']),
+    ('ix_device_logs_actual_log_time', ['actual_log_time']),
+    ('ix_device_logs_created_at', ['created_at']),
+    ('idx_project_instance_time', ['project_id', 'instance_id', 'actual_log_time']),
+]
+
+
+def rename_to_legacy():
+    op.execute("ALTER TABLE device_logs RENAME TO device_logs_legacy")
+    # Free the index names for the new table
+    op.execute("""
+        DO $$
+        DECLARE idx record;
+        BEGIN
+            FOR idx IN SELECT indexname FROM pg_indexes WHERE tablename = 'device_logs_legacy' LOOP
+                EXECUTE format('ALTER INDEX %I RENAME TO %I', idx.indexname, idx.indexname || '_legacy');
+            END LOOP;
+        END $$;
+    """)
+
+
+def create_indexes():
+    for name, columns in INDEXES:
+        op.create_index(name, 'device_logs', columns, unique=False)
+
+
+# Days of the window that hold legacy rows, one index probe per such day
+# (a loose index scan) rather than a scan of the whole table
+LEGACY_DAYS_SQL = sa.text("""
+    WITH RECURSIVE days AS (
+        SELECT min(actual_log_time)::date AS day FROM device_logs_legacy
+        WHERE actual_log_time >= :start AND actual_log_time < :end
+        UNION ALL
+        SELECT (
+            SELECT min(actual_log_time)::date FROM device_logs_legacy
+            WHERE actual_log_time >= days.day + 1 AND actual_log_time < :end
+        )
+        FROM days WHERE days.day IS NOT NULL
+    )
+    SELECT day FROM days WHERE day IS NOT NULL
+""")
+
+# ON CONFLICT DO NOTHING makes a re-run after an interruption skip the
+# batches that were already copied
+COPY_SQL = sa.text(f"""
+    INSERT INTO device_logs ({COLUMNS})
+    SELECT {COLUMNS} FROM device_logs_legacy
+    WHERE log_id >= :lo AND log_id < :hi
+    ON CONFLICT DO NOTHING
+""")
+
+
+def create_partitions(conn):
+    today = conn.execute(sa.text("SELECT (now() AT TIME ZONE 'UTC')::date")).scalar()
+    days = set(conn.execute(LEGACY_DAYS_SQL, {
+        "start": today - timedelta(days=HISTORY_DAYS),
+        "end": today + timedelta(days=DAYS_AHEAD + 1),
+    }).scalars())
+    days.update(today + timedelta(days=i) for i in range(DAYS_AHEAD + 1))
+
+    for day in sorted(days):
+        op.execute(
+            f"CREATE TABLE device_logs_p{day:%Y%m%d} PARTITION OF device_logs "
+            f"FOR VALUES FROM ('{day}') TO ('{day + timedelta(days=1)}')"
+        )
+
+
+def copy_legacy(conn):
+    lo, max_id = conn.execute(sa.text("SELECT min(log_id), max(log_id) FROM device_logs_legacy")).one()
+    if lo is None:
+        return
+    while lo <= max_id:
+        # One short transaction per chunk
+        conn.execute(COPY_SQL, {"lo": lo, "hi": lo + BATCH_SIZE})
+        lo += BATCH_SIZE
+
+
+def create_partitioned_table(conn):
+    rename_to_legacy()
+
+    op.execute("""
+        CREATE TABLE device_logs (
+            log_id INTEGER NOT NULL DEFAULT nextval('device_logs_log_id_seq'),
+            project_id INTEGER NOT NULL REFERENCES projects (project_id),
+            instance_id VARCHAR(100) NOT NULL REFERENCES devices (instance_id),
+            message TEXT NOT NULL,
+            level loglevel NOT NULL,
+            log_tag_id INTEGER CONSTRAINT fk_device_logs_log_tag_id REFERENCES log_tags (id),
+            actual_log_time TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            CONSTRAINT device_logs_pkey PRIMARY KEY (log_id, actual_log_time)
+        ) PARTITION BY RANGE (actual_log_time)
+    """)
+    op.execute("ALTER SEQUENCE device_logs_log_id_seq OWNED BY device_logs.log_id")
+    create_indexes()
+
+    op.execute("CREATE TABLE device_logs_default PARTITION OF device_logs DEFAULT")
+
+    # One partition per day that has recent legacy rows, and up to a week ahead
+    create_partitions(conn)
+
+
+def upgrade():
+    conn = op.get_bind()
+    # A run interrupted while copying has already committed the new table
+    if conn.execute(sa.text("SELECT to_regclass('device_logs_legacy') IS NULL")).scalar():
+        create_partitioned_table(conn)
+
+    # The new table is committed first, then filled in batches
+    with op.get_context().autocommit_block():
+        copy_legacy(conn)
+    op.execute("DROP TABLE device_logs_legacy")
+    op.execute("ANALYZE device_logs")
+
+
+def downgrade():
+    rename_to_legacy()
+
+    op.execute("""
+        CREATE TABLE device_logs (
+            log_id INTEGER NOT NULL DEFAULT nextval('device_logs_log_id_seq'),
+            project_id INTEGER NOT NULL REFERENCES projects (project_id),
+            instance_id VARCHAR(100) NOT NULL REFERENCES devices (instance_id),
+            message TEXT NOT NULL,
+            level loglevel NOT NULL,
+            log_tag_id INTEGER CONSTRAINT fk_device_logs_log_tag_id REFERENCES log_tags (id),
+            actual_log_time TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            CONSTRAINT device_logs_pkey PRIMARY KEY (log_id)
+        )
+    """)
+    op.execute("ALTER SEQUENCE device_logs_log_id_seq OWNED BY device_logs.log_id")
+    create_indexes()
+
+    op.execute(f"INSERT INTO device_logs ({COLUMNS}) SELECT {COLUMNS} FROM device_logs_legacy")
+    # Drops every partition along with the partitioned parent
+    op.execute("DROP TABLE device_logs_legacy")
@@ -0,0 +1,26 @@
+"""add (project_id, actual_log_time, instance_id) index to device_logs
+
+Revision ID: 5e1b7d2c40a9
+Revises: 26260d9a6e85
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e1b7d2c40a9'
+down_revision = '26260d9a6e85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Created on the partitioned parent, Postgres builds it on every partition
+    op.create_index('idx_project_time_instance', 'device_logs',
+                    ['project_id', 'actual_log_time', 'instance_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_project_time_instance', table_name='device_logs')
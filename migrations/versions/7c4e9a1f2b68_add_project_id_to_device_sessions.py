@@ -0,0 +1,84 @@
+"""add project_id to device_sessions
+
+Revision ID: 7c4e9a1f2b68
+Revises: 5e1b7d2c40a9
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4e9a1f2b68'
+down_revision = '5e1b7d2c40a9'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10000
+
+# Only rows still NULL are touched, so an interrupted run resumes where it
+# stopped when the migration is re-run.
+BACKFILL_SQL = sa.text("""
+    UPDATE device_sessions AS s
+    SET project_id = d.project_id
+    FROM devices AS d
+    WHERE d.instance_id = s.instance_id
+      AND s.id >= :lo AND s.id < :hi
+      AND s.project_id IS NULL
+""")
+
+
+def backfill(conn):
+    lo, max_id = conn.execute(sa.text(
+        "SELECT min(id), max(id) FROM device_sessions WHERE project_id IS NULL"
+    )).one()
+    if lo is None:
+        return
+    while lo <= max_id:
+        # One short transaction per chunk, row locks are released as we go
+        conn.execute(BACKFILL_SQL, {"lo": lo, "hi": lo + BATCH_SIZE})
+        lo += BATCH_SIZE
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+
+        # Every step is idempotent so a failed run can simply be re-run.
+        # Nullable, no default: a catalog-only change, no table rewrite
+        conn.execute(sa.text("ALTER TABLE device_sessions ADD COLUMN IF NOT EXISTS project_id INTEGER"))
+
+        # NOT VALID skips the full-table check under the ACCESS EXCLUSIVE lock,
+        # VALIDATE then only needs SHARE UPDATE EXCLUSIVE
+        conn.execute(sa.text("""
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_constraint WHERE conname = 'device_sessions_project_id_fkey'
+                ) THEN
+                    ALTER TABLE device_sessions
+                    ADD CONSTRAINT device_sessions_project_id_fkey
+                    FOREIGN KEY (project_id) REFERENCES projects (project_id) NOT VALID;
+                END IF;
+            END $$;
+        """))
+
+        backfill(conn)
+        # Catch rows inserted by the previous release while the backfill ran
+        backfill(conn)
+
+        conn.execute(sa.text(
+            "ALTER TABLE device_sessions VALIDATE CONSTRAINT device_sessions_project_id_fkey"
+        ))
+        conn.execute(sa.text("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_session_project_time_instance
+            ON device_sessions (project_id, actual_log_time, instance_id)
+        """))
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_session_project_time_instance")
+    op.drop_constraint('device_sessions_project_id_fkey', 'device_sessions', type_='foreignkey')
+    op.drop_column('device_sessions', 'project_id')
@@ -0,0 +1,39 @@
+"""add log_hourly_rollups table
+
+Revision ID: 984f7782dd16
+Revises: 498132dfcfd3
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '984f7782dd16'
+down_revision = '498132dfcfd3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'log_hourly_rollups',
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('hour', sa.DateTime(), nullable=False),
+        sa.Column('instance_id', sa.String(length=100), nullable=False),
+        sa.Column('log_tag_id', sa.Integer(), nullable=False),
+        sa.Column('platform', postgresql.ENUM(name='platform', create_type=False), nullable=False),
+        sa.Column('country', sa.String(length=100), nullable=True),
+        sa.Column('log_count', sa.Integer(), nullable=False),
+        sa.Column('error_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.project_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['instance_id'], ['devices.instance_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('project_id', 'hour', 'instance_id', 'log_tag_id')
+    )
+    # Rollups are filled by compact_rollups.py (backfill) and at ingest time
+
+
+def downgrade():
+    op.drop_table('log_hourly_rollups')
@@ -0,0 +1,70 @@
+"""fill device_sessions.project_id on insert
+
+Revision ID: a1d5f0c8b742
+Revises: e4c8a2b6d193
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1d5f0c8b742'
+down_revision = 'e4c8a2b6d193'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10000
+
+# Releases older than 7c4e9a1f2b68 insert sessions without project_id. The
+# trigger fills it from the device, so rows they write during a rolling
+# deploy are still counted per project.
+CREATE_TRIGGER_SQL = sa.text("""
+    CREATE OR REPLACE FUNCTION device_sessions_fill_project_id() RETURNS trigger AS $$
+    BEGIN
+        SELECT project_id INTO NEW.project_id FROM devices WHERE instance_id = NEW.instance_id;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS trg_device_sessions_fill_project_id ON device_sessions;
+    CREATE TRIGGER trg_device_sessions_fill_project_id
+        BEFORE INSERT ON device_sessions
+        FOR EACH ROW WHEN (NEW.project_id IS NULL)
+        EXECUTE FUNCTION device_sessions_fill_project_id();
+""")
+
+# Same chunked, resumable backfill as 7c4e9a1f2b68, for rows written since
+BACKFILL_SQL = sa.text("""
+    UPDATE device_sessions AS s
+    SET project_id = d.project_id
+    FROM devices AS d
+    WHERE d.instance_id = s.instance_id
+      AND s.id >= :lo AND s.id < :hi
+      AND s.project_id IS NULL
+""")
+
+
+def backfill(conn):
+    lo, max_id = conn.execute(sa.text(
+        "SELECT min(id), max(id) FROM device_sessions WHERE project_id IS NULL"
+    )).one()
+    if lo is None:
+        return
+    while lo <= max_id:
+        conn.execute(BACKFILL_SQL, {"lo": lo, "hi": lo + BATCH_SIZE})
+        lo += BATCH_SIZE
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        # Trigger first, so nothing new can be written NULL while backfilling
+        conn.execute(CREATE_TRIGGER_SQL)
+        backfill(conn)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_device_sessions_fill_project_id ON device_sessions")
+    op.execute("DROP FUNCTION IF EXISTS device_sessions_fill_project_id()")
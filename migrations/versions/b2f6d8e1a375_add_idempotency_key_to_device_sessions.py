@@ -0,0 +1,34 @@
+"""add idempotency_key to device_sessions
+
+Revision ID: b2f6d8e1a375
+Revises: 7c4e9a1f2b68
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2f6d8e1a375'
+down_revision = '7c4e9a1f2b68'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('device_sessions', sa.Column('idempotency_key', sa.String(length=100), nullable=True))
+
+    # Existing rows have no key, the partial index starts empty
+    with op.get_context().autocommit_block():
+        op.execute("""
+            CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_session_idempotency_key
+            ON device_sessions (instance_id, idempotency_key)
+            WHERE idempotency_key IS NOT NULL
+        """)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS uq_session_idempotency_key")
+    op.drop_column('device_sessions', 'idempotency_key')
@@ -0,0 +1,34 @@
+"""add retention_policies table
+
+Revision ID: d91a4c3e7f02
+Revises: b2f6d8e1a375
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd91a4c3e7f02'
+down_revision = 'b2f6d8e1a375'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('retention_policies',
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('info_days', sa.Integer(), nullable=True),
+    sa.Column('warning_days', sa.Integer(), nullable=True),
+    sa.Column('error_days', sa.Integer(), nullable=True),
+    sa.Column('session_days', sa.Integer(), nullable=True),
+    sa.Column('archive', sa.Boolean(), nullable=False, server_default=sa.true()),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.project_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('project_id')
+    )
+
+
+def downgrade():
+    op.drop_table('retention_policies')
@@ -0,0 +1,37 @@
+"""add device_daily_counters table
+
+Revision ID: e4c8a2b6d193
+Revises: d91a4c3e7f02
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4c8a2b6d193'
+down_revision = 'd91a4c3e7f02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'device_daily_counters',
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('instance_id', sa.String(length=100), nullable=False),
+        sa.Column('log_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('error_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('action_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('session_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.project_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['instance_id'], ['devices.instance_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('project_id', 'day', 'instance_id')
+    )
+    # Counters are filled at ingest time; history is backfilled by f3b9d6a2e815
+
+
+def downgrade():
+    op.drop_table('device_daily_counters')
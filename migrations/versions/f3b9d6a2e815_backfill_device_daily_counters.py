@@ -0,0 +1,91 @@
+"""backfill device_daily_counters
+
+Revision ID: f3b9d6a2e815
+Revises: a1d5f0c8b742
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b9d6a2e815'
+down_revision = 'a1d5f0c8b742'
+branch_labels = None
+depends_on = None
+
+# Same key as device_counters_services.COUNTER_LOCK_KEY
+COUNTER_LOCK_KEY = 7410002
+
+# One project and UTC day per round trip. The statements are sent as one
+# query string, which Postgres runs as a single implicit transaction even in
+# autocommit: the project's exclusive lock makes its ingest batches (which
+# take it shared before adding to the counters) wait until the day's counts
+# are written, so none are lost or counted twice, while other projects keep
+# ingesting. Counts are overwritten, not added, so an interrupted run can
+# simply be re-run.
+BACKFILL_DAY_SQL = sa.text("""
+    SELECT pg_advisory_xact_lock(:lock_key, :project_id);
+
+    INSERT INTO device_daily_counters
+        (project_id, day, instance_id, log_count, error_count, action_count)
+    SELECT project_id, date(actual_log_time), instance_id,
+           count(log_id),
+           count(*) FILTER (WHERE level = 'ERROR'),
+           count(log_tag_id)
+    FROM device_logs
+    WHERE project_id = :project_id
+      AND actual_log_time >= :day AND actual_log_time < :day + interval '1 day'
+    GROUP BY project_id, date(actual_log_time), instance_id
+    ON CONFLICT (project_id, day, instance_id) DO UPDATE
+    SET log_count = excluded.log_count,
+        error_count = excluded.error_count,
+        action_count = excluded.action_count;
+
+    INSERT INTO device_daily_counters (project_id, day, instance_id, session_count)
+    SELECT project_id, date(actual_log_time), instance_id, count(*)
+    FROM device_sessions
+    WHERE project_id = :project_id
+      AND actual_log_time >= :day AND actual_log_time < :day + interval '1 day'
+    GROUP BY project_id, date(actual_log_time), instance_id
+    ON CONFLICT (project_id, day, instance_id) DO UPDATE
+    SET session_count = excluded.session_count;
+""")
+
+
+PROJECT_DAYS_SQL = sa.text("""
+    SELECT least(
+               (SELECT min(actual_log_time) FROM device_logs WHERE project_id = :project_id),
+               (SELECT min(actual_log_time) FROM device_sessions WHERE project_id = :project_id)
+           )::date,
+           greatest(
+               (SELECT max(actual_log_time) FROM device_logs WHERE project_id = :project_id),
+               (SELECT max(actual_log_time) FROM device_sessions WHERE project_id = :project_id)
+           )::date
+""")
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        project_ids = conn.execute(sa.text(
+            "SELECT project_id FROM projects ORDER BY project_id"
+        )).scalars().all()
+
+        for project_id in project_ids:
+            first_day, last_day = conn.execute(PROJECT_DAYS_SQL, {"project_id": project_id}).one()
+            if first_day is None:
+                continue
+            days = conn.execute(sa.text(
+                "SELECT day::date FROM generate_series(CAST(:first AS date), CAST(:last AS date), interval '1 day') AS day"
+            ), {"first": first_day, "last": last_day}).scalars().all()
+            for day in days:
+                conn.execute(BACKFILL_DAY_SQL, {
+                    "lock_key": COUNTER_LOCK_KEY, "project_id": project_id, "day": day,
+                })
+
+
+def downgrade():
+    # Counters stay valid; the table itself goes with e4c8a2b6d193
+    pass
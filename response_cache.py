@@ -0,0 +1,103 @@
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from flask import current_app, g, request
+from redis.exceptions import RedisError
+from cache import r
+
+def _generation_keys(project_id, scopes):
+    return [f"resp_gen:{project_id}:{scope}" for scope in scopes]
+
+
+def invalidate_project_responses(project_id, scope):
+    """Drop every cached response of a project that depends on ``scope``.
+
+    Scopes: "logs" (late-arriving logs) and "devices" (device rows changed).
+    """
+    try:
+        r.incr(f"resp_gen:{project_id}:{scope}")
+    except RedisError:
+        current_app.logger.warning("Could not invalidate cached responses for project %s", project_id)
+
+
+def note_logs_ingested(project_id, oldest_log_time):
+    """Invalidate historical windows when a late log lands in them.
+
+    Windows ending within RESPONSE_CACHE_LIVE_HORIZON are cached with a short
+    TTL and never invalidated, so only logs older than the horizon matter.
+    """
+    horizon = timedelta(seconds=current_app.config['RESPONSE_CACHE_LIVE_HORIZON'])
+    if oldest_log_time < datetime.now(timezone.utc) - horizon:
+        invalidate_project_responses(project_id, "logs")
+
+
+def _parse_window_end(end_str):
+    if not end_str:
+        return None
+    end = datetime.fromisoformat(end_str.replace("Z", "+00:00"))
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    return end
+
+
+def cached_response(endpoint, end_param="end", scopes=("logs",)):
+    """Cache a GET endpoint's JSON body per (project, endpoint, params).
+
+    Windows ending more than RESPONSE_CACHE_LIVE_HORIZON ago get the long
+    TTL, windows that include "now" the short one. Only one worker computes a
+    missing key; the others wait for its result up to RESPONSE_CACHE_WAIT_MS.
+    Must be applied after token_required.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            config = current_app.config
+            if not config['RESPONSE_CACHE_ENABLED']:
+                return f(*args, **kwargs)
+
+            try:
+                window_end = _parse_window_end(request.args.get(end_param))
+            except ValueError:
+                # Let the endpoint report the bad parameter
+                return f(*args, **kwargs)
+
+            horizon = datetime.now(timezone.utc) - timedelta(seconds=config['RESPONSE_CACHE_LIVE_HORIZON'])
+            historical = window_end is not None and window_end <= horizon
+            ttl = config['RESPONSE_CACHE_HISTORICAL_TTL'] if historical else config['RESPONSE_CACHE_LIVE_TTL']
+
+            params = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+            params_hash = hashlib.sha1(params.encode()).hexdigest()
+
+            try:
+                generations = r.mget(_generation_keys(g.project_id, scopes))
+                generation = ".".join(gen or "0" for gen in generations)
+                key = f"resp:{g.project_id}:{endpoint}:{generation}:{params_hash}"
+
+                body = r.get(key)
+                if body is None and not r.set(f"{key}:lock", 1, nx=True, px=config['RESPONSE_CACHE_LOCK_MS']):
+                    # Another worker is computing it
+                    deadline = time.monotonic() + config['RESPONSE_CACHE_WAIT_MS'] / 1000
+                    while body is None and time.monotonic() < deadline:
+                        time.sleep(0.05)
+                        body = r.get(key)
+            except RedisError:
+                return f(*args, **kwargs)
+
+            if body is not None:
+                response = current_app.response_class(body, mimetype="application/json")
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            response = current_app.make_response(f(*args, **kwargs))
+            try:
+                if response.status_code == 200:
+                    r.set(key, response.get_data(as_text=True), ex=ttl)
+                r.delete(f"{key}:lock")
+            except RedisError:
+                pass
+            response.headers["X-Cache"] = "MISS"
+            return response
+
+        return decorated
+    return decorator
@@ -0,0 +1,82 @@
+# retention.py
+# Enforces per-project retention (retention_policies, RETENTION_DEFAULT_*):
+# expired logs and sessions are archived to Parquet under RETENTION_ARCHIVE_DIR,
+# then deleted in small chunks, or whole daily partitions are dropped when
+# every project has expired them. Rollups, sketches and daily counters of the
+# touched days are then rebuilt, and their exported Parquet days marked stale.
+# Cron:        python retention.py run
+# Background:  python retention.py run --loop --interval 3600
+# Restore:     python retention.py restore --project-id 1 --start 2026-01-01T00:00:00Z --end 2026-01-02T00:00:00Z
+# Policy:      python retention.py policy --project-id 1 --info-days 7 --error-days 90
+import argparse
+import json
+import time
+from app import create_app
+from app.services.retention_services import (
+    LOGS_TABLE,
+    POLICY_FIELDS,
+    SESSIONS_TABLE,
+    effective_policy,
+    restore_archive,
+    run_retention,
+    set_policy,
+)
+from app.utils.date_util import parse_iso_datetime
+
+
+def days_or_forever(value):
+    """'forever' (or 0) keeps data indefinitely, otherwise a positive day count."""
+    if value in ("forever", "0"):
+        return None
+    days = int(value)
+    if days < 1:
+        raise argparse.ArgumentTypeError("days must be positive, or 'forever'")
+    return days
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retention and archival for device_logs and device_sessions")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Archive and delete expired rows")
+    run_parser.add_argument("--project-id", type=int, default=None,
+                            help="Only this project (partitions are never dropped then)")
+    run_parser.add_argument("--dry-run", action="store_true", help="Report what would expire, change nothing")
+    run_parser.add_argument("--loop", action="store_true", help="Keep running every --interval seconds")
+    run_parser.add_argument("--interval", type=int, default=3600)
+
+    restore_parser = commands.add_parser("restore", help="Re-import archived rows for a time range")
+    restore_parser.add_argument("--project-id", type=int, required=True)
+    restore_parser.add_argument("--start", required=True, help="ISO 8601 start")
+    restore_parser.add_argument("--end", required=True, help="ISO 8601 end (exclusive)")
+    restore_parser.add_argument("--table", choices=[LOGS_TABLE, SESSIONS_TABLE], default=LOGS_TABLE)
+
+    policy_parser = commands.add_parser("policy", help="Show or set a project's retention policy")
+    policy_parser.add_argument("--project-id", type=int, required=True)
+    for field in POLICY_FIELDS:
+        policy_parser.add_argument(f"--{field.replace('_', '-')}", dest=field, type=days_or_forever,
+                                   default=argparse.SUPPRESS, help="Days to keep, or 'forever'")
+    policy_parser.add_argument("--archive", dest="archive", action=argparse.BooleanOptionalAction,
+                               default=argparse.SUPPRESS, help="Archive to Parquet before deleting")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.command == "run":
+            while True:
+                summary = run_retention(args.project_id, dry_run=args.dry_run)
+                print(json.dumps(summary, default=str))
+                if not args.loop:
+                    break
+                time.sleep(args.interval)
+
+        elif args.command == "restore":
+            restored = restore_archive(
+                args.table, args.project_id, parse_iso_datetime(args.start), parse_iso_datetime(args.end)
+            )
+            print(f"Restored {restored} row(s) into {args.table}")
+
+        else:
+            values = {key: value for key, value in vars(args).items() if key in (*POLICY_FIELDS, "archive")}
+            policy = set_policy(args.project_id, values) if values else effective_policy(args.project_id)
+            print(json.dumps(policy))
@@ -1,4 +1,5 @@
 from app import create_app, db
+from app.services.log_partitions_services import ensure_log_partitions
 
 app = create_app()
 
@@ -6,4 +7,5 @@ app = create_app()
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        ensure_log_partitions()
     app.run()
@@ -0,0 +1,184 @@
+# Statement counts of the log list endpoints, against a migrated Postgres
+# and the app's Redis:
+#
+#   TEST_DATABASE_URL=postgresql://... python -m pytest tests/test_log_queries.py
+#
+# Each test compares a small and a large page of the same data: a lazy load
+# per row would make the large one issue more statements.
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if not TEST_DATABASE_URL:
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+
+from sqlalchemy import delete, event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import Device, DeviceLog, LogLevel, LogTag, Project, Token, User  # noqa: E402
+from app.services.log_queries_services import (  # noqa: E402
+    fetch_log_page, log_rows_query, serialize_log_rows,
+)
+
+DEVICES = 5
+TAGS = 3
+LOGS = 200
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        # Every engine, so reads sent to a replica bind are counted too
+        event.listen(Engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(Engine, "before_cursor_execute", self)
+
+
+@pytest.fixture(scope="module")
+def app():
+    app = create_app()
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture(scope="module")
+def data(app):
+    """A project with DEVICES devices, TAGS tags and LOGS logs, committed so requests see it."""
+    suffix = uuid.uuid4().hex[:12]
+    user = User(username=f"log_queries_{suffix}", email=f"log_queries_{suffix}@example.com")
+    db.session.add(user)
+    db.session.flush()
+    project = Project(name=f"log_queries_{suffix}", user_id=user.user_id)
+    db.session.add(project)
+    db.session.flush()
+    token = Token(token=f"log_queries_{suffix}", user_id=user.user_id, project_id=project.project_id)
+    devices = [
+        Device(instance_id=f"log_queries_{suffix}_{i}", project_id=project.project_id)
+        for i in range(DEVICES)
+    ]
+    tags = [LogTag(tag=f"tag_{i}", project_id=project.project_id) for i in range(TAGS)]
+    db.session.add_all([token, *devices, *tags])
+    db.session.flush()
+
+    start = datetime.now(timezone.utc) - timedelta(hours=1)
+    logs = [
+        DeviceLog(
+            project_id=project.project_id,
+            instance_id=devices[i % DEVICES].instance_id,
+            message=f"message {i}",
+            level=LogLevel.ERROR if i % 4 == 0 else LogLevel.INFO,
+            log_tag_id=tags[i % TAGS].id if i % 2 else None,
+            actual_log_time=start + timedelta(seconds=i),
+        )
+        for i in range(LOGS)
+    ]
+    db.session.add_all(logs)
+    db.session.commit()
+
+    yield {
+        "project_id": project.project_id,
+        "token": token.token,
+        "instance_id": devices[0].instance_id,
+        "log_id": logs[LOGS // 2].log_id,
+        "start": start,
+    }
+
+    project_id, user_id = project.project_id, user.user_id
+    db.session.rollback()
+    for model in (DeviceLog, LogTag, Token, Device):
+        db.session.execute(delete(model).where(model.project_id == project_id))
+    db.session.execute(delete(Project).where(Project.project_id == project_id))
+    db.session.execute(delete(User).where(User.user_id == user_id))
+    db.session.commit()
+
+
+@pytest.fixture
+def client(app, data):
+    client = app.test_client()
+    client.environ_base["HTTP_AUTHORIZATION"] = data["token"]
+    # Resolve the token once so auth lookups don't skew the counts
+    client.get("/api/logs/by-instance", query_string={"instance_id": data["instance_id"], "per_page": 1})
+    return client
+
+
+def count_request(client, path, **params):
+    with StatementCounter() as counter:
+        response = client.get(path, query_string=params)
+        body = response.get_data()
+    assert response.status_code == 200, body
+    return counter.count, response
+
+
+def test_log_page_helpers_statement_count_is_constant(app, data):
+    def page_statements(per_page):
+        db.session.expire_all()
+        with StatementCounter() as counter:
+            rows, _, _ = fetch_log_page(log_rows_query(data["project_id"]), None, per_page)
+            logs = serialize_log_rows(rows)
+        assert len(logs) == per_page
+        assert any(log["tag"] for log in logs)
+        return counter.count
+
+    assert page_statements(10) == page_statements(150) == 1
+
+
+@pytest.mark.parametrize("pagination", ["offset", "cursor"])
+def test_by_instance_statement_count_is_constant(client, data, pagination):
+    def request(per_page):
+        count, response = count_request(
+            client, "/api/logs/by-instance",
+            instance_id=data["instance_id"], per_page=per_page, pagination=pagination, total="exact",
+        )
+        assert len(response.get_json()["logs"]) == per_page
+        return count
+
+    assert request(5) == request(40)
+
+
+def test_log_position_page_statement_count_is_constant(client, data):
+    def request(limit):
+        count, response = count_request(
+            client, "/api/logs/log-position",
+            instance_id=data["instance_id"], log_id=data["log_id"], limit=limit,
+        )
+        assert response.get_json()["logs"]
+        return count
+
+    assert request(5) == request(40)
+
+
+def test_log_position_window_statement_count_is_constant(client, data):
+    def request(size):
+        count, response = count_request(
+            client, "/api/logs/log-position",
+            instance_id=data["instance_id"], log_id=data["log_id"], mode="window",
+            before=size, after=size, position="exact",
+        )
+        assert len(response.get_json()["logs"]) == 2 * size + 1
+        return count
+
+    assert request(2) == request(15)
+
+
+def test_export_statement_count_is_constant(client, data):
+    def request(rows):
+        count, response = count_request(
+            client, "/api/logs/export", gzip="false",
+            start=data["start"].isoformat(),
+            end=(data["start"] + timedelta(seconds=rows)).isoformat(),
+        )
+        assert len(response.get_data().splitlines()) == rows
+        return count
+
+    assert request(10) == request(LOGS)